@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+from bisect import bisect_left, insort
+from datetime import date
+from fractions import Fraction
+import math
+import sys
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .analytics import compute_dashboard, normalize_row
+from .columns import row_columns
+from .storage import Change, ReportSnapshot, snapshot, subscribe
+
+
+CATEGORY_FIELDS = ("method", "uscs", "contractor", "project")
+RECENT_LIMIT = 5
+
+# Rows are ordered by (StartDate ordinal, rowid); rowids follow file order.
+Key = Tuple[int, int]
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()  # datetime64[D] counts days from here
+
+
+def _exact(value: Optional[float]) -> Optional[Fraction]:
+    # Running sums are kept exact so thousands of add/remove deltas never drift.
+    if value is None or not math.isfinite(value):
+        return None
+    return Fraction(value)
+
+
+def _exact_sum(values: np.ndarray) -> Fraction:
+    """Exact sum of finite floats: each is an integer mantissa times a power of two."""
+    mantissas, exponents = np.frexp(values)
+    ints = np.ldexp(mantissas, 53).astype(np.int64)
+    total = Fraction(0)
+    for exponent in np.unique(exponents).tolist():
+        total += Fraction(sum(ints[exponents == exponent].tolist())) * Fraction(2) ** (exponent - 53)
+    return total
+
+
+class DashboardAggregates:
+    """Dashboard KPIs kept current by applying storage write deltas.
+
+    ``python -m backend.app.aggregates`` rebuilds from scratch and checks the result
+    against ``analytics.compute_dashboard``.
+    """
+
+    def __init__(self) -> None:
+        self.version = -1
+        self._lock = threading.RLock()
+        self._stale = True
+        self._reset()
+
+    def _reset(self) -> None:
+        self._order: List[Key] = []
+        self._rows: Dict[int, Dict[str, Any]] = {}
+        self._keys: Dict[int, Key] = {}
+        self._depth_sum = Fraction(0)
+        self._depth_n = 0
+        self._gw_sum = Fraction(0)
+        self._gw_n = 0
+        # value -> sorted keys of the rows holding it; len() is the count and
+        # [0] the first appearance, which orders the breakdowns like a Counter.
+        self._cats: Dict[str, Dict[str, List[Key]]] = {name: {} for name in CATEGORY_FIELDS}
+
+    def rebuild(self, snap: ReportSnapshot) -> None:
+        """Recompute from the snapshot's typed columns in one sort, without normalize_row per row."""
+        typed = row_columns(snap.rows)
+        dated = np.flatnonzero(~np.isnat(typed.start))
+        days = typed.start[dated].astype(np.int64) + _EPOCH_ORDINAL
+        rowids = np.asarray(snap.rowids, dtype=np.int64)[dated]
+        order = np.lexsort((rowids, days))
+        pos = dated[order]
+        with self._lock:
+            self._reset()
+            self._order = list(zip(days[order].tolist(), rowids[order].tolist()))
+            self._keys = {key[1]: key for key in self._order}
+            self._rows = {key[1]: snap.rows[p] for key, p in zip(self._order, pos.tolist())}
+            depth = typed.floats["final_depth"][pos]
+            depth = depth[np.isfinite(depth)]
+            self._depth_sum, self._depth_n = _exact_sum(depth), int(depth.size)
+            gw = typed.floats["groundwater_depth"][pos]
+            gw = gw[typed.gw_flag[pos] & np.isfinite(gw)]
+            self._gw_sum, self._gw_n = _exact_sum(gw), int(gw.size)
+            for name in CATEGORY_FIELDS:
+                cat = typed.cats[name]
+                codes = cat.codes[pos]
+                held = np.flatnonzero(codes >= 0)
+                held = held[np.argsort(codes[held], kind="stable")]
+                bounds = np.flatnonzero(np.diff(codes[held])) + 1
+                for group in np.split(held, bounds) if held.size else ():
+                    self._cats[name][cat.labels[codes[group[0]]]] = [self._order[i] for i in group.tolist()]
+            self.version = snap.version
+            self._stale = False
+
+    def _add(self, rowid: int, raw: Dict[str, Any]) -> None:
+        r = normalize_row(raw)
+        if not r["start_dt"]:
+            return
+        key = (r["start_dt"].toordinal(), rowid)
+        insort(self._order, key)
+        self._rows[rowid] = raw
+        self._keys[rowid] = key
+        depth = _exact(r["final_depth"])
+        if depth is not None:
+            self._depth_sum += depth
+            self._depth_n += 1
+        gw = _exact(r["groundwater_depth"])
+        if r["groundwater_flag"] and gw is not None:
+            self._gw_sum += gw
+            self._gw_n += 1
+        for name in CATEGORY_FIELDS:
+            if r[name]:
+                insort(self._cats[name].setdefault(r[name], []), key)
+
+    def _remove(self, rowid: int, raw: Dict[str, Any]) -> None:
+        key = self._keys.pop(rowid, None)
+        if key is None:
+            return
+        del self._order[bisect_left(self._order, key)]
+        del self._rows[rowid]
+        r = normalize_row(raw)
+        depth = _exact(r["final_depth"])
+        if depth is not None:
+            self._depth_sum -= depth
+            self._depth_n -= 1
+        gw = _exact(r["groundwater_depth"])
+        if r["groundwater_flag"] and gw is not None:
+            self._gw_sum -= gw
+            self._gw_n -= 1
+        for name in CATEGORY_FIELDS:
+            if r[name]:
+                keys = self._cats[name][r[name]]
+                del keys[bisect_left(keys, key)]
+                if not keys:
+                    del self._cats[name][r[name]]
+
+    def apply(self, snap: ReportSnapshot, changes: Optional[Sequence[Change]]) -> None:
+        with self._lock:
+            if changes is None or self._stale or self.version != snap.version - 1:
+                self._stale = True
+                return
+            for rowid, old, new in changes:
+                if old is not None:
+                    self._remove(rowid, old)
+                if new is not None:
+                    self._add(rowid, new)
+            self.version = snap.version
+
+    def _breakdown(self, name: str) -> Dict[str, int]:
+        ordered = sorted(self._cats[name].items(), key=lambda item: item[1][0])
+        return {value: len(keys) for value, keys in ordered}
+
+    def _recent(self) -> List[Dict[str, Any]]:
+        # Newest date first; rows sharing a date keep file order, as a stable reverse sort would.
+        picked: List[Key] = []
+        hi = len(self._order)
+        while hi > 0 and len(picked) < RECENT_LIMIT:
+            lo = bisect_left(self._order, (self._order[hi - 1][0], -1))
+            picked.extend(self._order[lo:hi])
+            hi = lo
+        return [normalize_row(self._rows[rowid]) for _, rowid in picked[:RECENT_LIMIT]]
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            total = len(self._order)
+            projects = sorted(self._cats["project"])
+            contractors = self._breakdown("contractor")
+            period_range: Dict[str, Optional[str]] = {"from": None, "to": None}
+            period_label = None
+            if self._order:
+                period_range = {
+                    "from": normalize_row(self._rows[self._order[0][1]])["start_dt"].strftime("%Y-%m-%d"),
+                    "to": normalize_row(self._rows[self._order[-1][1]])["start_dt"].strftime("%Y-%m-%d"),
+                }
+                period_label = f"{period_range['from']} to {period_range['to']}"
+            return {
+                "total_boreholes": total,
+                "avg_final_depth_m": round(float(self._depth_sum) / self._depth_n, 2) if self._depth_n else None,
+                "avg_groundwater_depth_m": round(float(self._gw_sum) / self._gw_n, 2) if self._gw_n else None,
+                "total_meterage_m": round(float(self._depth_sum), 1) if self._depth_n else 0,
+                "active_projects": len(projects),
+                "project_list": projects,
+                "method_breakdown": self._breakdown("method"),
+                "uscs_breakdown": self._breakdown("uscs"),
+                "top_contractor": max(contractors, key=contractors.__getitem__) if contractors else None,
+                "period_range": period_range,
+                "period_label": period_label,
+                "recent_reports": [
+                    {
+                        "borehole_id": r["borehole_id"],
+                        "project": r["project"],
+                        "site": r["site"],
+                        "start_date": r["start_date"],
+                        "final_depth_m": r["final_depth"],
+                        "groundwater_depth_m": r["groundwater_depth"],
+                        "method": r["method"],
+                    }
+                    for r in self._recent()
+                ],
+            }
+
+
+_aggregates = DashboardAggregates()
+subscribe(_aggregates.apply)
+
+
+def dashboard_metrics(snap: Optional[ReportSnapshot] = None) -> Dict[str, Any]:
+    """Dashboard KPIs for the current data, rebuilding only if deltas were missed."""
+    if snap is None:
+        snap = snapshot()
+    with _aggregates._lock:
+        if _aggregates._stale or _aggregates.version < snap.version:
+            _aggregates.rebuild(snap)
+        return _aggregates.metrics()
+
+
+def verify(snap: Optional[ReportSnapshot] = None) -> List[str]:
+    """Compare incremental metrics with a full compute_dashboard pass; returns mismatched keys."""
+    if snap is None:
+        snap = snapshot()
+    incremental = dashboard_metrics(snap)
+    expected = compute_dashboard(snap.rows)
+    mismatches = []
+    for key, value in expected.items():
+        got = incremental.get(key)
+        if isinstance(value, float) and isinstance(got, float):
+            # Exact running sums vs numpy's pairwise sum can straddle a rounding edge.
+            if not math.isclose(value, got, abs_tol=0.011):
+                mismatches.append(key)
+        elif got != value:
+            mismatches.append(key)
+    return mismatches
+
+
+if __name__ == "__main__":
+    snap = snapshot()
+    _aggregates.rebuild(snap)
+    bad = verify(snap)
+    if bad:
+        print(f"Rebuilt aggregates at version {snap.version}; mismatched: {', '.join(bad)}")
+        sys.exit(1)
+    print(f"Rebuilt aggregates at version {snap.version} ({len(snap)} rows); all metrics match.")
@@ -4,33 +4,22 @@ from collections import Counter
 from datetime import datetime, timedelta
 import json
 import logging
-from typing import Any, Dict, Iterable, List, Optional, Sequence
+import os
+from typing import Any, Callable, Collection, Dict, List, Optional, Sequence, Tuple
 
-from .ollama_client import ask as ollama_ask
+from .columns import ReportColumns, Selection, columns_for, most_common
+from . import narratives, ollama_client
+from .narratives import cache as narrative_cache, cache_key
+from .ollama_client import ask as ollama_ask, estimate_tokens
+from .parsing import parse_date, parse_float
+from .retrieval import search as search_rows
 
 
-logger = logging.getLogger(__name__)
-
-
-def parse_float(val: Any) -> Optional[float]:
-    try:
-        if val in (None, "", "None"):
-            return None
-        return float(val)
-    except (TypeError, ValueError):
-        return None
+CONTEXT_TOKENS = int(os.environ.get("AI_CONTEXT_TOKENS", "2000"))  # data rows sent with a question
+TURN_CONTEXT_TOKENS = int(os.environ.get("AI_TURN_CONTEXT_TOKENS", "600"))  # extra rows for a chat follow-up
+MAX_CONTEXT_ROWS = 200
 
-
-def parse_date(val: Any) -> Optional[datetime]:
-    if not val:
-        return None
-    s = str(val).strip()
-    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%Y/%m/%d"):
-        try:
-            return datetime.strptime(s, fmt)
-        except ValueError:
-            continue
-    return None
+logger = logging.getLogger(__name__)
 
 
 def normalize_row(row: Dict[str, Any]) -> Dict[str, Any]:
@@ -104,39 +93,51 @@ def filter_period(
     return filtered
 
 
-def _avg(values: Iterable[Optional[float]]) -> Optional[float]:
-    vals = [v for v in values if v is not None]
-    if not vals:
-        return None
-    return round(sum(vals) / len(vals), 2)
-
-
-def _period_range(rows: Sequence[Dict[str, Any]]) -> Dict[str, Optional[str]]:
-    dates = [r["start_dt"] for r in rows if r.get("start_dt")]
-    if not dates:
+def period_bounds(
+    period: str,
+    *,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    month: Optional[int] = None,
+    year: Optional[int] = None,
+) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """Inclusive StartDate bounds of the window filter_period selects."""
+    if period == "weekly":
+        if start_date and end_date:
+            return start_date, end_date
+        return datetime.utcnow() - timedelta(days=7), None
+    if month and year:
+        first = datetime(year, month, 1)
+        following = datetime(year + (month == 12), month % 12 + 1, 1)
+        return first, following - timedelta(days=1)
+    return datetime.utcnow() - timedelta(days=30), None
+
+
+def _date_range(cols: ReportColumns, sel: Selection = slice(None)) -> Dict[str, Optional[str]]:
+    first, last = cols.date_bounds(sel)
+    if not first or not last:
         return {"from": None, "to": None}
-    return {"from": dates[0].strftime("%Y-%m-%d"), "to": dates[-1].strftime("%Y-%m-%d")}
+    return {"from": first.strftime("%Y-%m-%d"), "to": last.strftime("%Y-%m-%d")}
 
 
-def compute_dashboard(rows_raw: List[Dict[str, Any]]) -> Dict[str, Any]:
-    rows = [normalize_row(r) for r in rows_raw]
-    rows = sorted([r for r in rows if r.get("start_dt")], key=lambda r: r["start_dt"])
+def compute_dashboard(rows_raw: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    cols = columns_for(rows_raw)
 
-    total = len(rows)
-    avg_depth = _avg(r["final_depth"] for r in rows)
-    avg_gw = _avg(r["groundwater_depth"] for r in rows if r.get("groundwater_flag"))
-    total_meterage = round(sum((r["final_depth"] or 0) for r in rows), 1)
-    methods = Counter(r["method"] for r in rows if r.get("method"))
-    uscs_counts = Counter(r["uscs"] for r in rows if r.get("uscs"))
-    projects = sorted({r["project"] for r in rows if r.get("project")})
-    contractors = Counter(r["contractor"] for r in rows if r.get("contractor"))
+    total = len(cols)
+    avg_depth = cols.avg("final_depth")
+    avg_gw = cols.avg("groundwater_depth", where=cols.gw_flag)
+    total_meterage = round(cols.total("final_depth"), 1)
+    methods = cols.cats["method"].counts()
+    uscs_counts = cols.cats["uscs"].counts()
+    projects = cols.cats["project"].distinct()
+    contractors = cols.cats["contractor"].counts()
 
-    period_range = _period_range(rows)
+    period_range = _date_range(cols)
     period_label = None
     if period_range["from"] and period_range["to"]:
         period_label = f"{period_range['from']} to {period_range['to']}"
 
-    recent = sorted(rows, key=lambda r: r["start_dt"] or datetime.min, reverse=True)[:5]
+    recent = [normalize_row(cols.row(i)) for i in cols.latest(5)]
     recent_payload = [
         {
             "borehole_id": r["borehole_id"],
@@ -157,42 +158,67 @@ def compute_dashboard(rows_raw: List[Dict[str, Any]]) -> Dict[str, Any]:
         "total_meterage_m": total_meterage,
         "active_projects": len(projects),
         "project_list": projects,
-        "method_breakdown": dict(methods),
-        "uscs_breakdown": dict(uscs_counts),
-        "top_contractor": contractors.most_common(1)[0][0] if contractors else None,
+        "method_breakdown": methods,
+        "uscs_breakdown": uscs_counts,
+        "top_contractor": most_common(contractors),
         "period_range": period_range,
         "period_label": period_label,
         "recent_reports": recent_payload,
     }
 
 
+def compute_period_stats(cols: ReportColumns, sel: slice) -> Dict[str, Any]:
+    """Aggregates for one window of the date-sorted columns (see rollups for the cached form)."""
+    first, last = cols.date_bounds(sel)
+    return {
+        "boreholes": sel.stop - sel.start,
+        "projects": cols.cats["project"].distinct(sel),
+        "sites": cols.cats["site"].distinct(sel),
+        "methods": cols.cats["method"].counts(sel),
+        "uscs": cols.cats["uscs"].counts(sel),
+        "contractors": cols.cats["contractor"].counts(sel),
+        "avg_final_depth_m": cols.avg("final_depth", sel),
+        "avg_groundwater_depth_m": cols.avg("groundwater_depth", sel, where=cols.gw_flag),
+        "avg_spt_n60": cols.avg("avg_spt", sel),
+        "total_meterage_m": round(cols.total("final_depth", sel), 1),
+        "first": first,
+        "last": last,
+        "latest": [normalize_row(cols.row(i)) for i in range(max(sel.start, sel.stop - 3), sel.stop)],
+    }
+
+
 def build_summary_report(
-    rows_raw: List[Dict[str, Any]],
+    rows_raw: Sequence[Dict[str, Any]],
     period: str,
     *,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     month: Optional[int] = None,
     year: Optional[int] = None,
+    period_stats: Optional[Dict[str, Any]] = None,
+    background_narrative: bool = False,
 ) -> Dict[str, Any]:
-    rows_all = [normalize_row(r) for r in rows_raw]
-    rows_all = sorted([r for r in rows_all if r.get("start_dt")], key=lambda r: r["start_dt"])
-    rows = filter_period(rows_all, period, start_date=start_date, end_date=end_date, month=month, year=year)
+    if period_stats is None:
+        cols = columns_for(rows_raw)
+        lo, hi = period_bounds(period, start_date=start_date, end_date=end_date, month=month, year=year)
+        period_stats = compute_period_stats(cols, cols.window(lo, hi))
+    count = period_stats["boreholes"]
     now = datetime.utcnow().strftime("%Y-%m-%d %H:%M UTC")
 
-    projects = sorted({r["project"] for r in rows if r.get("project")})
-    sites = sorted({r["site"] for r in rows if r.get("site")})
-    methods = Counter(r["method"] for r in rows if r.get("method"))
-    uscs_counts = Counter(r["uscs"] for r in rows if r.get("uscs"))
-    contractors = Counter(r["contractor"] for r in rows if r.get("contractor"))
+    projects = period_stats["projects"]
+    sites = period_stats["sites"]
+    methods = Counter(period_stats["methods"])
+    uscs_counts = Counter(period_stats["uscs"])
+    contractors = period_stats["contractors"]
 
-    avg_depth = _avg(r["final_depth"] for r in rows)
-    avg_gw = _avg(r["groundwater_depth"] for r in rows if r.get("groundwater_flag"))
-    avg_spt = _avg(r["avg_spt"] for r in rows)
-    total_meterage = round(sum((r["final_depth"] or 0) for r in rows), 1)
+    avg_depth = period_stats["avg_final_depth_m"]
+    avg_gw = period_stats["avg_groundwater_depth_m"]
+    avg_spt = period_stats["avg_spt_n60"]
+    total_meterage = period_stats["total_meterage_m"]
 
-    if rows:
-        actual_range = {"from": rows[0]["start_dt"].strftime("%Y-%m-%d"), "to": rows[-1]["start_dt"].strftime("%Y-%m-%d")}
+    if count:
+        actual_range = {"from": period_stats["first"].strftime("%Y-%m-%d"),
+                        "to": period_stats["last"].strftime("%Y-%m-%d")}
     else:
         actual_range = {"from": start_date.strftime("%Y-%m-%d") if start_date else None,
                         "to": end_date.strftime("%Y-%m-%d") if end_date else None}
@@ -208,7 +234,7 @@ def build_summary_report(
 
     stats = {
         "as_of": now,
-        "boreholes": len(rows),
+        "boreholes": count,
         "projects": projects,
         "sites": sites,
         "avg_final_depth_m": avg_depth,
@@ -217,7 +243,7 @@ def build_summary_report(
         "total_meterage_m": total_meterage,
         "method_breakdown": dict(methods),
         "uscs_breakdown": dict(uscs_counts),
-        "top_contractor": contractors.most_common(1)[0][0] if contractors else None,
+        "top_contractor": most_common(contractors),
         "period_range": actual_range,
         "period_label": period_label,
     }
@@ -238,7 +264,7 @@ def build_summary_report(
     ]
 
     highlights: List[str] = []
-    for r in rows[-3:]:
+    for r in period_stats["latest"]:
         desc = r["soil_description"][:120] if r["soil_description"] else ""
         line = f"{r['start_date']} | {r['borehole_id']} at {r['project']} ({r['site']}): depth {r['final_depth']} m"
         if desc:
@@ -246,9 +272,10 @@ def build_summary_report(
         lines.append(f"- {line}")
         highlights.append(line)
 
-    narrative = None
-    if rows:
-        narrative = _ai_exec_summary(
+    narrative, narrative_job = None, None
+    if count:
+        narrative, narrative_job = _narrative(
+            background_narrative,
             title=f"Soil boring {period} performance",
             instruction=(
                 "You are a geotechnical engineer summarizing soil boring progress. "
@@ -256,6 +283,7 @@ def build_summary_report(
                 "covering drilling volume, groundwater conditions, soil behavior, and any risk signals."
             ),
             payload={"period": period, "stats": stats, "highlights": highlights},
+            priority="summary",
         )
 
     return {
@@ -264,20 +292,28 @@ def build_summary_report(
         "stats": stats,
         "highlights": highlights,
         "narrative": narrative,
+        "narrative_job": narrative_job,
         "period_range": stats["period_range"],
         "period_label": period_label,
     }
 
 
-def build_summary_text(rows_raw: List[Dict[str, Any]], period: str) -> str:
+def build_summary_text(rows_raw: Sequence[Dict[str, Any]], period: str) -> str:
     return build_summary_report(rows_raw, period).get("text", "")
 
 
-def build_dashboard_report(rows_raw: List[Dict[str, Any]]) -> Dict[str, Any]:
-    metrics = compute_dashboard(rows_raw)
-    narrative = None
+def build_dashboard_report(
+    rows_raw: Sequence[Dict[str, Any]],
+    *,
+    metrics: Optional[Dict[str, Any]] = None,
+    background_narrative: bool = False,
+) -> Dict[str, Any]:
+    if metrics is None:
+        metrics = compute_dashboard(rows_raw)
+    narrative, narrative_job = None, None
     if metrics.get("total_boreholes"):
-        narrative = _ai_exec_summary(
+        narrative, narrative_job = _narrative(
+            background_narrative,
             title="Soil boring operations dashboard",
             instruction=(
                 "Review the soil boring KPIs and write a short executive briefing (<=90 words). "
@@ -285,63 +321,116 @@ def build_dashboard_report(rows_raw: List[Dict[str, Any]]) -> Dict[str, Any]:
                 "any notable contractors or methods."
             ),
             payload=metrics,
+            priority="dashboard",
         )
     report = dict(metrics)
     report["narrative"] = narrative
+    report["narrative_job"] = narrative_job
     return report
 
 
-def _ai_exec_summary(title: str, instruction: str, payload: Dict[str, Any]) -> Optional[str]:
-    if not payload:
-        return None
+def _narrative_request(
+    title: str, instruction: str, payload: Dict[str, Any], priority: str
+) -> Tuple[str, Callable[[], Optional[str]]]:
+    key = cache_key(title, instruction, payload, ollama_client.OLLAMA_MODEL)
     try:
         context = json.dumps({"title": title, "data": payload}, indent=2, default=str)
     except (TypeError, ValueError):
         context = str(payload)
+
+    def generate() -> Optional[str]:
+        # Tagged with the cache key, which is also the narrative job id, so job polling can report the queue place.
+        return ollama_ask(instruction, context=context, timeout=90, priority=priority, tag=key)
+
+    return key, generate
+
+
+def _cacheable(text: Optional[str]) -> bool:
+    return not ollama_client.is_unavailable(text)
+
+
+def _ai_exec_summary(title: str, instruction: str, payload: Dict[str, Any], priority: str = "summary") -> Optional[str]:
+    if not payload:
+        return None
+    key, generate = _narrative_request(title, instruction, payload, priority)
     try:
-        return ollama_ask(instruction, context=context, timeout=90)
+        return narrative_cache.get_or_generate(key, generate, cacheable=_cacheable)
     except Exception as exc:  # pragma: no cover
         logger.warning("Executive summary generation failed: %s", exc)
         return None
 
 
-def build_ai_context(question: str, rows_raw: List[Dict[str, Any]], max_rows: int = 30) -> str:
-    rows = [normalize_row(r) for r in rows_raw]
-    rows = [r for r in rows if r.get("start_dt")]
-    rows.sort(key=lambda r: r["start_dt"], reverse=True)
-    q = question.lower()
-    tokens = {t.strip(",. ") for t in q.split() if len(t) >= 3}
-
-    def score_row(r: Dict[str, Any]) -> int:
-        fields = [
-            (r.get("project") or "").lower(),
-            (r.get("site") or "").lower(),
-            (r.get("borehole_id") or "").lower(),
-            (r.get("soil_description") or "").lower(),
-        ]
-        score = 0
-        for field in fields:
-            if any(tok in field for tok in tokens):
-                score += 1
-        return score
-
-    ranked = sorted(rows, key=lambda r: (score_row(r), r["start_dt"]), reverse=True)[:max_rows]
-    as_csv = "BoreholeID,Project,Site,StartDate,Method,FinalDepth_m,USCS,GroundwaterDepth_m,AvgSPT,Remarks\n"
-    csv_lines = []
-    for r in ranked:
-        csv_lines.append(",".join([
-            r["borehole_id"],
-            r["project"],
-            r["site"],
-            r["start_date"],
-            r["method"],
-            str(r["final_depth"] or ""),
-            r["uscs"],
-            str(r["groundwater_depth"] or ""),
-            str(r["avg_spt"] or ""),
-            (r["remarks"] or "").replace(",", ";"),
-        ]))
-    as_csv += "\n".join(csv_lines)
+def _narrative(
+    background: bool, *, title: str, instruction: str, payload: Dict[str, Any], priority: str
+) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """(narrative text, job status). In background mode the text is only set once the job is done."""
+    if not background:
+        return _ai_exec_summary(title, instruction, payload, priority), None
+    key, generate = _narrative_request(title, instruction, payload, priority)
+    job = narratives.submit(key, generate, _cacheable)
+    return (job.text if job.status == "done" else None), {"id": job.id, "status": job.status}
+
+
+AI_CONTEXT_HEADER = "BoreholeID,Project,Site,StartDate,Method,FinalDepth_m,USCS,GroundwaterDepth_m,AvgSPT,Remarks"
+
+
+def _ai_context_line(r: Dict[str, Any]) -> str:
+    return ",".join([
+        r["borehole_id"],
+        r["project"],
+        r["site"],
+        r["start_date"],
+        r["method"],
+        str(r["final_depth"] or ""),
+        r["uscs"],
+        str(r["groundwater_depth"] or ""),
+        str(r["avg_spt"] or ""),
+        (r["remarks"] or "").replace(",", ";"),
+    ])
+
+
+def pack_ai_context(
+    question: str,
+    rows_raw: Sequence[Dict[str, Any]],
+    token_budget: int,
+    *,
+    max_rows: int = MAX_CONTEXT_ROWS,
+    exclude: Collection[int] = (),
+) -> Tuple[List[str], List[int]]:
+    """CSV lines for the most relevant rows that fit ``token_budget``, and their positions.
+
+    Rows are taken in relevance order until the next one would not fit; ``exclude``
+    skips positions the caller already sent.
+    """
+    lines: List[str] = []
+    picked: List[int] = []
+    used = estimate_tokens(AI_CONTEXT_HEADER)
+    for pos in search_rows(rows_raw, question, max_rows + len(exclude)):
+        if pos in exclude:
+            continue
+        line = _ai_context_line(normalize_row(rows_raw[pos]))
+        cost = estimate_tokens(line)
+        if used + cost > token_budget or len(picked) >= max_rows:
+            break
+        lines.append(line)
+        picked.append(pos)
+        used += cost
+    return lines, picked
+
+
+def build_ai_context(
+    question: str,
+    rows_raw: Sequence[Dict[str, Any]],
+    max_rows: int = MAX_CONTEXT_ROWS,
+    *,
+    token_budget: Optional[int] = None,
+) -> str:
+    lines, _ = pack_ai_context(question, rows_raw, token_budget or CONTEXT_TOKENS, max_rows=max_rows)
+    return format_ai_context(lines)
+
+
+def format_ai_context(lines: Sequence[str]) -> str:
+    as_csv = AI_CONTEXT_HEADER + "\n" + "\n".join(lines)
 
     context = (
         "You are assisting geotechnical engineers with soil boring logs. "
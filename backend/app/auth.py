@@ -1,16 +1,21 @@
 from __future__ import annotations
 
+import asyncio
 import base64
+from collections import OrderedDict
 import hashlib
 import hmac
 import json
 import os
+import threading
 import time
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
+from .passwords import hash_password, needs_rehash, pool as password_pool, verify_password
+from . import storage
 from .storage import DATA_PATH
 
 
@@ -18,10 +23,64 @@ USER_FILE = DATA_PATH / "users.json"
 TOKEN_TTL = int(os.environ.get("AUTH_TOKEN_TTL", "28800"))  # 8 hours
 TOKEN_SECRET = os.environ.get("AUTH_TOKEN_SECRET", "change-me-please")
 VALID_ROLES = {"admin", "general"}
+TOKEN_CACHE_SIZE = 1024
 _bearer = HTTPBearer(auto_error=False)
 
+Signature = Tuple[Any, ...]
+
+_users_lock = threading.RLock()
+_users_cache: Optional[Tuple[Optional[Signature], Dict[str, Dict[str, Any]]]] = None
+_token_lock = threading.Lock()
+_token_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()  # token -> validated payload
+_revoked: Dict[str, int] = {}  # email -> tokens issued at or before this time are rejected
+# Checked against when the email is unknown, so a miss costs as much as a wrong password.
+_DUMMY_HASH = hash_password(base64.b64encode(os.urandom(12)).decode("ascii"))
+
+
+def _user_db() -> Optional[Any]:
+    """The SQLite store when users have been migrated into it, else None (users.json)."""
+    backend = storage._backend
+    if getattr(backend, "name", None) == "sqlite" and backend.users_signature() is not None:
+        return backend
+    return None
+
+
+def _users_signature() -> Optional[Tuple[Any, ...]]:
+    db = _user_db()
+    if db is not None:
+        return ("sqlite",) + db.users_signature()
+    try:
+        st = USER_FILE.stat()
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _user_directory() -> Dict[str, Dict[str, Any]]:
+    """Users keyed by lower-cased email, re-read only when users.json changes on disk. Do not mutate."""
+    global _users_cache
+    signature = _users_signature()
+    cached = _users_cache
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    with _users_lock:
+        if _users_cache is None or _users_cache[0] != signature:
+            _users_cache = (signature, _read_users())
+        return _users_cache[1]
+
 
 def _load_users() -> Dict[str, Dict[str, Any]]:
+    return dict(_user_directory())
+
+
+def _read_users() -> Dict[str, Dict[str, Any]]:
+    db = _user_db()
+    if db is not None:
+        return _parse_users(db.read_users())
+    return _read_users_file()
+
+
+def _read_users_file() -> Dict[str, Dict[str, Any]]:
     if not USER_FILE.exists():
         return {}
     try:
@@ -29,6 +88,10 @@ def _load_users() -> Dict[str, Dict[str, Any]]:
             payload = json.load(f)
     except json.JSONDecodeError as exc:
         raise RuntimeError(f"Invalid users.json: {exc}") from exc
+    return _parse_users(payload)
+
+
+def _parse_users(payload: Any) -> Dict[str, Dict[str, Any]]:
     users: Dict[str, Dict[str, Any]] = {}
     if isinstance(payload, dict):
         for email, password in payload.items():
@@ -51,37 +114,59 @@ def _load_users() -> Dict[str, Dict[str, Any]]:
 
 
 def _save_users(users: Dict[str, Dict[str, Any]]) -> None:
+    global _users_cache
     sorted_items = sorted(users.items(), key=lambda item: item[0])
     payload = [
         {"email": item[1]["email"], "password": item[1]["password"], "role": item[1].get("role", "admin")}
         for item in sorted_items
     ]
+    db = _user_db()
+    if db is not None:
+        with _users_lock:
+            db.write_users(payload)
+            _users_cache = (_users_signature(), dict(users))
+        return
     USER_FILE.parent.mkdir(parents=True, exist_ok=True)
-    with USER_FILE.open("w", encoding="utf-8") as f:
-        json.dump(payload, f, indent=2)
-        f.write("\n")
-
-
-def _verify_password(password: str, stored: str) -> bool:
-    if stored.startswith("sha256$"):
-        try:
-            _, salt, digest = stored.split("$", 2)
-        except ValueError:
-            return False
-        calc = hashlib.sha256((salt + password).encode("utf-8")).hexdigest()
-        return hmac.compare_digest(calc, digest)
-    return hmac.compare_digest(stored, password)
+    tmp = USER_FILE.with_suffix(".json.tmp")
+    with _users_lock:
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=2)
+            f.write("\n")
+        os.replace(tmp, USER_FILE)
+        _users_cache = (_users_signature(), dict(users))
 
 
 def authenticate_user(email: str, password: str) -> Dict[str, Any]:
+    """Check credentials (slow by design; see authenticate_user_async)."""
     email_key = (email or "").strip().lower()
-    users = _load_users()
-    user = users.get(email_key)
-    if not user or not _verify_password(password or "", user["password"]):
+    user = _user_directory().get(email_key)
+    if not user:
+        verify_password(password or "", _DUMMY_HASH)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    if not verify_password(password or "", user["password"]):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    if needs_rehash(user["password"]):
+        _rehash(email_key, user["password"], password)
     return user
 
 
+def _rehash(email_key: str, old_hash: str, password: str) -> None:
+    """Upgrade a legacy or outdated hash now that we know the password."""
+    new_hash = hash_password(password)
+    with _users_lock:
+        users = _load_users()
+        user = users.get(email_key)
+        if user is None or user["password"] != old_hash:
+            return  # changed meanwhile
+        users[email_key] = {**user, "password": new_hash}
+        _save_users(users)
+
+
+async def authenticate_user_async(email: str, password: str) -> Dict[str, Any]:
+    """authenticate_user on the bounded hashing pool, keeping request workers free."""
+    return await asyncio.wrap_future(password_pool.submit(authenticate_user, email, password))
+
+
 def _sign(payload: str) -> str:
     secret = TOKEN_SECRET.encode("utf-8")
     return hmac.new(secret, payload.encode("utf-8"), hashlib.sha256).hexdigest()
@@ -101,13 +186,55 @@ def _decode_payload(token: str) -> Dict[str, Any]:
 
 
 def generate_token(email: str) -> str:
-    payload = {"email": email, "exp": int(time.time()) + TOKEN_TTL}
+    now = int(time.time())
+    payload = {"email": email, "iat": now, "exp": now + TOKEN_TTL}
     encoded = _encode_payload(payload)
     signature = _sign(encoded)
     return f"{encoded}.{signature}"
 
 
+def revoke_tokens(email: str) -> None:
+    """Reject every token issued to ``email`` so far, cached or not."""
+    key = email.lower()
+    now = int(time.time())
+    with _token_lock:
+        _revoked[key] = now
+        for cached, payload in list(_token_cache.items()):
+            if str(payload.get("email", "")).lower() == key:
+                del _token_cache[cached]
+        # Entries older than a token lifetime only cover tokens that have expired anyway.
+        for stale in [e for e, at in _revoked.items() if at < now - TOKEN_TTL]:
+            del _revoked[stale]
+
+
+def _is_revoked(payload: Dict[str, Any]) -> bool:
+    revoked_at = _revoked.get(str(payload.get("email", "")).lower())
+    if revoked_at is None:
+        return False
+    issued = payload.get("iat", payload.get("exp", 0) - TOKEN_TTL)
+    return issued <= revoked_at
+
+
 def _validate_token(token: str) -> Dict[str, Any]:
+    now = int(time.time())
+    with _token_lock:
+        payload = _token_cache.get(token)
+        if payload is not None:
+            if payload.get("exp", 0) >= now and not _is_revoked(payload):
+                _token_cache.move_to_end(token)
+                return payload
+            del _token_cache[token]
+    payload = _verify_token(token)
+    with _token_lock:
+        if _is_revoked(payload):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revoked")
+        _token_cache[token] = payload
+        while len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+    return payload
+
+
+def _verify_token(token: str) -> Dict[str, Any]:
     try:
         encoded, signature = token.rsplit(".", 1)
     except ValueError:
@@ -121,6 +248,14 @@ def _validate_token(token: str) -> Dict[str, Any]:
     return payload
 
 
+def token_email(token: str) -> Optional[str]:
+    """Email in a valid token, or None; for callers that only want to know who is asking."""
+    try:
+        return _validate_token(token).get("email")
+    except HTTPException:
+        return None
+
+
 def get_current_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(_bearer)) -> Dict[str, Any]:
     if not credentials or credentials.scheme.lower() != "bearer":
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Authorization header missing")
@@ -128,22 +263,14 @@ def get_current_user(credentials: Optional[HTTPAuthorizationCredentials] = Depen
     email = payload.get("email")
     if not email:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token missing email")
-    users = _load_users()
-    user = users.get(email.lower())
+    user = _user_directory().get(email.lower())
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User no longer exists")
     return {"email": user["email"], "role": user.get("role", "admin")}
 
 
-def _hash_password(password: str) -> str:
-    salt = os.urandom(8).hex()
-    digest = hashlib.sha256((salt + password).encode("utf-8")).hexdigest()
-    return f"sha256${salt}${digest}"
-
-
 def list_users() -> list[dict[str, str]]:
-    users = _load_users()
-    return [{"email": u["email"], "role": u.get("role", "admin")} for u in users.values()]
+    return [{"email": u["email"], "role": u.get("role", "admin")} for u in _user_directory().values()]
 
 
 def create_user(email: str, password: str, role: str) -> dict[str, str]:
@@ -154,18 +281,23 @@ def create_user(email: str, password: str, role: str) -> dict[str, str]:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail=f"Role must be one of: {', '.join(sorted(VALID_ROLES))}"
         )
-    users = _load_users()
-    if email_key in users:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="User already exists")
-    users[email_key] = {"email": email, "password": _hash_password(password), "role": role}
-    _save_users(users)
+    # Hash on the bounded pool before locking, so the directory stays usable meanwhile.
+    password_hash = password_pool.submit(hash_password, password).result()
+    with _users_lock:
+        users = _load_users()
+        if email_key in users:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="User already exists")
+        users[email_key] = {"email": email, "password": password_hash, "role": role}
+        _save_users(users)
     return {"email": email, "role": role}
 
 
 def delete_user(email: str) -> None:
     email_key = (email or "").strip().lower()
-    users = _load_users()
-    if email_key not in users:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-    users.pop(email_key)
-    _save_users(users)
+    with _users_lock:
+        users = _load_users()
+        if email_key not in users:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+        users.pop(email_key)
+        _save_users(users)
+    revoke_tokens(email_key)
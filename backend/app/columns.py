@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from itertools import repeat
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .parsing import parse_date, parse_float
+
+
+# Normalised name -> CSV column, mirroring analytics.normalize_row.
+FLOAT_FIELDS: Dict[str, str] = {
+    "latitude": "Latitude",
+    "longitude": "Longitude",
+    "target_depth": "TargetDepth_m",
+    "final_depth": "FinalDepth_m",
+    "groundwater_depth": "GroundwaterDepth_m",
+    "avg_spt": "Avg_SPT_N60",
+}
+CATEGORY_FIELDS: Dict[str, str] = {
+    "project": "ProjectName",
+    "site": "SiteName",
+    "method": "DrillingMethod",
+    "uscs": "USCS_Class",
+    "contractor": "Contractor",
+}
+
+Selection = Union[slice, np.ndarray]
+_ALL = slice(None)
+_NAT = np.datetime64("NaT", "D")
+
+
+class Categorical:
+    """Integer codes into ``labels``; -1 marks an empty value."""
+
+    __slots__ = ("codes", "labels")
+
+    def __init__(self, codes: np.ndarray, labels: Sequence[str]):
+        self.codes = codes
+        self.labels = list(labels)
+
+    def counts(self, sel: Selection = _ALL) -> Dict[str, int]:
+        """Value counts, ordered by first appearance like a Counter fed in row order."""
+        selected = self.codes[sel]
+        codes = selected[selected >= 0]
+        if not codes.size:
+            return {}
+        if selected.size == self.codes.size:
+            # Codes are assigned in first-appearance order, so bincount is already ordered.
+            counts = np.bincount(codes, minlength=len(self.labels))
+            return {label: int(n) for label, n in zip(self.labels, counts) if n}
+        uniq, first, counts = np.unique(codes, return_index=True, return_counts=True)
+        order = np.argsort(first, kind="stable")
+        return {self.labels[uniq[i]]: int(counts[i]) for i in order}
+
+    def distinct(self, sel: Selection = _ALL) -> List[str]:
+        return sorted(self.counts(sel))
+
+    def take(self, idx: np.ndarray) -> "Categorical":
+        """The entries at ``idx``, recoded so codes again follow first appearance."""
+        codes = self.codes[idx]
+        uniq, first = np.unique(codes[codes >= 0], return_index=True)
+        ranked = uniq[np.argsort(first, kind="stable")]
+        # One spare slot so that code -1 maps to -1.
+        remap = np.full(len(self.labels) + 1, -1, dtype=np.int32)
+        remap[ranked] = np.arange(ranked.size, dtype=np.int32)
+        return Categorical(remap[codes], [self.labels[c] for c in ranked])
+
+
+def to_datetime(value: np.datetime64) -> datetime:
+    return datetime.combine(value.item(), datetime.min.time())
+
+
+def most_common(counts: Dict[str, int]) -> Optional[str]:
+    # max() keeps the first of equal counts, matching Counter.most_common(1).
+    return max(counts, key=counts.__getitem__) if counts else None
+
+
+class RowColumns:
+    """The values normalize_row parses, as typed columns in row order.
+
+    Missing values are NaT, NaN or code -1. ``parse`` can reuse the entries of an
+    earlier parse for rows that are the very same dict objects, so a new snapshot
+    version (or rows loaded from the binary snapshot plus a journal) only parses the
+    rows that changed.
+    """
+
+    __slots__ = ("start", "end", "floats", "gw_flag", "cats")
+
+    def __init__(
+        self,
+        start: np.ndarray,
+        end: np.ndarray,
+        floats: Dict[str, np.ndarray],
+        gw_flag: np.ndarray,
+        cats: Dict[str, Categorical],
+    ):
+        self.start = start
+        self.end = end
+        self.floats = floats
+        self.gw_flag = gw_flag
+        self.cats = cats
+
+    def __len__(self) -> int:
+        return int(self.start.size)
+
+    @classmethod
+    def parse(
+        cls,
+        rows: Sequence[Dict[str, Any]],
+        reuse: Optional[Tuple[Sequence[Dict[str, Any]], "RowColumns"]] = None,
+    ) -> "RowColumns":
+        n = len(rows)
+        if reuse is None:
+            src = np.full(n, -1, dtype=np.int64)
+        else:
+            where = dict(zip(map(id, reuse[0]), range(len(reuse[0]))))
+            src = np.fromiter(map(where.get, map(id, rows), repeat(-1)), dtype=np.int64, count=n)
+        fresh = np.flatnonzero(src < 0)
+        kept = np.flatnonzero(src >= 0)
+        picked = [rows[i] for i in fresh]
+        dates: Dict[Any, Any] = {}
+
+        def day(value: Any) -> Any:
+            if value not in dates:
+                dt = parse_date(value)
+                dates[value] = np.datetime64(dt.date(), "D") if dt else _NAT
+            return dates[value]
+
+        prev = reuse[1] if reuse is not None else None
+
+        def column(previous: Callable[[RowColumns], np.ndarray], parsed: Sequence[Any], dtype: Any) -> np.ndarray:
+            out = np.empty(n, dtype=dtype)
+            if kept.size:
+                out[kept] = previous(prev)[src[kept]]
+            out[fresh] = np.asarray(parsed, dtype=dtype).reshape(len(parsed))
+            return out
+
+        start = column(lambda c: c.start, [day(r.get("StartDate")) for r in picked], "datetime64[D]")
+        end = column(lambda c: c.end, [day(r.get("EndDate")) for r in picked], "datetime64[D]")
+        floats: Dict[str, np.ndarray] = {}
+        for name, key in FLOAT_FIELDS.items():
+            values = [parse_float(r.get(key)) for r in picked]
+            floats[name] = column(
+                lambda c, name=name: c.floats[name], [np.nan if v is None else v for v in values], np.float64
+            )
+        gw_flag = column(
+            lambda c: c.gw_flag,
+            [str(r.get("GroundwaterEncountered")).lower() in ("true", "yes", "1") for r in picked],
+            bool,
+        )
+        cats: Dict[str, Categorical] = {}
+        for name, key in CATEGORY_FIELDS.items():
+            lookup: Dict[str, int] = {}
+            if prev is not None:
+                lookup = {label: i for i, label in enumerate(prev.cats[name].labels)}
+            codes = [lookup.setdefault(v, len(lookup)) if v else -1 for v in (r.get(key) or "" for r in picked)]
+            cats[name] = Categorical(column(lambda c, name=name: c.cats[name].codes, codes, np.int32), list(lookup))
+        return cls(start, end, floats, gw_flag, cats)
+
+
+class ReportColumns:
+    """Typed, columnar copy of the dated report rows, sorted by StartDate.
+
+    Rows without a parseable StartDate are dropped, as every dashboard and summary
+    aggregate ignores them. ``pos`` maps each column entry back to ``rows``.
+    """
+
+    def __init__(self, rows: Sequence[Dict[str, Any]]):
+        self.rows = rows
+        typed = row_columns(rows)
+        dated = np.flatnonzero(~np.isnat(typed.start))
+        order = dated[np.argsort(typed.start[dated], kind="stable")]
+
+        self.pos = order
+        self.start = typed.start[order]
+        end = typed.end[order]
+        self.end = np.where(np.isnat(end), self.start, end)
+        self.floats: Dict[str, np.ndarray] = {name: values[order] for name, values in typed.floats.items()}
+        self.gw_flag = typed.gw_flag[order]
+        self.cats: Dict[str, Categorical] = {name: cat.take(order) for name, cat in typed.cats.items()}
+
+    def __len__(self) -> int:
+        return int(self.start.size)
+
+    def row(self, i: int) -> Dict[str, Any]:
+        return self.rows[int(self.pos[i])]
+
+    def indices(self, sel: Selection = _ALL) -> np.ndarray:
+        return np.arange(len(self))[sel]
+
+    def window(self, lo: Optional[datetime] = None, hi: Optional[datetime] = None) -> slice:
+        """Rows with ``lo <= StartDate <= hi`` as a slice, found by binary search.
+
+        StartDate has day precision, so a bound with a time of day is rounded
+        inward to the first / last whole day it admits.
+        """
+        start, stop = 0, len(self)
+        if lo is not None:
+            first_day = lo.date() if lo.time() == datetime.min.time() else (lo + timedelta(days=1)).date()
+            start = int(np.searchsorted(self.start, np.datetime64(first_day, "D"), side="left"))
+        if hi is not None:
+            stop = int(np.searchsorted(self.start, np.datetime64(hi.date(), "D"), side="right"))
+        return slice(start, max(start, stop))
+
+    def avg(self, name: str, sel: Selection = _ALL, *, where: Optional[np.ndarray] = None) -> Optional[float]:
+        values = self.floats[name][sel]
+        if where is not None:
+            values = values[where[sel]]
+        values = values[~np.isnan(values)]
+        if not values.size:
+            return None
+        return round(float(values.sum()) / values.size, 2)
+
+    def total(self, name: str, sel: Selection = _ALL) -> float:
+        values = self.floats[name][sel]
+        if np.isnan(values).all():
+            return 0  # what sum() of an empty sequence gives, so "0 m" reads as before
+        return float(np.nansum(values))
+
+    def date_bounds(self, sel: Selection = _ALL) -> Tuple[Optional[datetime], Optional[datetime]]:
+        start = self.start[sel]
+        if not start.size:
+            return None, None
+        return to_datetime(start[0]), to_datetime(start[-1])
+
+    def latest(self, n: int) -> List[int]:
+        """Indices of the ``n`` most recent rows; ties keep their original order."""
+        picked: List[int] = []
+        hi = len(self)
+        while hi > 0 and len(picked) < n:
+            lo = int(np.searchsorted(self.start, self.start[hi - 1], side="left"))
+            picked.extend(range(lo, hi))
+            hi = lo
+        return picked[:n]
+
+
+_LOCK = threading.Lock()
+_cached: Optional[Tuple[Sequence[Dict[str, Any]], ReportColumns]] = None
+_typed: Optional[Tuple[Sequence[Dict[str, Any]], RowColumns]] = None
+
+
+def prime(rows: Tuple[Dict[str, Any], ...], typed: RowColumns) -> None:
+    """Hand over already parsed columns for ``rows`` (e.g. mapped from the binary snapshot)."""
+    global _typed
+    with _LOCK:
+        _typed = (rows, typed)
+
+
+def row_columns(rows: Sequence[Dict[str, Any]]) -> RowColumns:
+    """Typed columns for ``rows`` in row order, parsing only rows the last call did not see."""
+    global _typed
+    cached = _typed
+    if cached is not None and cached[0] is rows:
+        return cached[1]
+    typed = RowColumns.parse(rows, reuse=cached)
+    if isinstance(rows, tuple):
+        with _LOCK:
+            _typed = (rows, typed)
+    return typed
+
+
+def columns_for(rows: Sequence[Dict[str, Any]]) -> ReportColumns:
+    """Columns for ``rows``, reused while callers keep passing the same snapshot tuple."""
+    global _cached
+    cached = _cached
+    if cached is not None and cached[0] is rows:
+        return cached[1]
+    columns = ReportColumns(rows)
+    if isinstance(rows, tuple):
+        # Snapshot rows are immutable, so identity is a safe cache key.
+        with _LOCK:
+            _cached = (rows, columns)
+    return columns
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict, deque
+import itertools
+import os
+import threading
+import time
+from typing import Any, Deque, Dict, List, Optional
+
+
+# Highest priority first.
+PRIORITIES = ("interactive", "summary", "dashboard")
+QUEUE_LIMIT = int(os.environ.get("LLM_QUEUE_LIMIT", "32"))
+SERVICE_ESTIMATE = 20.0  # seconds per generation until real timings come in
+
+
+class Rejected(Exception):
+    """Queued work that was shed or outlived its deadline; the message is user-facing."""
+
+
+class Ticket:
+    __slots__ = ("rank", "user", "tag", "deadline", "seq", "future", "started")
+
+    def __init__(self, priority: str, user: str, tag: Optional[str], deadline: float, seq: int):
+        self.rank = PRIORITIES.index(priority)
+        self.user = user
+        self.tag = tag
+        self.deadline = deadline
+        self.seq = seq
+        self.future: Optional[asyncio.Future] = None
+        self.started: Optional[float] = None
+
+    @property
+    def priority(self) -> str:
+        return PRIORITIES[self.rank]
+
+
+class LLMScheduler:
+    """Admits LLM calls into a fixed number of slots.
+
+    Waiting work is served by priority class, round-robin across users within a
+    class. Past ``limit`` queued items the lowest-priority newest item is shed, and
+    items still queued at their deadline are dropped. ``acquire``/``release`` run on
+    one event loop; ``status`` and ``stats`` may be called from any thread.
+    """
+
+    def __init__(self, slots: int, limit: int = QUEUE_LIMIT):
+        self.slots = slots
+        self.limit = limit
+        self.running = 0
+        self.service = SERVICE_ESTIMATE
+        self._queues: List["OrderedDict[str, Deque[Ticket]]"] = [OrderedDict() for _ in PRIORITIES]
+        self._tags: Dict[str, Ticket] = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def ticket(self, priority: str, user: Optional[str] = None, tag: Optional[str] = None, deadline: float = 60) -> Ticket:
+        """A ticket for work that may wait at most ``deadline`` seconds for a slot."""
+        return Ticket(priority, user or "anonymous", tag, time.monotonic() + deadline, next(self._seq))
+
+    def _depth(self) -> int:
+        return sum(len(q) for queues in self._queues for q in queues.values())
+
+    async def acquire(self, ticket: Ticket) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if ticket.tag:
+                self._tags[ticket.tag] = ticket
+            if self.running < self.slots and not self._depth():
+                self.running += 1
+                ticket.started = time.monotonic()
+                return
+            if self._depth() >= self.limit:
+                victim = self._lowest(below=ticket.rank)
+                if victim is None:
+                    self._forget(ticket)
+                    raise Rejected("too many AI requests are queued; try again shortly.")
+                self._drop(victim)
+                victim.future.set_exception(Rejected("dropped for higher-priority AI work; try again shortly."))
+            ticket.future = loop.create_future()
+            self._queues[ticket.rank].setdefault(ticket.user, deque()).append(ticket)
+        timer = loop.call_later(max(0.0, ticket.deadline - time.monotonic()), self._expire, ticket)
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            with self._lock:
+                if ticket.started is None:
+                    self._drop(ticket)
+                    granted = False
+                else:
+                    granted = True
+            if granted:
+                self.release(ticket)
+            raise
+        finally:
+            timer.cancel()
+
+    def release(self, ticket: Ticket) -> None:
+        with self._lock:
+            if ticket.started is not None:
+                # Moving average of generation time, for wait estimates.
+                self.service = 0.8 * self.service + 0.2 * (time.monotonic() - ticket.started)
+            self._forget(ticket)
+            self.running -= 1
+            while self.running < self.slots:
+                nxt = self._next()
+                if nxt is None:
+                    break
+                self.running += 1
+                nxt.started = time.monotonic()
+                nxt.future.set_result(None)
+
+    def _next(self) -> Optional[Ticket]:
+        for queues in self._queues:
+            if queues:
+                user, waiting = queues.popitem(last=False)
+                ticket = waiting.popleft()
+                if waiting:
+                    queues[user] = waiting  # back of the line for this user's next item
+                return ticket
+        return None
+
+    def _lowest(self, below: int) -> Optional[Ticket]:
+        for rank in range(len(PRIORITIES) - 1, below, -1):
+            waiting = [q[-1] for q in self._queues[rank].values()]
+            if waiting:
+                return max(waiting, key=lambda t: t.seq)
+        return None
+
+    def _drop(self, ticket: Ticket) -> None:
+        queues = self._queues[ticket.rank]
+        waiting = queues.get(ticket.user)
+        if waiting is not None and ticket in waiting:
+            waiting.remove(ticket)
+            if not waiting:
+                del queues[ticket.user]
+        self._forget(ticket)
+
+    def _forget(self, ticket: Ticket) -> None:
+        if ticket.tag and self._tags.get(ticket.tag) is ticket:
+            del self._tags[ticket.tag]
+
+    def _expire(self, ticket: Ticket) -> None:
+        with self._lock:
+            if ticket.started is not None or ticket.future.done():
+                return
+            self._drop(ticket)
+        ticket.future.set_exception(Rejected("timed out waiting for a free AI slot; try again shortly."))
+
+    def _ahead(self, ticket: Ticket) -> int:
+        ahead = sum(len(q) for queues in self._queues[: ticket.rank] for q in queues.values())
+        queues = self._queues[ticket.rank]
+        users = list(queues)
+        mine = users.index(ticket.user)
+        k = queues[ticket.user].index(ticket)
+        for i, user in enumerate(users):
+            # Round-robin serves k items from every user (k + 1 from users ahead of ours) first.
+            ahead += k if i == mine else min(len(queues[user]), k + (i < mine))
+        return ahead
+
+    def status(self, ticket: Ticket) -> Dict[str, Any]:
+        with self._lock:
+            if ticket.started is not None:
+                return {"state": "running", "priority": ticket.priority}
+            if ticket.future is None or ticket.future.done():
+                return {"state": "finished", "priority": ticket.priority}
+            ahead = self._ahead(ticket)
+            return {
+                "state": "queued",
+                "priority": ticket.priority,
+                "position": ahead + 1,
+                "eta_s": round((ahead // self.slots + 1) * self.service, 1),
+            }
+
+    def status_of(self, tag: str) -> Optional[Dict[str, Any]]:
+        ticket = self._tags.get(tag)
+        return self.status(ticket) if ticket is not None else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "slots": self.slots,
+                "running": self.running,
+                "queued": {
+                    priority: sum(len(q) for q in queues.values())
+                    for priority, queues in zip(PRIORITIES, self._queues)
+                },
+                "limit": self.limit,
+                "avg_generation_s": round(self.service, 1),
+            }
@@ -2,7 +2,8 @@ from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import RedirectResponse
 
-from .routers import reports, ai, summaries, dashboard, auth, users
+from . import ollama_client
+from .routers import reports, ai, summaries, dashboard, auth, users, narratives, samples, geo
 
 
 app = FastAPI(title="DDR Ops API")
@@ -22,6 +23,9 @@ app.include_router(summaries.router)
 app.include_router(dashboard.router)
 app.include_router(auth.router)
 app.include_router(users.router)
+app.include_router(narratives.router)
+app.include_router(samples.router)
+app.include_router(geo.router)
 
 
 @app.middleware("http")
@@ -35,6 +39,11 @@ async def _dedupe_api_prefix(request: Request, call_next):
     return await call_next(request)
 
 
+@app.on_event("shutdown")
+def _close_ollama_client():
+    ollama_client.close()
+
+
 @app.get("/")
 def root():
     return {"status": "ok", "service": "ddr-ops"}
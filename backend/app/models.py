@@ -31,6 +31,8 @@ class Query(BaseModel):
     context: Optional[str] = None
     # Optional conversational history for follow-ups
     history: Optional[List[Dict[str, str]]] = None  # items like {"role": "user"|"assistant", "content": "..."}
+    # Server-side chat from POST /api/ai/sessions; replaces history when set
+    session_id: Optional[str] = None
 
 
 class Summary(BaseModel):
@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .storage import DATA_PATH
+
+
+CACHE_SIZE = int(os.environ.get("NARRATIVE_CACHE_SIZE", "256"))
+CACHE_TTL = int(os.environ.get("NARRATIVE_CACHE_TTL", "3600"))  # seconds
+CACHE_PERSIST = os.environ.get("NARRATIVE_CACHE_PERSIST", "0").lower() in ("1", "true", "yes")
+CACHE_DIR = DATA_PATH / "narratives"
+WORKERS = int(os.environ.get("NARRATIVE_WORKERS", "2"))
+JOB_LIMIT = 512
+
+# Payload keys that change on every request without changing what the narrative should say.
+VOLATILE_KEYS = frozenset({"as_of"})
+
+logger = logging.getLogger(__name__)
+
+
+def _canonical(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items() if k not in VOLATILE_KEYS}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    return value
+
+
+def cache_key(title: str, instruction: str, payload: Dict[str, Any], model: str) -> str:
+    canonical = json.dumps(
+        [title, instruction, _canonical(payload), model],
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class NarrativeCache:
+    """LRU + TTL cache of generated narratives, with single-flight generation per key."""
+
+    def __init__(self, size: int, ttl: int, directory: Optional[Any] = None):
+        self.size = size
+        self.ttl = ttl
+        self.directory = directory
+        self._items: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        if directory is not None:
+            directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str):
+        return self.directory / f"{key}.json"
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                if now - item[0] < self.ttl:
+                    self._items.move_to_end(key)
+                    return item[1]
+                del self._items[key]
+        if self.directory is None:
+            return None
+        try:
+            with self._path(key).open("r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if now - stored.get("created", 0) >= self.ttl:
+            return None
+        self._remember(key, stored["created"], stored["text"])
+        return stored["text"]
+
+    def _remember(self, key: str, created: float, text: str) -> None:
+        with self._lock:
+            self._items[key] = (created, text)
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def put(self, key: str, text: str) -> None:
+        created = time.time()
+        self._remember(key, created, text)
+        if self.directory is None:
+            return
+        tmp = self._path(key).with_suffix(".tmp")
+        try:
+            with tmp.open("w", encoding="utf-8") as f:
+                json.dump({"created": created, "text": text}, f)
+            os.replace(tmp, self._path(key))
+        except OSError as exc:
+            logger.warning("Could not persist narrative %s: %s", key, exc)
+
+    def get_or_generate(
+        self,
+        key: str,
+        generate: Callable[[], Optional[str]],
+        cacheable: Callable[[Optional[str]], bool] = bool,
+    ) -> Optional[str]:
+        """Return the cached narrative or generate it; concurrent callers share one generation."""
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            text = generate()
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            if cacheable(text):
+                self.put(key, text)
+            future.set_result(text)
+            return text
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+
+cache = NarrativeCache(CACHE_SIZE, CACHE_TTL, CACHE_DIR if CACHE_PERSIST else None)
+
+
+class NarrativeJob:
+    """Background generation of one narrative. The id is the content cache key."""
+
+    __slots__ = ("id", "status", "text", "created", "done")
+
+    def __init__(self, job_id: str):
+        self.id = job_id
+        self.status = "pending"  # pending -> running -> done | failed
+        self.text: Optional[str] = None
+        self.created = time.time()
+        self.done = threading.Event()
+
+    def finish(self, status: str, text: Optional[str]) -> None:
+        self.status = status
+        self.text = text
+        self.done.set()
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"id": self.id, "status": self.status, "text": self.text}
+
+
+_executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="narrative")
+_jobs: "OrderedDict[str, NarrativeJob]" = OrderedDict()
+_jobs_lock = threading.Lock()
+
+
+def _run(job: NarrativeJob, generate: Callable[[], Optional[str]], cacheable: Callable[[Optional[str]], bool]) -> None:
+    job.status = "running"
+    try:
+        text = cache.get_or_generate(job.id, generate, cacheable)
+    except Exception as exc:
+        logger.warning("Narrative generation failed: %s", exc)
+        job.finish("failed", None)
+        return
+    # Uncacheable answers (e.g. Ollama unreachable) are reported but retried on the next submit.
+    job.finish("done" if cacheable(text) else "failed", text)
+
+
+def submit(
+    key: str,
+    generate: Callable[[], Optional[str]],
+    cacheable: Callable[[Optional[str]], bool] = bool,
+) -> NarrativeJob:
+    """Start (or join) background generation for ``key`` and return its job without waiting."""
+    with _jobs_lock:
+        job = _jobs.get(key)
+        if job is not None and job.status != "failed" and time.time() - job.created < cache.ttl:
+            return job
+        job = NarrativeJob(key)
+        cached = cache.get(key)
+        if cached is not None:
+            job.finish("done", cached)
+        _jobs[key] = job
+        _jobs.move_to_end(key)
+        while len(_jobs) > JOB_LIMIT:
+            _jobs.popitem(last=False)
+    if cached is None:
+        _executor.submit(_run, job, generate, cacheable)
+    return job
+
+
+def get_job(job_id: str) -> Optional[NarrativeJob]:
+    with _jobs_lock:
+        return _jobs.get(job_id)
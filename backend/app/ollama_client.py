@@ -1,24 +1,269 @@
+import asyncio
+import hashlib
+import json
+import logging
 import os
-from typing import Optional, List, Dict
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Union
 
-import requests
-from requests import RequestException
+import httpx
+
+from .llm_scheduler import LLMScheduler, Rejected, Ticket
 
 
 OLLAMA_URL = os.environ.get("OLLAMA_URL", "").strip()
 OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "gpt-oss:120b-cloud")
+MAX_CONCURRENCY = int(os.environ.get("OLLAMA_MAX_CONCURRENCY", "4"))
+CONNECT_TIMEOUT = float(os.environ.get("OLLAMA_CONNECT_TIMEOUT", "5"))
+BREAKER_FAILURES = int(os.environ.get("OLLAMA_BREAKER_FAILURES", "3"))
+BREAKER_RESET = float(os.environ.get("OLLAMA_BREAKER_RESET", "30"))  # seconds before a half-open probe
+# How long Ollama keeps the model (and its prompt cache) loaded between calls.
+KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m").strip()
+STATUS_INTERVAL = 1.0  # seconds between queue updates on a waiting stream
 
 
+UNAVAILABLE_PREFIX = "AI service unavailable"
 UNAVAILABLE_MSG = (
     "AI service unavailable: cannot reach Ollama. "
     "Set OLLAMA_URL (e.g., http://localhost:11434/api/chat) or disable AI features."
 )
+NOT_CONFIGURED_MSG = "AI service unavailable: OLLAMA_URL is not configured."
 
+logger = logging.getLogger(__name__)
 
-def ask(question: str, context: Optional[str] = None, history: Optional[List[Dict[str, str]]] = None, timeout: int = 60) -> str:
-    if not OLLAMA_URL:
-        return "AI service unavailable: OLLAMA_URL is not configured."
 
+def is_unavailable(answer: Optional[str]) -> bool:
+    return not answer or answer.startswith(UNAVAILABLE_PREFIX)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough prompt size: about four characters per token for English text and CSV."""
+    return len(text) // 4 + 1
+
+
+class CircuitBreaker:
+    """Fails fast after repeated Ollama errors; lets one probe through every ``reset`` seconds."""
+
+    def __init__(self, failures: int, reset: float):
+        self.failures = failures
+        self.reset = reset
+        self.state = "closed"  # closed -> open -> half_open -> closed | open
+        self._errors = 0
+        self._opened = 0.0
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        now = time.monotonic()
+        if now - self._opened >= self.reset:
+            # One probe per window, so an abandoned probe cannot wedge the breaker half-open.
+            self.state = "half_open"
+            self._opened = now
+            return True
+        return False
+
+    def retry_in(self) -> int:
+        return max(0, int(self.reset - (time.monotonic() - self._opened)))
+
+    def success(self) -> None:
+        self.state = "closed"
+        self._errors = 0
+
+    def failure(self) -> None:
+        self._errors += 1
+        if self.state == "half_open" or self._errors >= self.failures:
+            if self.state != "open":
+                logger.warning("Ollama circuit opened after %d failure(s)", self._errors)
+            self.state = "open"
+            self._opened = time.monotonic()
+
+
+class _Shared:
+    """One in-flight Ollama call and the number of callers waiting for its answer."""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Task[str]"):
+        self.task = task
+        self.waiters = 0
+
+
+class _Pool:
+    """Pooled AsyncClient on a private event loop, shared by sync and async callers.
+
+    All client state (semaphore, coalescing table, breaker) lives on that loop's thread.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self.scheduler = LLMScheduler(MAX_CONCURRENCY)
+        self._inflight: Dict[str, _Shared] = {}
+        self.breaker = CircuitBreaker(BREAKER_FAILURES, BREAKER_RESET)
+
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="ollama-client", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop())
+
+    def _ready(self) -> None:
+        if self._client is None:
+            limits = httpx.Limits(max_connections=MAX_CONCURRENCY, max_keepalive_connections=MAX_CONCURRENCY)
+            self._client = httpx.AsyncClient(limits=limits)
+
+    def _fail_fast(self) -> Optional[str]:
+        if self.breaker.allow():
+            return None
+        return f"{UNAVAILABLE_PREFIX}: Ollama is not responding; retrying in {self.breaker.retry_in()} s."
+
+    async def _admit(self, ticket: Ticket) -> Optional[str]:
+        """Wait for a scheduler slot; returns an unavailable message if the work was shed."""
+        try:
+            await self.scheduler.acquire(ticket)
+        except Rejected as exc:
+            return f"{UNAVAILABLE_PREFIX}: {exc}"
+        return None
+
+    async def chat(self, payload: Dict[str, Any], timeout: float, ticket: Ticket) -> str:
+        """Answer ``payload``, sharing one Ollama call between identical concurrent prompts.
+
+        The call runs detached from whichever caller started it, so a caller that goes
+        away does not cancel it for the others; it is cancelled once nobody waits.
+        """
+        self._ready()
+        key = hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+        shared = self._inflight.get(key)
+        if shared is None:
+            shared = self._inflight[key] = _Shared(asyncio.ensure_future(self._run(key, payload, timeout, ticket)))
+        shared.waiters += 1
+        try:
+            return await asyncio.shield(shared.task)
+        finally:
+            shared.waiters -= 1
+            if not shared.waiters:
+                self._forget(key, shared.task)
+                shared.task.cancel()
+
+    async def _run(self, key: str, payload: Dict[str, Any], timeout: float, ticket: Ticket) -> str:
+        try:
+            return await self._chat(payload, timeout, ticket)
+        finally:
+            self._forget(key, asyncio.current_task())
+
+    def _forget(self, key: str, task: Optional["asyncio.Task[Any]"]) -> None:
+        shared = self._inflight.get(key)
+        if shared is not None and shared.task is task:
+            del self._inflight[key]
+
+    async def _chat(self, payload: Dict[str, Any], timeout: float, ticket: Ticket) -> str:
+        blocked = self._fail_fast() or await self._admit(ticket)
+        if blocked:
+            return blocked
+        try:
+            try:
+                resp = await self._client.post(
+                    OLLAMA_URL, json=payload, timeout=httpx.Timeout(timeout, connect=CONNECT_TIMEOUT)
+                )
+                resp.raise_for_status()
+                data = resp.json()
+            except (httpx.HTTPError, ValueError):
+                self.breaker.failure()
+                return UNAVAILABLE_MSG
+        finally:
+            self.scheduler.release(ticket)
+        self.breaker.success()
+        return (data.get("message") or {}).get("content", "")
+
+    async def stream(self, payload: Dict[str, Any], timeout: float, ticket: Ticket, out: "queue.Queue[Any]") -> None:
+        """Put queue status dicts and answer chunks on ``out``, then None.
+
+        Cancelling the task gives up the queue place or closes the connection.
+        """
+        self._ready()
+        try:
+            blocked = self._fail_fast()
+            if blocked:
+                out.put(blocked)
+                return
+            admit = asyncio.ensure_future(self._admit(ticket))
+            try:
+                await asyncio.sleep(0)  # let admission run; it is immediate when a slot is free
+                while not admit.done():
+                    out.put(self.scheduler.status(ticket))
+                    await asyncio.wait({admit}, timeout=STATUS_INTERVAL)
+            finally:
+                admit.cancel()
+            blocked = admit.result()
+            if blocked:
+                out.put(blocked)
+                return
+            try:
+                try:
+                    async with self._client.stream(
+                        "POST", OLLAMA_URL, json=payload, timeout=httpx.Timeout(timeout, connect=CONNECT_TIMEOUT)
+                    ) as resp:
+                        resp.raise_for_status()
+                        async for line in resp.aiter_lines():
+                            if not line:
+                                continue
+                            chunk = json.loads(line)
+                            text = (chunk.get("message") or {}).get("content", "")
+                            if text:
+                                out.put(text)
+                            if chunk.get("done"):
+                                break
+                except (httpx.HTTPError, ValueError):
+                    self.breaker.failure()
+                    out.put(UNAVAILABLE_MSG)
+                    return
+            finally:
+                self.scheduler.release(ticket)
+            self.breaker.success()
+        finally:
+            out.put(None)
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _shutdown(self) -> None:
+        """Cancel every call still running on the loop, then close the client."""
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.aclose()
+
+    def close(self) -> None:
+        """Cancel outstanding calls and stop the loop; the next call starts a fresh one.
+
+        The lock is held throughout, so no new call can start until the coalescing
+        table and scheduler, which belong to the old loop, have been replaced.
+        """
+        with self._lock:
+            loop, self._loop = self._loop, None
+            if loop is None:
+                return
+            asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            self._inflight = {}
+            self.scheduler = LLMScheduler(MAX_CONCURRENCY)
+
+
+_pool = _Pool()
+
+
+def _messages(question: str, context: Optional[str], history: Optional[List[Dict[str, str]]]) -> List[Dict[str, str]]:
     messages: List[Dict[str, str]] = [
         {"role": "system", "content": "You analyze soil boring logs and geotechnical data to answer questions accurately."}
     ]
@@ -31,15 +276,98 @@ def ask(question: str, context: Optional[str] = None, history: Optional[List[Dic
             if content:
                 messages.append({"role": role, "content": content})
     messages.append({"role": "user", "content": question})
+    return messages
+
+
+def _payload(question: str, context: Optional[str], history: Optional[List[Dict[str, str]]], stream: bool) -> Dict[str, Any]:
+    payload: Dict[str, Any] = {"model": OLLAMA_MODEL, "messages": _messages(question, context, history), "stream": stream}
+    if KEEP_ALIVE:
+        payload["keep_alive"] = KEEP_ALIVE
+    return payload
+
+
+async def ask_async(
+    question: str,
+    context: Optional[str] = None,
+    history: Optional[List[Dict[str, str]]] = None,
+    timeout: int = 60,
+    *,
+    priority: str = "interactive",
+    user: Optional[str] = None,
+    tag: Optional[str] = None,
+) -> str:
+    """``ask`` for async callers."""
+    if not OLLAMA_URL:
+        return NOT_CONFIGURED_MSG
+    ticket = _pool.scheduler.ticket(priority, user, tag, deadline=timeout)
+    future = _pool.submit(_pool.chat(_payload(question, context, history, False), timeout, ticket))
+    return await asyncio.wrap_future(future)
 
+
+def ask(
+    question: str,
+    context: Optional[str] = None,
+    history: Optional[List[Dict[str, str]]] = None,
+    timeout: int = 60,
+    *,
+    priority: str = "interactive",
+    user: Optional[str] = None,
+    tag: Optional[str] = None,
+) -> str:
+    """Ask Ollama and wait for the full answer.
+
+    Calls queue by ``priority`` (see llm_scheduler.PRIORITIES) and ``user`` for a free
+    slot, for at most ``timeout`` seconds; ``tag`` makes the queue place visible to
+    ``queue_status``. Identical concurrent prompts share one Ollama call.
+    """
+    if not OLLAMA_URL:
+        return NOT_CONFIGURED_MSG
+    ticket = _pool.scheduler.ticket(priority, user, tag, deadline=timeout)
+    return _pool.submit(_pool.chat(_payload(question, context, history, False), timeout, ticket)).result()
+
+
+def ask_stream(
+    question: str,
+    context: Optional[str] = None,
+    history: Optional[List[Dict[str, str]]] = None,
+    timeout: int = 60,
+    *,
+    priority: str = "interactive",
+    user: Optional[str] = None,
+    with_status: bool = False,
+) -> Iterator[Union[str, Dict[str, Any]]]:
+    """Yield answer chunks as Ollama produces them.
+
+    With ``with_status``, queue status dicts (position, eta_s) are yielded while the
+    call waits for a slot. Closing the generator gives up the slot or closes the HTTP
+    connection, which makes Ollama stop generating.
+    """
+    if not OLLAMA_URL:
+        yield NOT_CONFIGURED_MSG
+        return
+    chunks: "queue.Queue[Any]" = queue.Queue()
+    ticket = _pool.scheduler.ticket(priority, user, deadline=timeout)
+    task = _pool.submit(_pool.stream(_payload(question, context, history, True), timeout, ticket, chunks))
     try:
-        resp = requests.post(
-            OLLAMA_URL,
-            json={"model": OLLAMA_MODEL, "messages": messages, "stream": False},
-            timeout=timeout,
-        )
-        resp.raise_for_status()
-        data = resp.json()
-        return (data.get("message") or {}).get("content", "")
-    except RequestException:
-        return UNAVAILABLE_MSG
+        while True:
+            item = chunks.get()
+            if item is None:
+                break
+            if isinstance(item, str) or with_status:
+                yield item
+    finally:
+        task.cancel()
+
+
+def queue_status(tag: str) -> Optional[Dict[str, Any]]:
+    """Queue state of a tagged call: queued (with position and eta_s) or running."""
+    return _pool.scheduler.status_of(tag)
+
+
+def queue_stats() -> Dict[str, Any]:
+    return _pool.scheduler.stats()
+
+
+def close() -> None:
+    """Cancel outstanding calls, close pooled connections and stop the client loop (it restarts on next use)."""
+    _pool.close()
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Optional
+
+
+def parse_float(val: Any) -> Optional[float]:
+    try:
+        if val in (None, "", "None"):
+            return None
+        return float(val)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_date(val: Any) -> Optional[datetime]:
+    if not val:
+        return None
+    s = str(val).strip()
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%Y/%m/%d"):
+        try:
+            return datetime.strptime(s, fmt)
+        except ValueError:
+            continue
+    return None
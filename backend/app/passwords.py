@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+import argparse
+import base64
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import hmac
+import os
+import time
+from typing import Dict, List, Optional
+
+
+SCHEME = os.environ.get("AUTH_HASH_SCHEME", "scrypt")  # scrypt | pbkdf2_sha256
+SCRYPT_N = int(os.environ.get("AUTH_SCRYPT_N", "16384"))
+SCRYPT_R = int(os.environ.get("AUTH_SCRYPT_R", "8"))
+SCRYPT_P = int(os.environ.get("AUTH_SCRYPT_P", "1"))
+PBKDF2_ITERATIONS = int(os.environ.get("AUTH_PBKDF2_ITERATIONS", "600000"))
+HASH_WORKERS = int(os.environ.get("AUTH_HASH_WORKERS", "4"))  # concurrent hash computations
+
+
+def _b64(raw: bytes) -> str:
+    return base64.b64encode(raw).decode("ascii")
+
+
+def _unb64(text: str) -> bytes:
+    return base64.b64decode(text.encode("ascii"))
+
+
+class Verifier(ABC):
+    """One stored-hash format: ``<name>$<params...>$<salt>$<digest>``."""
+
+    name = ""
+
+    @abstractmethod
+    def verify(self, password: str, stored: str) -> bool:
+        ...
+
+    def is_current(self, stored: str) -> bool:
+        """Whether ``stored`` already uses this hasher's scheme and cost."""
+        return False
+
+
+class Hasher(Verifier):
+    """A format new passwords can be stored in."""
+
+    @abstractmethod
+    def hash(self, password: str) -> str:
+        ...
+
+
+class ScryptHasher(Hasher):
+    name = "scrypt"
+
+    def __init__(self, n: int = SCRYPT_N, r: int = SCRYPT_R, p: int = SCRYPT_P):
+        self.n, self.r, self.p = n, r, p
+
+    @staticmethod
+    def _derive(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+        # hashlib's default 32 MiB maxmem is too small for n >= 2**15.
+        return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r * p, dklen=32)
+
+    def hash(self, password: str) -> str:
+        salt = os.urandom(16)
+        digest = self._derive(password, salt, self.n, self.r, self.p)
+        return f"scrypt${self.n}${self.r}${self.p}${_b64(salt)}${_b64(digest)}"
+
+    def verify(self, password: str, stored: str) -> bool:
+        try:
+            _, n, r, p, salt, digest = stored.split("$")
+            calc = self._derive(password, _unb64(salt), int(n), int(r), int(p))
+        except (ValueError, TypeError):
+            return False
+        return hmac.compare_digest(calc, _unb64(digest))
+
+    def is_current(self, stored: str) -> bool:
+        return stored.startswith(f"scrypt${self.n}${self.r}${self.p}$")
+
+
+class Pbkdf2Hasher(Hasher):
+    name = "pbkdf2_sha256"
+
+    def __init__(self, iterations: int = PBKDF2_ITERATIONS):
+        self.iterations = iterations
+
+    def hash(self, password: str) -> str:
+        salt = os.urandom(16)
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, self.iterations)
+        return f"pbkdf2_sha256${self.iterations}${_b64(salt)}${_b64(digest)}"
+
+    def verify(self, password: str, stored: str) -> bool:
+        try:
+            _, iterations, salt, digest = stored.split("$")
+            calc = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), _unb64(salt), int(iterations))
+        except (ValueError, TypeError):
+            return False
+        return hmac.compare_digest(calc, _unb64(digest))
+
+    def is_current(self, stored: str) -> bool:
+        return stored.startswith(f"pbkdf2_sha256${self.iterations}$")
+
+
+class LegacySha256Verifier(Verifier):
+    """The original salted SHA-256 format; verify only, rehashed on next login."""
+
+    name = "sha256"
+
+    def verify(self, password: str, stored: str) -> bool:
+        try:
+            _, salt, digest = stored.split("$", 2)
+        except ValueError:
+            return False
+        calc = hashlib.sha256((salt + password).encode("utf-8")).hexdigest()
+        return hmac.compare_digest(calc, digest)
+
+
+HASHERS: Dict[str, Hasher] = {h.name: h for h in (ScryptHasher(), Pbkdf2Hasher())}
+VERIFIERS: Dict[str, Verifier] = {v.name: v for v in (*HASHERS.values(), LegacySha256Verifier())}
+if SCHEME not in HASHERS:
+    raise RuntimeError(f"AUTH_HASH_SCHEME must be scrypt or pbkdf2_sha256, not {SCHEME!r}")
+
+
+def hash_password(password: str) -> str:
+    return HASHERS[SCHEME].hash(password)
+
+
+def verify_password(password: str, stored: str) -> bool:
+    verifier = VERIFIERS.get(stored.split("$", 1)[0]) if "$" in stored else None
+    if verifier is None:
+        # users.json entries written by hand may hold the plain password.
+        return hmac.compare_digest(stored.encode("utf-8"), password.encode("utf-8"))
+    return verifier.verify(password, stored)
+
+
+def needs_rehash(stored: str) -> bool:
+    return not HASHERS[SCHEME].is_current(stored)
+
+
+# Logins hash on this pool, so a login burst queues here instead of tying up request workers.
+pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="password-hash")
+
+
+def _bench(hasher: Hasher, seconds: float, workers: int) -> Dict[str, float]:
+    stored = hasher.hash("correct horse battery staple")
+    latencies: List[float] = []
+
+    def login() -> None:
+        start = time.perf_counter()
+        hasher.verify("correct horse battery staple", stored)
+        latencies.append(time.perf_counter() - start)
+
+    deadline = time.perf_counter() + seconds
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while time.perf_counter() < deadline:
+            list(executor.map(lambda _: login(), range(workers)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "per_second": len(latencies) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Measure logins per second for each password hash cost.")
+    parser.add_argument("--seconds", type=float, default=3.0, help="time spent on each setting")
+    parser.add_argument("--workers", type=int, default=HASH_WORKERS, help="concurrent hashes (AUTH_HASH_WORKERS)")
+    args = parser.parse_args(argv)
+
+    settings: List[Hasher] = [ScryptHasher(n=2**k) for k in (13, 14, 15, 16)]
+    settings += [Pbkdf2Hasher(iterations=i) for i in (100_000, 310_000, 600_000, 1_000_000)]
+    print(f"{args.workers} worker(s), {args.seconds:g} s per setting")
+    print(f"{'setting':<34}{'logins/s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for hasher in settings:
+        label = hasher.hash("x").rsplit("$", 2)[0]
+        result = _bench(hasher, args.seconds, args.workers)
+        print(f"{label:<34}{result['per_second']:>10.1f}{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import base64
+from bisect import bisect_left, bisect_right, insort
+import copy
+import json
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from .parsing import parse_date
+from .storage import Change, ReportSnapshot, snapshot, subscribe
+
+
+# Query parameter name -> CSV column it filters on.
+FILTER_FIELDS: Dict[str, str] = {
+    "project": "ProjectName",
+    "site": "SiteName",
+    "contractor": "Contractor",
+    "method": "DrillingMethod",
+    "uscs": "USCS_Class",
+}
+
+SortKey = Tuple[str, str, int]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(key: SortKey) -> str:
+    raw = json.dumps(list(key), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> SortKey:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        date_key, borehole_id, rowid = json.loads(raw.decode("utf-8"))
+        return str(date_key), str(borehole_id), int(rowid)
+    except (ValueError, TypeError) as exc:
+        raise InvalidCursor("Invalid cursor") from exc
+
+
+def sort_key(rowid: int, row: Dict[str, Any]) -> SortKey:
+    """(ISO StartDate or "", BoreholeID, rowid); the rowid keeps keys unique when IDs are blank."""
+    dt = parse_date(row.get("StartDate"))
+    return (dt.strftime("%Y-%m-%d") if dt else "", str(row.get("BoreholeID") or ""), rowid)
+
+
+def _field_values(row: Dict[str, Any]) -> Iterator[Tuple[str, str]]:
+    for name, column in FILTER_FIELDS.items():
+        value = (row.get(column) or "").strip().lower()
+        if value:
+            yield name, value
+
+
+def _merge(keys: List[SortKey], added: List[SortKey]) -> None:
+    if len(added) == 1:
+        insort(keys, added[0])
+    elif added:
+        # A bulk import: one merge beats an insertion per row.
+        keys.extend(added)
+        keys.sort()
+
+
+class ReportIndex:
+    """Secondary indexes over one report snapshot.
+
+    Rows are ranked by (StartDate, BoreholeID, rowid); StartDate is normalised to ISO
+    so the mixed date formats in the CSV order correctly, and undated rows sort first.
+    Each filter column maps a lower-cased value to the ascending keys holding it.
+    An index is never changed once built: ``updated`` derives the next version's
+    index from write deltas, so readers paging through an older one are unaffected.
+    """
+
+    def __init__(self, snap: ReportSnapshot):
+        self.version = snap.version
+        self.snap = snap
+        self.keys: List[SortKey] = sorted(map(sort_key, snap.rowids, snap.rows))
+        self.by_field: Dict[str, Dict[str, List[SortKey]]] = {name: {} for name in FILTER_FIELDS}
+        for key in self.keys:
+            for name, value in _field_values(self.row(key)):
+                self.by_field[name].setdefault(value, []).append(key)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def row(self, key: SortKey) -> Dict[str, Any]:
+        return self.snap.rows[bisect_left(self.snap.rowids, key[2])]
+
+    def updated(self, snap: ReportSnapshot, changes: Sequence[Change]) -> "ReportIndex":
+        """The index of ``snap``, given the writes that turned this version into it.
+
+        Only the key list and the postings the writes touch are copied; nothing is
+        re-parsed or re-sorted beyond the changed rows.
+        """
+        net: Dict[int, Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]] = {}
+        for rowid, old, new in changes:
+            net[rowid] = (net[rowid][0] if rowid in net else old, new)
+
+        index = copy.copy(self)
+        index.version = snap.version
+        index.snap = snap
+        index.keys = list(self.keys)
+        index.by_field = {name: dict(values) for name, values in self.by_field.items()}
+        copied: Set[Tuple[str, str]] = set()
+
+        def postings(name: str, value: str) -> List[SortKey]:
+            values = index.by_field[name]
+            if (name, value) not in copied:
+                copied.add((name, value))
+                values[value] = list(values.get(value, ()))
+            return values[value]
+
+        added: List[SortKey] = []
+        added_postings: Dict[Tuple[str, str], List[SortKey]] = {}
+        for rowid, (old, new) in net.items():
+            if old is not None:
+                key = sort_key(rowid, old)
+                del index.keys[bisect_left(index.keys, key)]
+                for name, value in _field_values(old):
+                    keys = postings(name, value)
+                    del keys[bisect_left(keys, key)]
+            if new is not None:
+                key = sort_key(rowid, new)
+                added.append(key)
+                for field in _field_values(new):
+                    added_postings.setdefault(field, []).append(key)
+        _merge(index.keys, added)
+        for (name, value), keys in added_postings.items():
+            _merge(postings(name, value), keys)
+        for name, value in copied:
+            if not index.by_field[name][value]:
+                del index.by_field[name][value]
+        return index
+
+    def match(
+        self,
+        filters: Optional[Dict[str, Optional[str]]] = None,
+        *,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        after: Optional[SortKey] = None,
+        descending: bool = False,
+    ) -> Tuple[Iterator[SortKey], int]:
+        """Return (keys of the matching rows in key order, estimated match count).
+
+        ``after`` is the key of the last row already seen (keyset pagination).
+        The estimate is exact for zero or one equality filter and assumes independent
+        columns beyond that.
+        """
+        lower = (date_from,) if date_from else None
+        upper = (date_to + "\x00",) if date_to else None  # past every key dated date_to
+
+        def window(keys: List[SortKey], after: Optional[SortKey] = None) -> Tuple[int, int]:
+            start = bisect_left(keys, lower) if lower else 0
+            stop = bisect_left(keys, upper) if upper else len(keys)
+            if after is not None:
+                if descending:
+                    stop = min(stop, bisect_left(keys, after))
+                else:
+                    start = max(start, bisect_right(keys, after))
+            return start, stop
+
+        total = len(self.keys)
+        postings: List[List[SortKey]] = []
+        for name, value in (filters or {}).items():
+            if name not in self.by_field or value in (None, ""):
+                continue
+            postings.append(self.by_field[name].get(value.strip().lower(), []))
+
+        driver = min(postings, key=len) if postings else self.keys
+        start, stop = window(driver)
+        estimate = float(stop - start)
+        others = []
+        for other in postings:
+            if other is not driver:
+                estimate *= len(other) / total if total else 0.0
+                others.append(set(other))
+        if after is not None:
+            start, stop = window(driver, after)
+
+        def keys() -> Iterator[SortKey]:
+            span = range(stop - 1, start - 1, -1) if descending else range(start, stop)
+            for i in span:
+                key = driver[i]
+                if all(key in s for s in others):
+                    yield key
+
+        return keys(), int(round(estimate))
+
+    def query(
+        self,
+        filters: Optional[Dict[str, Optional[str]]] = None,
+        *,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        descending: bool = False,
+        file_order: bool = False,
+    ) -> Tuple[Iterator[Dict[str, Any]], int]:
+        """Return (matching rows in key order, or in file order with ``file_order``, estimate)."""
+        keys, estimate = self.match(filters, date_from=date_from, date_to=date_to, descending=descending)
+        if not file_order:
+            return map(self.row, keys), estimate
+        rowids = sorted(key[2] for key in keys)
+        if len(rowids) == len(self.snap.rows):
+            return iter(self.snap.rows), estimate
+        rows, ids = self.snap.rows, self.snap.rowids
+        return (rows[bisect_left(ids, rowid)] for rowid in rowids), estimate
+
+
+_LOCK = threading.Lock()
+_current: Optional[ReportIndex] = None
+
+
+def _apply(snap: ReportSnapshot, changes: Optional[Sequence[Change]]) -> None:
+    global _current
+    with _LOCK:
+        current = _current
+        if current is not None and current.version == snap.version:
+            return  # already built by a reader
+        if changes is None or current is None or current.version != snap.version - 1:
+            _current = None  # rebuilt on next use
+            return
+        _current = current.updated(snap, changes)
+
+
+subscribe(_apply)
+
+
+def get_index(snap: Optional[ReportSnapshot] = None) -> ReportIndex:
+    """Return the index for ``snap`` (default: the current snapshot).
+
+    Writes keep the shared index current; it is only built from scratch on first use
+    and after a reload from disk.
+    """
+    global _current
+    if snap is None:
+        snap = snapshot()
+    current = _current
+    if current is not None and current.version == snap.version:
+        return current
+    with _LOCK:
+        if _current is not None and _current.version > snap.version:
+            return ReportIndex(snap)  # a caller holding an older snapshot
+        if _current is None or _current.version != snap.version:
+            _current = ReportIndex(snap)
+        return _current
+
+
+def project(row: Dict[str, Any], fields: Optional[Sequence[str]]) -> Dict[str, Any]:
+    if not fields:
+        return dict(row)
+    return {key: row.get(key, "") for key in fields}
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+from bisect import bisect_left, insort
+from collections import Counter
+import heapq
+import math
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .parsing import parse_date
+from .storage import Change, ReportSnapshot, snapshot, subscribe
+
+
+# CSV column -> weight of a term occurring there.
+FIELD_WEIGHTS: Dict[str, float] = {
+    "BoreholeID": 3.0,
+    "ProjectName": 2.0,
+    "SiteName": 2.0,
+    "USCS_Class": 2.0,
+    "SoilDescription": 1.0,
+    "Remarks": 1.0,
+}
+K1 = 1.2
+B = 0.75
+RECENCY_WEIGHT = 0.5  # added to a match's score for a row logged today, halving every half-life
+RECENCY_HALF_LIFE_DAYS = 90.0
+# Postings scanned per question term. A term's head is kept in impact order (newest
+# first on ties), so common terms cost the same however many rows contain them.
+POSTINGS_DEPTH = 1000
+
+STOPWORDS = frozenset(
+    "a an and any are as at be by can did do does for from had has have how in is it its me of on or "
+    "show tell than that the their them then there these this those to was we were what when where "
+    "which who why will with you give list many much".split()
+)
+_WORD = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+_PART = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased words; compound tokens such as ``bh-012`` also yield their parts."""
+    tokens: List[str] = []
+    for word in _WORD.findall(text.lower()):
+        if word not in STOPWORDS and (len(word) > 1 or word.isdigit()):
+            tokens.append(word)
+        if not word.isalnum():
+            tokens.extend(p for p in _PART.findall(word) if p not in STOPWORDS and len(p) > 1)
+    return tokens
+
+
+class Retriever:
+    """BM25 index over the dated report rows, keyed by rowid and ranked with a recency boost.
+
+    Postings keep raw term frequencies, so a write only re-tokenises the rows it
+    touched. A term's best ``POSTINGS_DEPTH`` BM25 contributions are worked out the
+    first time a question uses it after a write, and reused until the next write.
+    Kept current by storage write deltas; a reload from disk marks it stale.
+    """
+
+    def __init__(self) -> None:
+        self.version = -1
+        self._lock = threading.RLock()
+        self._stale = True
+        self._reset()
+
+    def _reset(self) -> None:
+        self._docs: Dict[int, Tuple[int, float, Counter]] = {}  # rowid -> (day ordinal, length, term freqs)
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._recent: List[Tuple[int, int]] = []  # (-day ordinal, rowid): newest first, then file order
+        self._total_length = 0.0
+        self._heads: Dict[str, List[Tuple[int, float]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def _add(self, rowid: int, row: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+        dt = parse_date(row.get("StartDate"))
+        if not dt:
+            return None
+        tf: Counter = Counter()
+        for column, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(str(row.get(column) or "")):
+                tf[token] += weight
+        length = sum(tf.values())
+        self._docs[rowid] = (dt.toordinal(), length, tf)
+        self._total_length += length
+        for token, freq in tf.items():
+            self._postings.setdefault(token, {})[rowid] = freq
+        return -dt.toordinal(), rowid
+
+    def _remove(self, rowid: int) -> None:
+        doc = self._docs.pop(rowid, None)
+        if doc is None:
+            return
+        day, length, tf = doc
+        self._total_length -= length
+        for token in tf:
+            postings = self._postings[token]
+            del postings[rowid]
+            if not postings:
+                del self._postings[token]
+        del self._recent[bisect_left(self._recent, (-day, rowid))]
+
+    def load(self, rowids: Iterable[int], rows: Iterable[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._reset()
+            self._recent = sorted(key for key in map(self._add, rowids, rows) if key is not None)
+
+    def rebuild(self, snap: ReportSnapshot) -> None:
+        with self._lock:
+            self.load(snap.rowids, snap.rows)
+            self.version = snap.version
+            self._stale = False
+
+    def apply(self, snap: ReportSnapshot, changes: Optional[Sequence[Change]]) -> None:
+        with self._lock:
+            if changes is None or self._stale or self.version != snap.version - 1:
+                self._stale = True
+                return
+            added: List[Tuple[int, int]] = []
+            for rowid, old, new in changes:
+                if old is not None:
+                    self._remove(rowid)
+                if new is not None:
+                    key = self._add(rowid, new)
+                    if key is not None:
+                        added.append(key)
+            if len(added) == 1:
+                insort(self._recent, added[0])
+            elif added:
+                # A bulk import: one merge beats an insertion per row.
+                self._recent.extend(added)
+                self._recent.sort()
+            self._heads.clear()
+            self.version = snap.version
+
+    def _head(self, token: str) -> List[Tuple[int, float]]:
+        """(rowid, BM25 contribution) of the rows scoring best for ``token``."""
+        head = self._heads.get(token)
+        if head is None:
+            postings = self._postings.get(token)
+            if not postings:
+                return []
+            docs = self._docs
+            n = len(docs)
+            avg_length = self._total_length / n
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            impacts = [
+                (rowid, idf * freq * (K1 + 1) / (freq + K1 * (1 - B + B * docs[rowid][1] / avg_length)))
+                for rowid, freq in postings.items()
+            ]
+            head = heapq.nsmallest(
+                POSTINGS_DEPTH, impacts, key=lambda item: (-item[1], -docs[item[0]][0], item[0])
+            )
+            self._heads[token] = head
+        return head
+
+    def search(self, question: str, limit: int = 30) -> List[int]:
+        """Rowids of the best ``limit`` dated rows for ``question``."""
+        with self._lock:
+            scores: Dict[int, float] = {}
+            for token in set(tokenize(question)):
+                for rowid, impact in self._head(token):
+                    scores[rowid] = scores.get(rowid, 0.0) + impact
+            docs = self._docs
+            newest = -self._recent[0][0] if self._recent else 0
+
+            def rank(rowid: int) -> Tuple[float, int, int]:
+                day = docs[rowid][0]
+                boost = RECENCY_WEIGHT * 0.5 ** ((newest - day) / RECENCY_HALF_LIFE_DAYS)
+                return scores[rowid] + boost, day, -rowid
+
+            ranked = heapq.nlargest(limit, scores, key=rank)
+            if len(ranked) < limit:
+                picked = set(ranked)
+                for _, rowid in self._recent:
+                    if len(ranked) >= limit:
+                        break
+                    if rowid not in picked:
+                        ranked.append(rowid)
+            return ranked
+
+
+_index = Retriever()
+subscribe(_index.apply)
+
+
+def search(rows: Sequence[Dict[str, Any]], question: str, limit: int = 30) -> List[int]:
+    """Positions in ``rows`` of the best ``limit`` dated rows for ``question``.
+
+    The current snapshot's rows are served from the shared index, which write deltas
+    keep current; any other sequence of rows gets a throwaway index.
+    """
+    snap = snapshot()
+    if rows is not snap.rows:
+        index = Retriever()
+        index.load(range(len(rows)), rows)
+        return index.search(question, limit)
+    with _index._lock:
+        if _index._stale or _index.version < snap.version:
+            _index.rebuild(snap)
+        found = _index.search(question, limit)
+    # Rowids ascend in row order; a write published since ``snap`` may add or drop some.
+    positions: List[int] = []
+    for rowid in found:
+        pos = bisect_left(snap.rowids, rowid)
+        if pos < len(snap.rowids) and snap.rowids[pos] == rowid:
+            positions.append(pos)
+    return positions
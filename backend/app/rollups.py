@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+from bisect import bisect_left, insort
+from datetime import date, datetime, timedelta
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .analytics import normalize_row, period_bounds
+from .storage import Change, ReportSnapshot, snapshot, subscribe
+
+
+# Members sort by (StartDate ordinal, rowid), i.e. by date and then file order.
+Key = Tuple[int, int]
+Member = Tuple[Key, Dict[str, Any]]
+
+
+class _Acc:
+    """Mergeable summary aggregates. Rows and merged accumulators must arrive in date order."""
+
+    __slots__ = (
+        "boreholes", "depth_sum", "depth_n", "gw_sum", "gw_n", "spt_sum", "spt_n",
+        "projects", "sites", "methods", "uscs", "contractors", "first", "last", "latest",
+    )
+
+    def __init__(self) -> None:
+        self.boreholes = 0
+        self.depth_sum = self.gw_sum = self.spt_sum = 0.0
+        self.depth_n = self.gw_n = self.spt_n = 0
+        self.projects: set = set()
+        self.sites: set = set()
+        self.methods: Dict[str, int] = {}
+        self.uscs: Dict[str, int] = {}
+        self.contractors: Dict[str, int] = {}
+        self.first: Optional[datetime] = None
+        self.last: Optional[datetime] = None
+        self.latest: List[Dict[str, Any]] = []
+
+    def add(self, r: Dict[str, Any]) -> None:
+        self.boreholes += 1
+        if r["final_depth"] is not None:
+            self.depth_sum += r["final_depth"]
+            self.depth_n += 1
+        if r["groundwater_flag"] and r["groundwater_depth"] is not None:
+            self.gw_sum += r["groundwater_depth"]
+            self.gw_n += 1
+        if r["avg_spt"] is not None:
+            self.spt_sum += r["avg_spt"]
+            self.spt_n += 1
+        if r["project"]:
+            self.projects.add(r["project"])
+        if r["site"]:
+            self.sites.add(r["site"])
+        for counts, value in ((self.methods, r["method"]), (self.uscs, r["uscs"]), (self.contractors, r["contractor"])):
+            if value:
+                counts[value] = counts.get(value, 0) + 1
+        if self.first is None:
+            self.first = r["start_dt"]
+        self.last = r["start_dt"]
+        self.latest = (self.latest + [r])[-3:]
+
+    def merge(self, other: "_Acc") -> None:
+        if not other.boreholes:
+            return
+        self.boreholes += other.boreholes
+        self.depth_sum += other.depth_sum
+        self.depth_n += other.depth_n
+        self.gw_sum += other.gw_sum
+        self.gw_n += other.gw_n
+        self.spt_sum += other.spt_sum
+        self.spt_n += other.spt_n
+        self.projects |= other.projects
+        self.sites |= other.sites
+        for mine, theirs in ((self.methods, other.methods), (self.uscs, other.uscs), (self.contractors, other.contractors)):
+            for value, n in theirs.items():
+                mine[value] = mine.get(value, 0) + n
+        if self.first is None:
+            self.first = other.first
+        self.last = other.last
+        self.latest = (self.latest + other.latest)[-3:]
+
+    def stats(self) -> Dict[str, Any]:
+        """Same shape as analytics.compute_period_stats."""
+        return {
+            "boreholes": self.boreholes,
+            "projects": sorted(self.projects),
+            "sites": sorted(self.sites),
+            "methods": dict(self.methods),
+            "uscs": dict(self.uscs),
+            "contractors": dict(self.contractors),
+            "avg_final_depth_m": round(self.depth_sum / self.depth_n, 2) if self.depth_n else None,
+            "avg_groundwater_depth_m": round(self.gw_sum / self.gw_n, 2) if self.gw_n else None,
+            "avg_spt_n60": round(self.spt_sum / self.spt_n, 2) if self.spt_n else None,
+            "total_meterage_m": round(self.depth_sum, 1) if self.depth_n else 0,
+            "first": self.first,
+            "last": self.last,
+            "latest": list(self.latest),
+        }
+
+
+class _Cell:
+    __slots__ = ("members", "_acc")
+
+    def __init__(self) -> None:
+        self.members: List[Member] = []
+        self._acc: Optional[_Acc] = None
+
+    def acc(self) -> _Acc:
+        if self._acc is None:
+            acc = _Acc()
+            for _, r in self.members:
+                acc.add(r)
+            self._acc = acc
+        return self._acc
+
+    def between(self, lo: int, hi: int) -> _Acc:
+        """Aggregates for members with lo <= StartDate ordinal <= hi (an edge of a range)."""
+        acc = _Acc()
+        for _, r in self.members[bisect_left(self.members, ((lo, -1),)):bisect_left(self.members, ((hi + 1, -1),))]:
+            acc.add(r)
+        return acc
+
+
+class RollupCube:
+    """Summary aggregates per ISO week and calendar month, invalidated per cell on write."""
+
+    def __init__(self) -> None:
+        self.version = -1
+        self._lock = threading.RLock()
+        self._stale = True
+        self._reset()
+
+    def _reset(self) -> None:
+        self._weeks: Dict[int, _Cell] = {}  # keyed by the ordinal of the ISO week's Monday
+        self._week_starts: List[int] = []
+        self._months: Dict[Tuple[int, int], _Cell] = {}
+
+    @staticmethod
+    def _cells_for(start_dt: datetime) -> Tuple[int, Tuple[int, int]]:
+        day = start_dt.toordinal()
+        return day - start_dt.weekday(), (start_dt.year, start_dt.month)
+
+    def _add(self, rowid: int, raw: Dict[str, Any]) -> None:
+        r = normalize_row(raw)
+        if not r["start_dt"]:
+            return
+        member = ((r["start_dt"].toordinal(), rowid), r)
+        week, month = self._cells_for(r["start_dt"])
+        if week not in self._weeks:
+            self._weeks[week] = _Cell()
+            insort(self._week_starts, week)
+        for cell in (self._weeks[week], self._months.setdefault(month, _Cell())):
+            insort(cell.members, member)
+            cell._acc = None
+
+    def _remove(self, rowid: int, raw: Dict[str, Any]) -> None:
+        r = normalize_row(raw)
+        if not r["start_dt"]:
+            return
+        key = (r["start_dt"].toordinal(), rowid)
+        week, month = self._cells_for(r["start_dt"])
+        for cells, cell_key in ((self._weeks, week), (self._months, month)):
+            cell = cells[cell_key]
+            del cell.members[bisect_left(cell.members, (key,))]
+            cell._acc = None
+            if not cell.members:
+                del cells[cell_key]
+                if cells is self._weeks:
+                    self._week_starts.remove(week)
+
+    def rebuild(self, snap: ReportSnapshot) -> None:
+        with self._lock:
+            self._reset()
+            for rowid, row in zip(snap.rowids, snap.rows):
+                self._add(rowid, row)
+            self.version = snap.version
+            self._stale = False
+
+    def apply(self, snap: ReportSnapshot, changes: Optional[Sequence[Change]]) -> None:
+        with self._lock:
+            if changes is None or self._stale or self.version != snap.version - 1:
+                self._stale = True
+                return
+            for rowid, old, new in changes:
+                if old is not None:
+                    self._remove(rowid, old)
+                if new is not None:
+                    self._add(rowid, new)
+            self.version = snap.version
+
+    def month(self, year: int, month: int) -> _Acc:
+        cell = self._months.get((year, month))
+        return cell.acc() if cell else _Acc()
+
+    def between(self, lo: Optional[date], hi: Optional[date]) -> _Acc:
+        """Merge week cells covering [lo, hi]; only the partial weeks at either edge are rescanned."""
+        lo_ord = lo.toordinal() if lo else -1
+        hi_ord = hi.toordinal() if hi else date.max.toordinal()
+        acc = _Acc()
+        if lo_ord > hi_ord:
+            return acc
+        i = bisect_left(self._week_starts, lo_ord - 6)
+        while i < len(self._week_starts) and self._week_starts[i] <= hi_ord:
+            week = self._week_starts[i]
+            cell = self._weeks[week]
+            if lo_ord <= week and week + 6 <= hi_ord:
+                acc.merge(cell.acc())
+            else:
+                acc.merge(cell.between(lo_ord, hi_ord))
+            i += 1
+        return acc
+
+
+_cube = RollupCube()
+subscribe(_cube.apply)
+
+
+def period_stats(
+    period: str,
+    *,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    month: Optional[int] = None,
+    year: Optional[int] = None,
+    snap: Optional[ReportSnapshot] = None,
+) -> Dict[str, Any]:
+    """Summary aggregates for a period, merged from cached week / month cells."""
+    if snap is None:
+        snap = snapshot()
+    with _cube._lock:
+        if _cube._stale or _cube.version < snap.version:
+            _cube.rebuild(snap)
+        if period == "monthly" and month and year:
+            return _cube.month(year, month).stats()
+        lo, hi = period_bounds(period, start_date=start_date, end_date=end_date, month=month, year=year)
+        first_day = None
+        if lo is not None:
+            # StartDate has day precision, so a bound with a time of day admits the next day onwards.
+            first_day = lo.date() if lo.time() == datetime.min.time() else (lo + timedelta(days=1)).date()
+        return _cube.between(first_day, hi.date() if hi else None).stats()
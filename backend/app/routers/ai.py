@@ -1,30 +1,159 @@
-from fastapi import APIRouter
+from contextlib import suppress
+import json
+from typing import Callable, List, Optional, Tuple
 
+from fastapi import APIRouter, HTTPException, Request
+from fastapi import Query as Q
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from ..auth import token_email
 from ..models import Query
-from ..ollama_client import ask
-from ..storage import load_reports
-from ..analytics import build_ai_context
+from ..ollama_client import ask, ask_stream, is_unavailable, queue_stats
+from ..sessions import ChatSession, create_session, delete_session, get_session
+from ..storage import snapshot
+from ..analytics import (
+    AI_CONTEXT_HEADER,
+    CONTEXT_TOKENS,
+    TURN_CONTEXT_TOKENS,
+    build_ai_context,
+    format_ai_context,
+    pack_ai_context,
+)
 
 
 router = APIRouter(prefix="/api/ai", tags=["ai"])
 
+SYSTEM_GUARD = (
+    "You are an assistant for soil boring & geotechnical logging."
+    " Answer ONLY using the provided data snapshot."
+    " If the answer cannot be found in the data, say 'Not found in data'."
+    " Be concise and structure your answer with short bullets where appropriate."
+    " Use the DATA SCHEMA types to interpret values (dates, times, numbers)."
+    " When citing values, reference the exact column names."
+    " Consider prior turns in the conversation to answer follow-ups."
+)
+
+
+def _event(name: str, data: dict) -> str:
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+
+def _requester(request: Request) -> str:
+    """Who the LLM queue is fair between: the signed-in user, else the client address."""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        email = token_email(token)
+        if email:
+            return email
+    return request.client.host if request.client else "anonymous"
+
+
+@router.get("/queue")
+def queue():
+    return queue_stats()
+
+
+@router.post("/sessions")
+def new_session(request: Request):
+    return create_session(_requester(request)).as_dict()
+
+
+@router.get("/sessions/{session_id}")
+def read_session(session_id: str, request: Request):
+    return _session_or_404(session_id, request).as_dict()
+
+
+@router.delete("/sessions/{session_id}")
+def end_session(session_id: str, request: Request):
+    if not delete_session(session_id, _requester(request)):
+        raise HTTPException(status_code=404, detail="Chat session not found or expired")
+    return {"status": "deleted"}
+
+
+def _session_or_404(session_id: str, request: Request) -> ChatSession:
+    session = get_session(session_id, _requester(request))
+    if session is None:
+        raise HTTPException(status_code=404, detail="Chat session not found or expired")
+    return session
+
+
+def _session_prompt(session: ChatSession, q: Query) -> Tuple[str, str, str]:
+    """(stable prompt prefix, evidence block, this turn's message) for a chat follow-up."""
+    snap = snapshot()
+    extra: List[str] = []
+    with session.lock:
+        if session.prefix_lines is None or session.version != snap.version:
+            lines, rows = pack_ai_context(q.question, snap.rows, CONTEXT_TOKENS)
+            session.prefix_lines, session.prefix_rows, session.version = lines, frozenset(rows), snap.version
+        else:
+            extra, _ = pack_ai_context(q.question, snap.rows, TURN_CONTEXT_TOKENS, exclude=session.prefix_rows)
+        prefix_lines = session.prefix_lines
+    prefix = "DATA SNAPSHOT (from CSV):\n" + format_ai_context(prefix_lines) + "\n\n" + SYSTEM_GUARD
+    message = q.question
+    if extra:
+        message = "More rows for this question:\n" + AI_CONTEXT_HEADER + "\n" + "\n".join(extra) + "\n\n" + message
+    if q.context:
+        message = q.context + "\n\n" + message
+    return prefix, format_ai_context(prefix_lines + extra), message
+
 
 @router.post("/analyze")
-def analyze(q: Query):
-    reports = load_reports()
-    context_block = build_ai_context(q.question, reports)
-    # combine any user-provided context with grounded data snapshot
-    combined_context = (
-        (q.context + "\n\n") if q.context else ""
-    ) + "DATA SNAPSHOT (from CSV):\n" + context_block
-    system_guard = (
-        "You are an assistant for soil boring & geotechnical logging."
-        " Answer ONLY using the provided data snapshot."
-        " If the answer cannot be found in the data, say 'Not found in data'."
-        " Be concise and structure your answer with short bullets where appropriate."
-        " Use the DATA SCHEMA types to interpret values (dates, times, numbers)."
-        " When citing values, reference the exact column names."
-    " Consider prior turns in the conversation to answer follow-ups."
-    )
-    answer = ask(q.question, combined_context + "\n\n" + system_guard, history=q.history)
-    return {"answer": answer, "context": context_block}
+def analyze(
+    q: Query,
+    request: Request,
+    stream: bool = Q(False, description="Stream the answer as server-sent events (also implied by Accept: text/event-stream)"),
+):
+    if q.session_id:
+        session: Optional[ChatSession] = _session_or_404(q.session_id, request)
+        prompt, context_block, message = _session_prompt(session, q)
+        history = session.history()
+    else:
+        session = None
+        context_block = build_ai_context(q.question, snapshot().rows)
+        # combine any user-provided context with grounded data snapshot
+        combined_context = (
+            (q.context + "\n\n") if q.context else ""
+        ) + "DATA SNAPSHOT (from CSV):\n" + context_block
+        prompt, message, history = combined_context + "\n\n" + SYSTEM_GUARD, q.question, q.history
+
+    def remember(answer: str) -> None:
+        if session is not None and not is_unavailable(answer):
+            session.record(q.question, answer)
+
+    if stream or "text/event-stream" in request.headers.get("accept", ""):
+        chunks = ask_stream(message, prompt, history=history, user=_requester(request), with_status=True)
+        return StreamingResponse(
+            _stream_answer(request, chunks, context_block, remember),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    answer = ask(message, prompt, history=history, user=_requester(request))
+    remember(answer)
+    return {"answer": answer, "context": context_block, "session_id": q.session_id}
+
+
+async def _stream_answer(request: Request, chunks, context_block: str, on_done: Callable[[str], None]):
+    """SSE: one ``context`` event, ``queued`` events while waiting for a slot, a ``token`` event per chunk, then ``done``."""
+    yield _event("context", {"context": context_block})
+    answer: List[str] = []
+    try:
+        while True:
+            item = await run_in_threadpool(next, chunks, None)
+            if item is None:
+                break
+            if await request.is_disconnected():
+                return
+            if isinstance(item, dict):
+                yield _event("queued", item)
+            else:
+                answer.append(item)
+                yield _event("token", {"text": item})
+        on_done("".join(answer))
+        yield _event("done", {})
+    finally:
+        # Drops the Ollama connection if the client went away mid-answer. If we were
+        # cancelled while a read was in flight the generator is still running; it is
+        # then closed when garbage collected after that read returns.
+        with suppress(ValueError):
+            await run_in_threadpool(chunks.close)
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends
 from pydantic import BaseModel, EmailStr
 
-from ..auth import TOKEN_TTL, authenticate_user, generate_token, get_current_user
+from ..auth import TOKEN_TTL, authenticate_user_async, generate_token, get_current_user
 
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
@@ -13,8 +13,8 @@ class LoginRequest(BaseModel):
 
 
 @router.post("/login")
-def login(payload: LoginRequest):
-    user = authenticate_user(payload.email, payload.password)
+async def login(payload: LoginRequest):
+    user = await authenticate_user_async(payload.email, payload.password)
     token = generate_token(user["email"])
     return {"token": token, "email": user["email"], "role": user.get("role", "admin"), "expires_in": TOKEN_TTL}
 
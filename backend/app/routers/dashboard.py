@@ -1,8 +1,10 @@
 from typing import Any, Dict, List, Optional
 
 from fastapi import APIRouter
+from fastapi import Query as Q
 
-from ..storage import load_reports
+from ..storage import snapshot
+from ..aggregates import dashboard_metrics
 from ..analytics import build_dashboard_report
 
 
@@ -10,9 +12,13 @@ router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
 
 
 @router.get("")
-def dashboard():
-    rs = load_reports()
-    return build_dashboard_report(rs)
+def dashboard(
+    wait_narrative: bool = Q(False, description="Block until the AI narrative is generated instead of polling /api/narratives"),
+):
+    snap = snapshot()
+    return build_dashboard_report(
+        snap.rows, metrics=dashboard_metrics(snap), background_narrative=not wait_narrative
+    )
 
 
 def _avg_param(reports: List[Dict[str, Any]], key: str) -> Optional[float]:
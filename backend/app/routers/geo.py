@@ -0,0 +1,63 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi import Query as Q
+
+from ..auth import get_current_user
+from ..report_index import project
+from ..spatial import spatial_index
+from .reports import _parse_fields
+
+
+router = APIRouter(prefix="/api/geo", tags=["geo"])
+
+
+def _items(hits: List[Tuple[float, Dict[str, Any]]], fields: Optional[str], limit: int) -> Dict[str, Any]:
+    columns = _parse_fields(fields)
+    items = []
+    for distance, row in hits[:limit]:
+        item = project(row, columns)
+        item["distance_m"] = round(distance, 1)
+        items.append(item)
+    return {"items": items, "count": len(hits)}
+
+
+@router.get("/bbox")
+def reports_in_bbox(
+    south: float = Q(..., ge=-90, le=90),
+    west: float = Q(..., ge=-180, le=180, description="Greater than east to cross the antimeridian"),
+    north: float = Q(..., ge=-90, le=90),
+    east: float = Q(..., ge=-180, le=180),
+    fields: Optional[str] = Q(None, description="Comma-separated columns to return"),
+    limit: int = Q(1000, ge=1, le=10000),
+    user=Depends(get_current_user),
+):
+    if south > north:
+        raise HTTPException(status_code=400, detail="south must not be greater than north")
+    rows = spatial_index().bbox(south, west, north, east)
+    columns = _parse_fields(fields)
+    return {"items": [project(row, columns) for row in rows[:limit]], "count": len(rows)}
+
+
+@router.get("/radius")
+def reports_within(
+    lat: float = Q(..., ge=-90, le=90),
+    lon: float = Q(..., ge=-180, le=180),
+    radius_m: float = Q(200, gt=0, le=100000, description="Search radius in metres"),
+    fields: Optional[str] = Q(None, description="Comma-separated columns to return"),
+    limit: int = Q(1000, ge=1, le=10000),
+    user=Depends(get_current_user),
+):
+    """Reports within ``radius_m`` of a point (e.g. a planned pier), nearest first."""
+    return _items(spatial_index().radius(lat, lon, radius_m), fields, limit)
+
+
+@router.get("/nearest")
+def nearest_reports(
+    lat: float = Q(..., ge=-90, le=90),
+    lon: float = Q(..., ge=-180, le=180),
+    k: int = Q(5, ge=1, le=1000),
+    fields: Optional[str] = Q(None, description="Comma-separated columns to return"),
+    user=Depends(get_current_user),
+):
+    return _items(spatial_index().nearest(lat, lon, k), fields, k)
@@ -0,0 +1,53 @@
+import asyncio
+import json
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from ..narratives import NarrativeJob, get_job
+from ..ollama_client import queue_status
+
+
+router = APIRouter(prefix="/api/narratives", tags=["narratives"])
+
+STREAM_INTERVAL = 1.0  # seconds between status events while a job runs
+
+
+def _job_or_404(job_id: str) -> NarrativeJob:
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Narrative job not found")
+    return job
+
+
+def _event(name: str, data: dict) -> str:
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+
+def _status(job: NarrativeJob) -> dict:
+    data = job.as_dict()
+    if job.status == "running":
+        data["queue"] = queue_status(job.id)
+    return data
+
+
+@router.get("/{job_id}")
+def narrative_status(job_id: str):
+    return _status(_job_or_404(job_id))
+
+
+@router.get("/{job_id}/stream")
+async def narrative_stream(job_id: str):
+    job = _job_or_404(job_id)
+
+    async def events():
+        while not job.done.is_set():
+            yield _event("status", _status(job))
+            await asyncio.to_thread(job.done.wait, STREAM_INTERVAL)
+        yield _event("narrative", job.as_dict())
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,8 +1,30 @@
-from fastapi import APIRouter, Body, Depends, HTTPException
+import csv
+from datetime import datetime
+import io
+from itertools import islice
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Literal, Optional, Tuple
+import zlib
+
+from fastapi import APIRouter, Body, Depends, HTTPException, Request
+from fastapi import Query as Q
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
 
 from ..models import Report
-from ..storage import save_report, load_reports, delete_report, update_report
+from ..storage import (
+    HEADERS,
+    DuplicateReportError,
+    delete_report,
+    get_report,
+    save_report,
+    save_reports,
+    snapshot,
+    update_report,
+)
 from ..auth import get_current_user
+from ..report_index import InvalidCursor, ReportIndex, SortKey, decode_cursor, encode_cursor, get_index, project
 
 
 router = APIRouter(prefix="/api/reports", tags=["reports"])
@@ -14,17 +36,252 @@ def create_report(
     user=Depends(get_current_user),
 ):
     # Accept raw dict so the form can submit fields matching existing CSV headers
-    if isinstance(r, dict):
-        save_report(r, submitted_by=user["email"])
-    else:
-        # Fallback: try model parse
-        save_report(Report(**r).model_dump(), submitted_by=user["email"])
+    try:
+        if isinstance(r, dict):
+            save_report(r, submitted_by=user["email"])
+        else:
+            # Fallback: try model parse
+            save_report(Report(**r).model_dump(), submitted_by=user["email"])
+    except DuplicateReportError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
     return {"status": "ok"}
 
 
+BULK_MAX_ROWS = 50000
+
+
+def _parse_bulk(body: bytes, content_type: str) -> List[Any]:
+    """Records from a CSV, NDJSON or JSON-array upload."""
+    try:
+        text = body.decode("utf-8-sig")
+    except UnicodeDecodeError as exc:
+        raise HTTPException(status_code=400, detail="Upload must be UTF-8") from exc
+    try:
+        if "csv" in content_type:
+            return list(csv.DictReader(io.StringIO(text)))
+        if "ndjson" in content_type or "jsonl" in content_type:
+            return [json.loads(line) for line in text.splitlines() if line.strip()]
+        records = json.loads(text)
+    except (csv.Error, json.JSONDecodeError) as exc:
+        raise HTTPException(status_code=400, detail=f"Could not parse upload: {exc}") from exc
+    if not isinstance(records, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array of reports")
+    return records
+
+
+def _validate_bulk(records: List[Any]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """(valid reports, per-row errors); rows are numbered from 1 in upload order."""
+    existing = snapshot()
+    seen: Dict[str, int] = {}
+    valid: List[Dict[str, Any]] = []
+    errors: List[Dict[str, Any]] = []
+    for n, record in enumerate(records, 1):
+        if not isinstance(record, dict):
+            errors.append({"row": n, "errors": ["expected an object"]})
+            continue
+        # Blank cells count as missing; numbers and booleans are stored as text like the form sends.
+        fields = {
+            key: str(value) if isinstance(value, (int, float, bool)) else value
+            for key, value in record.items()
+            if value not in (None, "")
+        }
+        try:
+            report = Report.model_validate(fields).model_dump()
+        except ValidationError as exc:
+            problems = [f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in exc.errors()]
+            errors.append({"row": n, "BoreholeID": fields.get("BoreholeID"), "errors": problems})
+            continue
+        key = report["BoreholeID"]
+        if existing.position(key) is not None:
+            errors.append({"row": n, "BoreholeID": key, "errors": [f"BoreholeID {key} already exists"]})
+        elif key in seen:
+            errors.append({"row": n, "BoreholeID": key, "errors": [f"BoreholeID {key} repeats row {seen[key]}"]})
+        else:
+            seen[key] = n
+            valid.append(report)
+    return valid, errors
+
+
+@router.post("/bulk")
+async def bulk_create_reports(
+    request: Request,
+    partial: bool = Q(False, description="Store the valid rows even if some rows fail validation"),
+    user=Depends(get_current_user),
+):
+    """Import many reports (CSV, NDJSON or a JSON array) in one write.
+
+    By default nothing is stored unless every row is valid; the response lists the
+    problems per row either way.
+    """
+    body = await request.body()
+    records = _parse_bulk(body, request.headers.get("content-type", "").lower())
+    if len(records) > BULK_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ROWS} reports per upload")
+    valid, errors = await run_in_threadpool(_validate_bulk, records)
+    if errors and not partial:
+        raise HTTPException(
+            status_code=422,
+            detail={"message": f"{len(errors)} of {len(records)} rows are invalid; nothing was stored", "errors": errors},
+        )
+    try:
+        inserted = await run_in_threadpool(save_reports, valid, user["email"])
+    except DuplicateReportError as exc:
+        # Another upload claimed one of these IDs after validation.
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+    return {"status": "ok", "received": len(records), "inserted": inserted, "errors": errors}
+
+
+class ReportFilters:
+    """Query parameters shared by the list and export endpoints."""
+
+    def __init__(
+        self,
+        project: Optional[str] = Q(None, description="Exact ProjectName (case-insensitive)"),
+        site: Optional[str] = Q(None, description="Exact SiteName (case-insensitive)"),
+        contractor: Optional[str] = Q(None, description="Exact Contractor (case-insensitive)"),
+        method: Optional[str] = Q(None, description="Exact DrillingMethod (case-insensitive)"),
+        uscs: Optional[str] = Q(None, description="Exact USCS_Class (case-insensitive)"),
+        date_from: Optional[str] = Q(None, description="Earliest StartDate (YYYY-MM-DD)"),
+        date_to: Optional[str] = Q(None, description="Latest StartDate (YYYY-MM-DD)"),
+        fields: Optional[str] = Q(None, description="Comma-separated columns to return"),
+        order: Literal["asc", "desc"] = Q("asc", description="Sort pages and exports by StartDate, BoreholeID"),
+    ):
+        self.filters = {"project": project, "site": site, "contractor": contractor, "method": method, "uscs": uscs}
+        self.date_from = _check_date(date_from, "date_from")
+        self.date_to = _check_date(date_to, "date_to")
+        self.fields = _parse_fields(fields)
+        self.descending = order == "desc"
+
+    def query(self, file_order: bool = False):
+        return get_index().query(
+            self.filters,
+            date_from=self.date_from,
+            date_to=self.date_to,
+            descending=self.descending,
+            file_order=file_order,
+        )
+
+    def match(self, index: ReportIndex, after: Optional[SortKey] = None):
+        return index.match(
+            self.filters,
+            date_from=self.date_from,
+            date_to=self.date_to,
+            after=after,
+            descending=self.descending,
+        )
+
+
+def _check_date(value: Optional[str], label: str) -> Optional[str]:
+    if value in (None, ""):
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid {label}; use YYYY-MM-DD") from exc
+
+
+def _parse_fields(value: Optional[str]) -> Optional[List[str]]:
+    if not value:
+        return None
+    fields = [f.strip() for f in value.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in HEADERS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
 @router.get("")
-def list_reports(user=Depends(get_current_user)):
-    return load_reports()
+def list_reports(
+    params: ReportFilters = Depends(),
+    limit: Optional[int] = Q(None, ge=1, le=1000, description="Page size; enables the paginated response"),
+    cursor: Optional[str] = Q(None, description="next_cursor from the previous page"),
+    user=Depends(get_current_user),
+):
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except InvalidCursor as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+    if limit is None and cursor is None:
+        # Unpaginated callers (the table view) still get a plain array, in file order.
+        rows, _ = params.query(file_order=True)
+        return [project(row, params.fields) for row in rows]
+
+    index = get_index()
+    keys, estimate = params.match(index, after)
+    size = limit or 100
+    page = list(islice(keys, size + 1))
+    has_more = len(page) > size
+    page = page[:size]
+    items: List[Dict[str, Any]] = [project(index.row(key), params.fields) for key in page]
+    next_cursor = encode_cursor(page[-1]) if has_more else None
+    return {"items": items, "next_cursor": next_cursor, "total_estimate": estimate}
+
+
+EXPORT_BATCH_ROWS = 500
+
+
+def _csv_chunks(rows: Iterable[Dict[str, Any]], fields: List[str]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=fields, extrasaction="ignore")
+    writer.writeheader()
+    for n, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if n % EXPORT_BATCH_ROWS == 0:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue().encode("utf-8")
+
+
+def _ndjson_chunks(rows: Iterable[Dict[str, Any]], fields: List[str]) -> Iterator[bytes]:
+    lines: List[str] = []
+    for row in rows:
+        lines.append(json.dumps(project(row, fields), ensure_ascii=False))
+        if len(lines) >= EXPORT_BATCH_ROWS:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+@router.get("/export")
+def export_reports(
+    request: Request,
+    params: ReportFilters = Depends(),
+    format: Literal["csv", "ndjson"] = Q("csv", description="csv or ndjson"),
+    user=Depends(get_current_user),
+):
+    rows, _ = params.query()
+    fields = params.fields or list(HEADERS)
+    if format == "csv":
+        chunks, media_type = _csv_chunks(rows, fields), "text/csv; charset=utf-8"
+    else:
+        chunks, media_type = _ndjson_chunks(rows, fields), "application/x-ndjson"
+    headers = {"Content-Disposition": f'attachment; filename="reports.{format}"'}
+    if "gzip" in request.headers.get("accept-encoding", "").lower():
+        chunks = _gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
+
+
+@router.get("/{borehole_id}")
+def read_report(borehole_id: str, user=Depends(get_current_user)):
+    report = get_report(borehole_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return report
 
 
 @router.delete("/{borehole_id}")
@@ -40,6 +297,10 @@ def edit_report(
     r: dict = Body(...),
     user=Depends(get_current_user),
 ):
-    if not update_report(borehole_id, r or {}):
+    try:
+        updated = update_report(borehole_id, r or {})
+    except DuplicateReportError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+    if not updated:
         raise HTTPException(status_code=404, detail="Report not found")
     return {"status": "updated"}
@@ -0,0 +1,110 @@
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import Query as Q
+from starlette.concurrency import run_in_threadpool
+
+from ..auth import get_current_user
+from ..report_index import get_index
+from ..samples import SAMPLE_HEADERS, save_samples, samples, validate_sample
+from .reports import _parse_bulk
+
+
+router = APIRouter(prefix="/api/samples", tags=["samples"])
+
+BULK_MAX_SAMPLES = 500000
+
+
+def _fields(value: Optional[str]) -> Optional[List[str]]:
+    if not value:
+        return None
+    fields = [f.strip() for f in value.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in SAMPLE_HEADERS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def _project(row: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    return row if fields is None else {f: row[f] for f in fields}
+
+
+@router.get("")
+def list_samples(
+    borehole: Optional[str] = Q(None, description="Comma-separated BoreholeIDs"),
+    project: Optional[str] = Q(None, description="Samples from boreholes of this ProjectName (case-insensitive)"),
+    depth_from: Optional[float] = Q(None, ge=0, description="Samples overlapping depths below this (m)"),
+    depth_to: Optional[float] = Q(None, ge=0, description="Samples overlapping depths above this (m)"),
+    min_spt: Optional[float] = Q(None, description="SPT_N at least this"),
+    max_spt: Optional[float] = Q(None, description="SPT_N at most this"),
+    sample_type: Optional[str] = Q(None, description="SampleType, e.g. SPT or UD"),
+    uscs: Optional[str] = Q(None, description="Soil_USCS"),
+    fields: Optional[str] = Q(None, description="Comma-separated columns to return"),
+    limit: int = Q(1000, ge=1, le=10000),
+    offset: int = Q(0, ge=0),
+    user=Depends(get_current_user),
+):
+    """Samples in (BoreholeID, DepthFrom_m) order, e.g. every 5–10 m sample with SPT_N <= 9 in a project."""
+    if depth_from is not None and depth_to is not None and depth_from >= depth_to:
+        raise HTTPException(status_code=400, detail="depth_from must be less than depth_to")
+    columns = _fields(fields)
+    boreholes = None
+    if borehole:
+        boreholes = [b.strip() for b in borehole.split(",") if b.strip()]
+    if project:
+        rows, _ = get_index().query({"project": project})
+        in_project = {str(row.get("BoreholeID")) for row in rows}
+        boreholes = [b for b in boreholes if b in in_project] if boreholes is not None else sorted(in_project)
+    table = samples()
+    hits = table.query(
+        boreholes=boreholes,
+        depth_from=depth_from,
+        depth_to=depth_to,
+        ranges={"SPT_N": (min_spt, max_spt)} if min_spt is not None or max_spt is not None else None,
+        equals={"SampleType": sample_type, "Soil_USCS": uscs},
+    )
+    page = hits[offset:offset + limit]
+    return {
+        "items": [_project(table.row(i), columns) for i in page],
+        "total": int(hits.size),
+        "next_offset": offset + limit if offset + limit < hits.size else None,
+    }
+
+
+@router.post("/bulk")
+async def bulk_create_samples(request: Request, user=Depends(get_current_user)):
+    """Import samples as CSV (the soil_boring_samples.csv layout), NDJSON or a JSON array.
+
+    Nothing is stored unless every row is valid.
+    """
+    body = await request.body()
+    records = _parse_bulk(body, request.headers.get("content-type", "").lower())
+    if len(records) > BULK_MAX_SAMPLES:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_SAMPLES} samples per upload")
+    errors: List[Dict[str, Any]] = []
+    for n, record in enumerate(records, 1):
+        problems = validate_sample(record) if isinstance(record, dict) else ["expected an object"]
+        if problems:
+            errors.append({"row": n, "errors": problems})
+    if errors:
+        raise HTTPException(
+            status_code=422,
+            detail={"message": f"{len(errors)} of {len(records)} rows are invalid; nothing was stored", "errors": errors},
+        )
+    inserted = await run_in_threadpool(save_samples, records)
+    return {"status": "ok", "inserted": inserted}
+
+
+@router.get("/{borehole_id}")
+def borehole_profile(
+    borehole_id: str,
+    fields: Optional[str] = Q(None, description="Comma-separated columns to return, e.g. DepthFrom_m,DepthTo_m,SPT_N"),
+    user=Depends(get_current_user),
+):
+    """The borehole's samples top to bottom (its SPT-N / strength profile)."""
+    columns = _fields(fields)
+    table = samples()
+    span = table.borehole_slice(borehole_id)
+    if span.start == span.stop:
+        raise HTTPException(status_code=404, detail="No samples for this borehole")
+    return {"borehole_id": borehole_id, "samples": [_project(table.row(i), columns) for i in range(span.start, span.stop)]}
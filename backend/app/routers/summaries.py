@@ -4,8 +4,9 @@ from typing import Literal, Optional
 from fastapi import APIRouter, HTTPException
 from fastapi import Query as Q
 
-from ..storage import load_reports
+from ..storage import snapshot
 from ..analytics import build_summary_report
+from ..rollups import period_stats
 
 
 router = APIRouter(prefix="/api/summaries", tags=["summaries"])
@@ -27,8 +28,9 @@ def summaries(
     end_date: Optional[str] = Q(None, description="End date (YYYY-MM-DD) for weekly summaries"),
     month: Optional[int] = Q(None, ge=1, le=12, description="Month number for monthly summaries"),
     year: Optional[int] = Q(None, ge=2000, le=2100, description="Year for monthly summaries"),
+    wait_narrative: bool = Q(False, description="Block until the AI narrative is generated instead of polling /api/narratives"),
 ):
-    reports = load_reports()
+    snap = snapshot()
     start_dt = _parse_date(start_date, "start_date")
     end_dt = _parse_date(end_date, "end_date")
 
@@ -42,12 +44,14 @@ def summaries(
             raise HTTPException(status_code=400, detail="Provide both month and year for monthly summaries")
 
     return build_summary_report(
-        reports,
+        snap.rows,
         period,
         start_date=start_dt,
         end_date=end_dt,
         month=month,
         year=year,
+        period_stats=period_stats(period, start_date=start_dt, end_date=end_dt, month=month, year=year, snap=snap),
+        background_narrative=not wait_narrative,
     )
 
 
@@ -0,0 +1,368 @@
+from __future__ import annotations
+
+import csv
+import io
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .parsing import parse_float
+from .storage import DATA_PATH, _append_durably, _FileLock, _stat_signature
+
+
+FILE = DATA_PATH / "samples.csv"
+LOCK_FILE = DATA_PATH / "samples.lock"
+
+# Schema of archive/template/soil_boring_samples.csv.
+SAMPLE_HEADERS: Sequence[str] = (
+    "BoreholeID",
+    "DepthFrom_m",
+    "DepthTo_m",
+    "SampleType",
+    "SPT_N",
+    "BlowCounts",
+    "Recovery_pct",
+    "Soil_USCS",
+    "SoilDescription",
+    "MoistureContent_pct",
+    "LiquidLimit_LL",
+    "PlasticLimit_PL",
+    "PlasticityIndex_PI",
+    "UnitWeight_kN_per_m3",
+    "UndrainedShear_Cu_kPa",
+    "FrictionAngle_phi_deg",
+    "Remarks",
+)
+FLOAT_COLUMNS: Sequence[str] = (
+    "DepthFrom_m",
+    "DepthTo_m",
+    "SPT_N",
+    "Recovery_pct",
+    "MoistureContent_pct",
+    "LiquidLimit_LL",
+    "PlasticLimit_PL",
+    "PlasticityIndex_PI",
+    "UnitWeight_kN_per_m3",
+    "UndrainedShear_Cu_kPa",
+    "FrictionAngle_phi_deg",
+)
+# Few distinct values: stored as codes so equality filters are a vector compare.
+CODED_COLUMNS: Sequence[str] = ("SampleType", "Soil_USCS")
+TEXT_COLUMNS: Sequence[str] = ("BlowCounts", "SoilDescription", "Remarks")
+
+
+def _coded(values: Sequence[str]) -> Tuple[np.ndarray, List[str]]:
+    """(codes, labels) with labels sorted; -1 marks an empty value."""
+    labels = sorted({v for v in values if v})
+    lookup = {label: i for i, label in enumerate(labels)}
+    return np.fromiter((lookup.get(v, -1) for v in values), dtype=np.int32, count=len(values)), labels
+
+
+class SampleTable:
+    """Immutable, columnar samples sorted by (BoreholeID, DepthFrom_m).
+
+    One borehole's samples are a contiguous slice (its depth profile). The depth index
+    keeps every sample ordered by DepthFrom_m together with the longest interval, so
+    the samples overlapping a depth window come from one binary search: anything
+    starting more than ``max_length`` above the window cannot reach into it.
+    Columns are passed in already sorted; see ``_build`` and ``_extend``.
+    """
+
+    def __init__(
+        self,
+        version: int,
+        signature: Optional[Any],
+        boreholes: List[str],
+        codes: np.ndarray,
+        floats: Dict[str, np.ndarray],
+        coded: Dict[str, Tuple[np.ndarray, List[str]]],
+        text: Dict[str, np.ndarray],
+        by_depth: Optional[np.ndarray] = None,
+        max_length: Optional[float] = None,
+    ):
+        self.version = version
+        self.signature = signature
+        self.boreholes = boreholes
+        self.codes = codes
+        self.bounds = np.searchsorted(self.codes, np.arange(len(self.boreholes) + 1), side="left")
+        self._lookup = {label: i for i, label in enumerate(self.boreholes)}
+        self.floats = floats
+        self.coded = coded
+        self.text = text
+
+        top = self.floats["DepthFrom_m"]
+        self.by_depth = np.argsort(top, kind="stable") if by_depth is None else by_depth
+        self.depth_sorted = top[self.by_depth]
+        if max_length is None:
+            lengths = self.floats["DepthTo_m"] - top
+            # Samples without both depths never overlap a window, so they cannot widen it.
+            lengths = lengths[~np.isnan(lengths)]
+            max_length = float(lengths.max()) if lengths.size else 0.0
+        self.max_length = max_length
+
+    def __len__(self) -> int:
+        return int(self.codes.size)
+
+    def borehole_slice(self, borehole_id: str) -> slice:
+        code = self._lookup.get(str(borehole_id))
+        if code is None:
+            return slice(0, 0)
+        return slice(int(self.bounds[code]), int(self.bounds[code + 1]))
+
+    def _depth_window(self, depth_from: Optional[float], depth_to: Optional[float]) -> Tuple[int, int]:
+        """Span of ``by_depth`` that can overlap the window."""
+        lo = 0
+        hi = self.depth_sorted.size
+        if depth_from is not None:
+            lo = int(np.searchsorted(self.depth_sorted, depth_from - self.max_length, side="left"))
+        if depth_to is not None:
+            hi = int(np.searchsorted(self.depth_sorted, depth_to, side="left"))
+        return lo, max(lo, hi)
+
+    def query(
+        self,
+        *,
+        boreholes: Optional[Iterable[str]] = None,
+        depth_from: Optional[float] = None,
+        depth_to: Optional[float] = None,
+        ranges: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None,
+        equals: Optional[Dict[str, Optional[str]]] = None,
+    ) -> np.ndarray:
+        """Positions of matching samples, in (BoreholeID, DepthFrom_m) order.
+
+        A sample matches the depth window when its interval overlaps it
+        (``DepthFrom_m < depth_to`` and ``DepthTo_m > depth_from``). ``ranges`` bounds
+        float columns inclusively and never matches blanks; ``equals`` compares coded
+        columns case-insensitively. The borehole slices or the depth index drive the
+        scan, whichever yields fewer candidates.
+        """
+        lo, hi = self._depth_window(depth_from, depth_to)
+        if boreholes is not None:
+            spans = sorted((self.borehole_slice(b) for b in set(boreholes)), key=lambda s: s.start)
+            if sum(s.stop - s.start for s in spans) <= hi - lo:
+                candidates = (
+                    np.concatenate([np.arange(s.start, s.stop) for s in spans]) if spans else np.empty(0, dtype=np.intp)
+                )
+            else:
+                candidates = np.sort(self.by_depth[lo:hi])
+                wanted = [self._lookup[b] for b in boreholes if b in self._lookup]
+                candidates = candidates[np.isin(self.codes[candidates], wanted)]
+        else:
+            candidates = np.sort(self.by_depth[lo:hi])
+
+        mask = np.ones(candidates.size, dtype=bool)
+        if depth_from is not None:
+            mask &= self.floats["DepthTo_m"][candidates] > depth_from
+        if depth_to is not None:
+            mask &= self.floats["DepthFrom_m"][candidates] < depth_to
+        for name, (low, high) in (ranges or {}).items():
+            values = self.floats[name][candidates]
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+        for name, wanted_value in (equals or {}).items():
+            if wanted_value in (None, ""):
+                continue
+            codes, labels = self.coded[name]
+            matching = [i for i, label in enumerate(labels) if label.lower() == wanted_value.strip().lower()]
+            mask &= np.isin(codes[candidates], matching)
+        return candidates[mask]
+
+    def row(self, i: int) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"BoreholeID": self.boreholes[int(self.codes[i])]}
+        for name in SAMPLE_HEADERS[1:]:
+            if name in self.floats:
+                value = self.floats[name][i]
+                out[name] = None if np.isnan(value) else float(value)
+            elif name in self.coded:
+                codes, labels = self.coded[name]
+                out[name] = labels[codes[i]] if codes[i] >= 0 else None
+            else:
+                out[name] = self.text[name][i] or None
+        return out
+
+
+def _floats(values: Sequence[str]) -> np.ndarray:
+    raw = np.array(values, dtype=object)
+    raw[raw == ""] = "nan"
+    try:
+        return raw.astype(np.float64)
+    except (TypeError, ValueError):
+        # Some cell is not a plain number; parse each one leniently instead.
+        parsed = (parse_float(v) for v in values)
+        return np.fromiter((np.nan if v is None else v for v in parsed), dtype=np.float64, count=len(values))
+
+
+def _build(version: int, signature: Optional[Any], records: Sequence[Sequence[str]]) -> SampleTable:
+    """Table from rows of strings in SAMPLE_HEADERS order."""
+    n = len(records)
+    columns = list(zip(*records)) if n else [()] * len(SAMPLE_HEADERS)
+    by_name = dict(zip(SAMPLE_HEADERS, columns))
+    borehole = np.array(by_name["BoreholeID"], dtype=object)
+    if n:
+        labels, codes = np.unique(borehole, return_inverse=True)
+    else:
+        labels, codes = np.empty(0, dtype=object), np.empty(0, dtype=np.intp)
+    floats = {name: _floats(by_name[name]) for name in FLOAT_COLUMNS}
+    order = np.lexsort((floats["DepthFrom_m"], codes))
+    coded = {}
+    for name in CODED_COLUMNS:
+        values, names = _coded(by_name[name])
+        coded[name] = (values[order], names)
+    interned: Dict[str, str] = {}
+    text = {
+        name: np.array([interned.setdefault(v, v) for v in by_name[name]], dtype=object)[order]
+        for name in TEXT_COLUMNS
+    }
+    return SampleTable(
+        version,
+        signature,
+        [str(label) for label in labels],
+        codes[order].astype(np.int32),
+        {name: values[order] for name, values in floats.items()},
+        coded,
+        text,
+    )
+
+
+def _merge_labels(old: List[str], new: List[str]) -> Tuple[List[str], Optional[np.ndarray], np.ndarray]:
+    """(merged sorted labels, old code -> merged code or None if unchanged, new code -> merged code)."""
+    merged = sorted(set(old).union(new))
+    old_map = None
+    if len(merged) == len(old):
+        merged = old
+    lookup = {label: i for i, label in enumerate(merged)}
+    if merged is not old:
+        old_map = np.array([lookup[label] for label in old], dtype=np.int32)
+    return merged, old_map, np.array([lookup[label] for label in new], dtype=np.int32)
+
+
+def _recode(codes: np.ndarray, mapping: Optional[np.ndarray]) -> np.ndarray:
+    if mapping is None:
+        return codes
+    return np.append(mapping, np.int32(-1))[codes]  # code -1 (empty) picks the trailing -1
+
+
+def _extend(current: SampleTable, signature: Optional[Any], records: Sequence[Sequence[str]]) -> SampleTable:
+    """``current`` plus ``records``, merged in without re-parsing or re-sorting the stored samples."""
+    added = _build(current.version, None, records)
+    boreholes, old_map, new_map = _merge_labels(current.boreholes, added.boreholes)
+    old_codes = _recode(current.codes, old_map)
+    new_codes = new_map[added.codes]
+
+    # Each new sample goes after the stored samples of its borehole that start no deeper.
+    top = current.floats["DepthFrom_m"]
+    starts = np.searchsorted(old_codes, new_codes, side="left")
+    stops = np.searchsorted(old_codes, new_codes, side="right")
+    at = np.fromiter(
+        (
+            lo + int(np.searchsorted(top[lo:hi], depth, side="right"))
+            for lo, hi, depth in zip(starts.tolist(), stops.tolist(), added.floats["DepthFrom_m"].tolist())
+        ),
+        dtype=np.intp,
+        count=len(added),
+    )
+
+    coded = {}
+    for name in CODED_COLUMNS:
+        old_values, old_labels = current.coded[name]
+        new_values, new_labels = added.coded[name]
+        labels, old_label_map, new_label_map = _merge_labels(old_labels, new_labels)
+        values = np.insert(_recode(old_values, old_label_map), at, _recode(new_values, new_label_map))
+        coded[name] = (values, labels)
+
+    # Stored samples shift down by the number inserted at or before them.
+    shifted = current.by_depth + np.searchsorted(at, current.by_depth, side="right")
+    placed = at + np.arange(at.size)
+    where = np.searchsorted(current.depth_sorted, added.depth_sorted, side="right")
+    return SampleTable(
+        current.version + 1,
+        signature,
+        boreholes,
+        np.insert(old_codes, at, new_codes),
+        {name: np.insert(current.floats[name], at, added.floats[name]) for name in FLOAT_COLUMNS},
+        coded,
+        {name: np.insert(current.text[name], at, added.text[name]) for name in TEXT_COLUMNS},
+        by_depth=np.insert(shifted, where, placed[added.by_depth]),
+        max_length=max(current.max_length, added.max_length),
+    )
+
+
+_LOCK = threading.RLock()
+# Serializes appends across worker processes; readers take it shared.
+_FILE_LOCK = _FileLock(LOCK_FILE)
+_table = _build(0, None, [])
+_loaded = False
+
+
+def _read_table(version: int) -> SampleTable:
+    try:
+        f = FILE.open("r", encoding="utf-8", newline="")
+    except FileNotFoundError:
+        return _build(version, None, [])
+    with f:
+        signature = _stat_signature(FILE, os.fstat(f.fileno()))
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return _build(version, signature, [])
+        if list(header) != list(SAMPLE_HEADERS):
+            raise RuntimeError("Existing samples.csv does not match the samples schema.")
+        width = len(SAMPLE_HEADERS)
+        records = [row if len(row) == width else (row + [""] * width)[:width] for row in reader if row]
+    return _build(version, signature, records)
+
+
+def samples() -> SampleTable:
+    """The current samples table, re-read only when samples.csv changed on disk."""
+    global _table, _loaded
+    current = _table
+    if _loaded and current.signature == _stat_signature(FILE):
+        return current
+    with _LOCK, _FILE_LOCK.hold(exclusive=False):
+        if not (_loaded and _table.signature == _stat_signature(FILE)):
+            _table = _read_table(_table.version + 1)
+            _loaded = True
+        return _table
+
+
+def validate_sample(record: Dict[str, Any]) -> List[str]:
+    """Problems with one uploaded sample; empty when it can be stored."""
+    problems: List[str] = []
+    if not str(record.get("BoreholeID") or "").strip():
+        problems.append("BoreholeID: Field required")
+    for name in FLOAT_COLUMNS:
+        value = record.get(name)
+        if value not in (None, "") and parse_float(value) is None:
+            problems.append(f"{name}: expected a number")
+    top, bottom = parse_float(record.get("DepthFrom_m")), parse_float(record.get("DepthTo_m"))
+    if top is None or bottom is None:
+        problems.append("DepthFrom_m and DepthTo_m are required")
+    elif not 0 <= top < bottom:
+        problems.append("DepthFrom_m must be >= 0 and less than DepthTo_m")
+    return problems
+
+
+def save_samples(records: Sequence[Dict[str, Any]]) -> int:
+    """Append validated samples in one write and fsync, then publish the extended table.
+
+    The append holds samples.lock, and the table is reloaded first if another process
+    appended since we last read, so extending it in place never skips their rows.
+    """
+    global _table
+    if not records:
+        return 0
+    rows = [["" if record.get(name) is None else str(record.get(name)) for name in SAMPLE_HEADERS] for record in records]
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    with _LOCK, _FILE_LOCK.hold():
+        current = samples()
+        if not FILE.exists() or FILE.stat().st_size == 0:
+            writer.writerow(SAMPLE_HEADERS)
+        writer.writerows(rows)
+        _append_durably(FILE, buf.getvalue().encode("utf-8"))
+        _table = _extend(current, _stat_signature(FILE), rows)
+        return len(rows)
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, FrozenSet, List, Optional
+
+from .ollama_client import ask, estimate_tokens, is_unavailable
+
+
+SESSION_TTL = int(os.environ.get("AI_SESSION_TTL", "7200"))  # seconds idle before a chat is forgotten
+SESSION_LIMIT = 256
+HISTORY_TOKENS = int(os.environ.get("AI_HISTORY_TOKENS", "1500"))  # turns kept verbatim before summarizing
+
+SUMMARY_INSTRUCTION = (
+    "Summarize this conversation between a geotechnical engineer and an assistant in <=120 words. "
+    "Keep borehole IDs, projects, sites, numbers and conclusions; drop pleasantries."
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ChatSession:
+    """Server-side Q&A history for one user.
+
+    ``prefix_lines`` are the data rows sent ahead of every turn. They only change when
+    the reports change, so the prompt prefix stays identical and Ollama can reuse its
+    cache for it; follow-ups send just the extra rows they need.
+    """
+
+    def __init__(self, owner: str):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.turns: List[Dict[str, str]] = []
+        self.summary = ""
+        self.prefix_lines: Optional[List[str]] = None
+        self.prefix_rows: FrozenSet[int] = frozenset()
+        self.version = -1
+        self.created = self.updated = time.time()
+        self.lock = threading.RLock()
+        self._compacting = False
+
+    def history(self) -> List[Dict[str, str]]:
+        with self.lock:
+            turns = list(self.turns)
+            if self.summary:
+                turns.insert(0, {"role": "system", "content": f"Summary of the earlier conversation: {self.summary}"})
+            return turns
+
+    def record(self, question: str, answer: str) -> None:
+        with self.lock:
+            self.turns.append({"role": "user", "content": question})
+            self.turns.append({"role": "assistant", "content": answer})
+            self.updated = time.time()
+            if self._compacting or _tokens(self.turns) <= HISTORY_TOKENS:
+                return
+            self._compacting = True
+        _executor.submit(_compact, self)
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "session_id": self.id,
+                "turns": list(self.turns),
+                "summary": self.summary or None,
+                "created": self.created,
+                "updated": self.updated,
+            }
+
+
+def _tokens(turns: List[Dict[str, str]]) -> int:
+    return sum(estimate_tokens(t["content"]) for t in turns)
+
+
+def _compact(session: ChatSession) -> None:
+    """Fold the oldest turns into the running summary until the rest fit half the budget."""
+    try:
+        with session.lock:
+            folded = 0
+            while folded < len(session.turns) - 2 and _tokens(session.turns[folded:]) > HISTORY_TOKENS // 2:
+                folded += 2  # whole question / answer pairs
+            old = session.turns[:folded]
+            previous = session.summary
+        if not old:
+            return
+        transcript = "\n".join(f"{t['role']}: {t['content']}" for t in old)
+        if previous:
+            transcript = f"Summary so far: {previous}\n\n{transcript}"
+        summary = ask(SUMMARY_INSTRUCTION, context=transcript, timeout=60, priority="summary")
+        if is_unavailable(summary):
+            # Keep at least what was asked when the model cannot summarize.
+            asked = "; ".join(t["content"][:80] for t in old if t["role"] == "user")
+            summary = f"{previous} Earlier questions: {asked}".strip()
+        with session.lock:
+            # New turns are only ever appended, so the folded ones are still at the front.
+            del session.turns[:folded]
+            session.summary = summary
+    except Exception as exc:  # pragma: no cover
+        logger.warning("Could not summarize chat %s: %s", session.id, exc)
+    finally:
+        with session.lock:
+            session._compacting = False
+
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-summary")
+_sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _expire_locked(now: float) -> None:
+    while _sessions:
+        oldest = next(iter(_sessions.values()))
+        if now - oldest.updated < SESSION_TTL and len(_sessions) <= SESSION_LIMIT:
+            break
+        _sessions.popitem(last=False)
+
+
+def create_session(owner: str) -> ChatSession:
+    session = ChatSession(owner)
+    with _lock:
+        _sessions[session.id] = session
+        _expire_locked(time.time())
+    return session
+
+
+def get_session(session_id: str, owner: str) -> Optional[ChatSession]:
+    """The session if it exists, has not expired and belongs to ``owner``."""
+    with _lock:
+        _expire_locked(time.time())
+        session = _sessions.get(session_id)
+        if session is None or session.owner != owner:
+            return None
+        session.updated = time.time()
+        _sessions.move_to_end(session_id)
+        return session
+
+
+def delete_session(session_id: str, owner: str) -> bool:
+    with _lock:
+        session = _sessions.get(session_id)
+        if session is None or session.owner != owner:
+            return False
+        del _sessions[session_id]
+        return True
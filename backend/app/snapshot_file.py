@@ -0,0 +1,363 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+import csv
+import io
+import json
+import logging
+import mmap
+import os
+import pathlib
+import threading
+import zlib
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: concurrent saves are merely redundant
+    fcntl = None
+
+import numpy as np
+
+from .columns import CATEGORY_FIELDS, FLOAT_FIELDS, Categorical, RowColumns, row_columns
+from .storage import _FILE_LOCK, _STORE_LOCK, FILE, HEADERS, SNAPSHOT_FILE, _read_csv, _stat_signature, snapshot
+
+
+MAGIC = b"DDRSNAP2"
+ALIGN = 64
+TAIL_BYTES = 4096
+RESAVE_ROWS = 5000  # a load that had to parse this many CSV rows writes a new snapshot
+
+logger = logging.getLogger(__name__)
+
+Rows = List[Mapping[str, Any]]
+StatSignature = Tuple[int, int, int]
+
+_saving = threading.Lock()
+
+
+def _tail_crc(f: Any, size: int) -> int:
+    """Checksum of the bytes just before ``size``, to tell a grown CSV from a rewritten one."""
+    start = max(0, size - TAIL_BYTES)
+    f.seek(start)
+    return zlib.crc32(f.read(size - start))
+
+
+def _encode(rows: Sequence[Mapping[str, Any]]) -> Tuple[List[str], Dict[str, np.ndarray]]:
+    """One string table for all columns and an int32 code column per CSV header; None is -1."""
+    lookup: Dict[str, int] = {}
+    # Rows still backed by a mapped segment are translated code to code, not decoded per value.
+    translated: Dict[int, Dict[int, int]] = {}
+
+    def code(row: Mapping[str, Any], name: str) -> int:
+        if type(row) is SharedRow:
+            segment = row._segment
+            old = segment.columns[name][row._i]
+            known = translated.setdefault(id(segment), {})
+            if old not in known:
+                value = segment.string(old)
+                known[old] = -1 if value is None else lookup.setdefault(value, len(lookup))
+            return known[old]
+        value = row.get(name)
+        return -1 if value is None else lookup.setdefault(value, len(lookup))
+
+    codes = {
+        name: np.fromiter((code(row, name) for row in rows), dtype=np.int32, count=len(rows)) for name in HEADERS
+    }
+    return list(lookup), codes
+
+
+def save(
+    rows: Sequence[Dict[str, Any]],
+    typed: RowColumns,
+    source: StatSignature,
+    tail_crc: int,
+    path: Optional[pathlib.Path] = SNAPSHOT_FILE,
+) -> bool:
+    """Write the snapshot of ``rows``, read from a CSV with signature ``source``.
+
+    The file holds one string table, an int32 code column per CSV header into it and
+    the typed columns, each aligned so it can be mapped straight into numpy. Returns
+    False without writing when a row does not have exactly the CSV columns.
+    """
+    if path is None:
+        return False
+    if any(len(row) != len(HEADERS) for row in rows) or (rows and list(rows[0]) != list(HEADERS)):
+        return False
+    strings, codes = _encode(rows)
+    encoded = [value.encode("utf-8") for value in strings]
+    lengths = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded))
+    arrays: Dict[str, np.ndarray] = {
+        "strings": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        "string_ends": np.cumsum(lengths),  # byte offset just past each string
+        "start": typed.start,
+        "end": typed.end,
+        "gw_flag": typed.gw_flag,
+    }
+    for name, values in typed.floats.items():
+        arrays[f"float:{name}"] = values
+    for name, cat in typed.cats.items():
+        arrays[f"cat:{name}"] = cat.codes
+    for name, values in codes.items():
+        arrays[f"col:{name}"] = values
+    layout: Dict[str, Dict[str, Any]] = {}
+    offset = 0
+    for name, values in arrays.items():
+        offset = -(-offset // ALIGN) * ALIGN
+        layout[name] = {"dtype": values.dtype.str, "shape": list(values.shape), "offset": offset}
+        offset += values.nbytes
+    header = json.dumps(
+        {
+            "rows": len(rows),
+            "headers": list(HEADERS),
+            "source": list(source),
+            "tail_crc": tail_crc,
+            "categories": {name: cat.labels for name, cat in typed.cats.items()},
+            "arrays": layout,
+        }
+    ).encode("utf-8")
+    base = -(-(len(MAGIC) + 8 + len(header)) // ALIGN) * ALIGN
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        with tmp.open("wb") as f:
+            f.write(MAGIC + len(header).to_bytes(8, "little") + header)
+            for name, values in arrays.items():
+                f.seek(base + layout[name]["offset"])
+                f.write(np.ascontiguousarray(values).tobytes())
+            f.truncate(base + offset)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return True
+
+
+def _map(path: pathlib.Path) -> Optional[Tuple[Dict[str, Any], Dict[str, np.ndarray], StatSignature]]:
+    """(header, arrays, file signature) with the arrays backed by a read-only mapping of the file."""
+    try:
+        with path.open("rb") as f:
+            signature = _stat_signature(path, os.fstat(f.fileno()))
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (FileNotFoundError, ValueError):  # ValueError: an empty file cannot be mapped
+        return None
+    try:
+        if mapped[: len(MAGIC)] != MAGIC:
+            raise ValueError("not a reports snapshot")
+        size = int.from_bytes(mapped[len(MAGIC) : len(MAGIC) + 8], "little")
+        start = len(MAGIC) + 8
+        header = json.loads(mapped[start : start + size].decode("utf-8"))
+        base = -(-(start + size) // ALIGN) * ALIGN
+        arrays = {}
+        for name, spec in header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            count = int(np.prod(spec["shape"]))
+            arrays[name] = np.frombuffer(mapped, dtype=dtype, count=count, offset=base + spec["offset"])
+        if header["headers"] != list(HEADERS):
+            raise ValueError("written for a different CSV schema")
+    except (ValueError, KeyError, TypeError) as exc:
+        logger.warning("Ignoring unreadable reports snapshot %s: %s", path, exc)
+        return None
+    return header, arrays, signature
+
+
+class SharedRow(Mapping):
+    """A report row read straight from a mapped snapshot: a read-only mapping like the CSV dicts.
+
+    It holds only its segment and row number. Values are decoded from the shared
+    pages on access, so N workers attached to one snapshot keep one copy of the data.
+    """
+
+    __slots__ = ("_segment", "_i")
+
+    def __init__(self, segment: "_Segment", i: int):
+        self._segment = segment
+        self._i = i
+
+    def __getitem__(self, key: str) -> Optional[str]:
+        if key == "BoreholeID":
+            return self._segment.ids[self._i]
+        column = self._segment.columns.get(key)
+        if column is None:
+            raise KeyError(key)
+        return self._segment.string(column[self._i])
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key == "BoreholeID":
+            return self._segment.ids[self._i]
+        column = self._segment.columns.get(key)
+        return default if column is None else self._segment.string(column[self._i])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(HEADERS)
+
+    def __len__(self) -> int:
+        return len(HEADERS)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+class _Segment:
+    """One mapped snapshot file; every array is a read-only view of the shared mapping."""
+
+    def __init__(self, header: Dict[str, Any], arrays: Dict[str, np.ndarray], file_signature: StatSignature):
+        self.header = header
+        self.file_signature = file_signature
+        self._blob = memoryview(arrays["strings"])
+        self._ends = memoryview(arrays["string_ends"])
+        self.columns = {name: memoryview(arrays[f"col:{name}"]) for name in HEADERS}
+        # Every lookup, replay and uniqueness check reads BoreholeID, so it alone is decoded up front.
+        self.ids = [self.string(code) for code in self.columns["BoreholeID"]]
+        self.rows: Rows = [SharedRow(self, i) for i in range(header["rows"])]
+        self.typed = RowColumns(
+            arrays["start"],
+            arrays["end"],
+            {name: arrays[f"float:{name}"] for name in FLOAT_FIELDS},
+            arrays["gw_flag"],
+            {name: Categorical(arrays[f"cat:{name}"], header["categories"][name]) for name in CATEGORY_FIELDS},
+        )
+
+    def string(self, code: int) -> Optional[str]:
+        if code < 0:
+            return None
+        return str(self._blob[self._ends[code - 1] if code else 0 : self._ends[code]], "utf-8")
+
+
+# (file signature, segment); a file that failed to map is remembered as None until it changes.
+_attached: Tuple[Optional[StatSignature], Optional[_Segment]] = (None, None)
+_attach_lock = threading.Lock()
+
+
+def attach() -> Optional[_Segment]:
+    """The mapped snapshot, re-mapped only when the file has been replaced.
+
+    Reloads after another worker's write keep the same segment and row objects, so
+    only the CSV tail and the journal are read again.
+    """
+    global _attached
+    if SNAPSHOT_FILE is None:
+        return None
+    signature = _stat_signature(SNAPSHOT_FILE)
+    with _attach_lock:
+        if _attached[0] == signature:
+            return _attached[1]
+        loaded = _map(SNAPSHOT_FILE) if signature is not None else None
+        segment = None if loaded is None else _Segment(*loaded)
+        _attached = (signature if segment is None else segment.file_signature, segment)
+        return segment
+
+
+def read_base() -> Tuple[Rows, Optional[StatSignature], Optional[RowColumns]]:
+    """reports.csv rows before the journal, the file's signature and, when mapped, the typed columns.
+
+    The snapshot is used as is when its source signature matches the CSV. If the CSV
+    has only grown since (same inode, and the bytes just before the old end still
+    checksum the same), just the appended tail is parsed. Otherwise it is stale and the
+    CSV is parsed in full; a load that parsed many rows writes a fresh snapshot in the
+    background.
+    """
+    try:
+        f = FILE.open("rb")
+    except FileNotFoundError:
+        return [], None, None
+    with f:
+        st = os.fstat(f.fileno())
+        signature = _stat_signature(FILE, st)
+        segment = attach()
+        if segment is not None:
+            source = tuple(segment.header["source"])
+            if source == signature:
+                return segment.rows, signature, segment.typed
+            covered = source[1]
+            if source[2] == st.st_ino and covered <= st.st_size and _tail_crc(f, covered) == segment.header["tail_crc"]:
+                prefix, typed = segment.rows, segment.typed
+                f.seek(covered)
+                text = io.TextIOWrapper(io.BytesIO(f.read()), encoding="utf-8")
+                rows = prefix + [dict(row) for row in csv.DictReader(text, fieldnames=HEADERS)]
+                typed = RowColumns.parse(rows, reuse=(prefix, typed))
+                if len(rows) - len(prefix) >= RESAVE_ROWS:
+                    save_in_background(rows, signature, typed)
+                return rows, signature, typed
+    rows, signature = _read_csv()
+    if signature is not None and len(rows) >= RESAVE_ROWS:
+        save_in_background(rows, signature)
+    return rows, signature, None
+
+
+def _covers(source: StatSignature) -> bool:
+    segment = attach()
+    if segment is None:
+        return False
+    covered = segment.header["source"]
+    return covered[2] == source[2] and covered[1] >= source[1]
+
+
+@contextmanager
+def _save_turn() -> Iterator[bool]:
+    """Yields False if another process is already writing the snapshot."""
+    if fcntl is None or SNAPSHOT_FILE is None:
+        yield True
+        return
+    fd = os.open(SNAPSHOT_FILE.with_name(SNAPSHOT_FILE.name + ".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        yield True
+    finally:
+        os.close(fd)
+
+
+def save_in_background(
+    rows: Sequence[Dict[str, Any]], source: StatSignature, typed: Optional[RowColumns] = None
+) -> None:
+    """Write the snapshot for CSV rows read from a file with signature ``source``, off the request path.
+
+    Without ``typed`` the columns are parsed here, reusing whatever the published
+    snapshot has already parsed for the same row objects.
+    """
+
+    def run() -> None:
+        with _saving, _save_turn() as ours:
+            if not ours or _covers(source):
+                return  # another worker is writing it, or already has
+            try:
+                with FILE.open("rb") as f:
+                    st = os.fstat(f.fileno())
+                    if st.st_ino != source[2] or st.st_size < source[1]:
+                        return  # replaced since it was read; the next load saves again
+                    crc = _tail_crc(f, source[1])
+                columns = typed
+                if columns is None:
+                    current = snapshot().rows
+                    columns = RowColumns.parse(rows, reuse=(current, row_columns(current)))
+                save(rows, columns, source, crc)
+            except Exception:  # pragma: no cover
+                logger.exception("Writing the reports snapshot failed")
+
+    threading.Thread(target=run, name="reports-snapshot", daemon=True).start()
+
+
+def save_now() -> int:
+    if SNAPSHOT_FILE is None:
+        raise SystemExit("REPORTS_SNAPSHOT is empty, so the binary snapshot is turned off.")
+    with _STORE_LOCK, _FILE_LOCK.hold(exclusive=False):
+        rows, signature = _read_csv()
+        if signature is None:
+            raise SystemExit(f"{FILE} does not exist.")
+        with FILE.open("rb") as f:
+            crc = _tail_crc(f, signature[1])
+    if not save(rows, RowColumns.parse(rows), signature, crc):
+        raise SystemExit(f"{FILE} has rows that do not match the soil boring schema.")
+    return len(rows)
+
+
+if __name__ == "__main__":
+    count = save_now()
+    print(f"Wrote {SNAPSHOT_FILE} for {count} rows of {FILE}.")
@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import heapq
+import math
+import os
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .parsing import parse_float
+from .storage import Change, ReportSnapshot, snapshot, subscribe
+
+
+CELL_DEG = float(os.environ.get("SPATIAL_CELL_DEG", "0.01"))  # grid cell size; 0.01° of latitude is ~1.1 km
+EARTH_RADIUS_M = 6371008.8
+
+Cell = Tuple[int, int]
+# (latitude, longitude, row)
+Point = Tuple[float, float, Dict[str, Any]]
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _coords(row: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+    lat, lon = parse_float(row.get("Latitude")), parse_float(row.get("Longitude"))
+    if lat is None or lon is None or not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return lat, lon
+
+
+class SpatialIndex:
+    """Uniform lat/lon grid over the reports that have valid coordinates.
+
+    Each cell holds the rowids inside it, so a query only visits the cells its box or
+    circle touches. Kept current by storage write deltas like the dashboard aggregates;
+    a reload from disk marks it stale and the next query rebuilds it.
+    """
+
+    def __init__(self, cell_deg: float = CELL_DEG) -> None:
+        self.cell_deg = cell_deg
+        self.columns = max(1, int(round(360 / cell_deg)))
+        self.version = -1
+        self._lock = threading.RLock()
+        self._stale = True
+        self._reset()
+
+    def _reset(self) -> None:
+        self._cells: Dict[Cell, Dict[int, Point]] = {}
+        self._where: Dict[int, Cell] = {}
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def _cell(self, lat: float, lon: float) -> Cell:
+        return math.floor(lat / self.cell_deg), math.floor((lon + 180) / self.cell_deg) % self.columns
+
+    def _add(self, rowid: int, row: Dict[str, Any]) -> None:
+        coords = _coords(row)
+        if coords is None:
+            return
+        cell = self._cell(*coords)
+        self._cells.setdefault(cell, {})[rowid] = (coords[0], coords[1], row)
+        self._where[rowid] = cell
+
+    def _remove(self, rowid: int) -> None:
+        cell = self._where.pop(rowid, None)
+        if cell is None:
+            return
+        points = self._cells[cell]
+        del points[rowid]
+        if not points:
+            del self._cells[cell]
+
+    def rebuild(self, snap: ReportSnapshot) -> None:
+        with self._lock:
+            self._reset()
+            for rowid, row in zip(snap.rowids, snap.rows):
+                self._add(rowid, row)
+            self.version = snap.version
+            self._stale = False
+
+    def apply(self, snap: ReportSnapshot, changes: Optional[Sequence[Change]]) -> None:
+        with self._lock:
+            if changes is None or self._stale or self.version != snap.version - 1:
+                self._stale = True
+                return
+            for rowid, old, new in changes:
+                if old is not None:
+                    self._remove(rowid)
+                if new is not None:
+                    self._add(rowid, new)
+            self.version = snap.version
+
+    def _all(self) -> Iterator[Point]:
+        for points in self._cells.values():
+            yield from points.values()
+
+    def _box(self, south: float, west: float, north: float, east: float) -> Iterator[Point]:
+        """Points in cells touching the box; ``west > east`` wraps across the antimeridian."""
+        lat_lo, lat_hi = math.floor(south / self.cell_deg), math.floor(north / self.cell_deg)
+        col_lo = math.floor((west + 180) / self.cell_deg)
+        col_hi = math.floor((east + 180) / self.cell_deg)
+        if west > east:
+            col_hi += self.columns
+        # A band spanning the whole globe would otherwise reach its first column again.
+        col_hi = min(col_hi, col_lo + self.columns - 1)
+        cells = (lat_hi - lat_lo + 1) * (col_hi - col_lo + 1)
+        if cells > len(self._cells):
+            # A box wider than the data: walking the occupied cells is cheaper.
+            yield from self._all()
+            return
+        for i in range(lat_lo, lat_hi + 1):
+            for j in range(col_lo, col_hi + 1):
+                points = self._cells.get((i, j % self.columns))
+                if points:
+                    yield from points.values()
+
+    def bbox(self, south: float, west: float, north: float, east: float) -> List[Dict[str, Any]]:
+        wraps = west > east
+        with self._lock:
+            return [
+                row
+                for lat, lon, row in self._box(south, west, north, east)
+                if south <= lat <= north and ((lon >= west or lon <= east) if wraps else west <= lon <= east)
+            ]
+
+    def radius(self, lat: float, lon: float, radius_m: float) -> List[Tuple[float, Dict[str, Any]]]:
+        """(distance in metres, row) for every report within ``radius_m``, nearest first."""
+        dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+        south, north = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+        cos_lat = min(math.cos(math.radians(south)), math.cos(math.radians(north)))
+        if cos_lat <= 1e-9 or dlat >= 90:
+            west, east = -180.0, 180.0
+        else:
+            dlon = min(180.0, dlat / cos_lat)
+            west, east = lon - dlon, lon + dlon
+            if west < -180:
+                west += 360
+            if east > 180:
+                east -= 360
+            if dlon >= 180:
+                west, east = -180.0, 180.0
+        with self._lock:
+            found = [
+                (d, row)
+                for plat, plon, row in self._box(south, west, north, east)
+                if (d := haversine_m(lat, lon, plat, plon)) <= radius_m
+            ]
+        found.sort(key=lambda item: item[0])
+        return found
+
+    def _span(self, cj: int, r: int) -> List[int]:
+        """Columns within ``r`` of column ``cj``, each once even when ``r`` wraps the globe."""
+        if 2 * r + 1 >= self.columns:
+            return list(range(self.columns))
+        return [(cj + d) % self.columns for d in range(-r, r + 1)]
+
+    def _ring(self, center: Cell, r: int) -> Iterator[Cell]:
+        """Cells at Chebyshev distance ``r`` from ``center`` that no smaller ring visited."""
+        ci, cj = center
+        if r == 0:
+            yield center
+            return
+        columns = self._span(cj, r)
+        inner = set(self._span(cj, r - 1))
+        edges = [j for j in columns if j not in inner]
+        for i in range(ci - r, ci + r + 1):
+            for j in columns if i in (ci - r, ci + r) else edges:
+                yield i, j
+
+    def _ring_bound(self, lat: float, lon: float, r: int) -> float:
+        """Lower bound on the distance from (lat, lon) to any cell outside the first ``r`` rings."""
+        i, _ = self._cell(lat, lon)
+        lat_gap = min(lat - i * self.cell_deg, (i + 1) * self.cell_deg - lat) + (r - 1) * self.cell_deg
+        lon_off = (lon + 180) - math.floor((lon + 180) / self.cell_deg) * self.cell_deg
+        lon_gap = min(lon_off, self.cell_deg - lon_off) + (r - 1) * self.cell_deg
+        by_lat = EARTH_RADIUS_M * math.radians(lat_gap)
+        # Distance to the meridian lon_gap away, which no point beyond it can beat.
+        reach = math.cos(math.radians(lat)) * math.sin(math.radians(min(lon_gap, 90.0)))
+        by_lon = EARTH_RADIUS_M * math.asin(min(1.0, reach))
+        return max(0.0, min(by_lat, by_lon))
+
+    def nearest(self, lat: float, lon: float, k: int) -> List[Tuple[float, Dict[str, Any]]]:
+        """The ``k`` reports closest to (lat, lon) as (distance in metres, row), nearest first.
+
+        Rings of cells are searched outwards until the next ring cannot hold anything
+        closer than the k-th best so far.
+        """
+        with self._lock:
+            total = len(self._where)
+            if k <= 0 or not total:
+                return []
+            center = self._cell(lat, lon)
+            best: List[Tuple[float, int, Dict[str, Any]]] = []  # max-heap on distance via negation
+            seen = 0
+            r = 0
+            while True:
+                if (2 * r + 1) ** 2 > 4 * len(self._cells):
+                    # The rings now cover more cells than are occupied: rank the rest directly.
+                    distances = ((haversine_m(lat, lon, plat, plon), row) for plat, plon, row in self._all())
+                    return heapq.nsmallest(k, distances, key=lambda item: item[0])
+                for cell in self._ring(center, r):
+                    for rowid, (plat, plon, row) in self._cells.get(cell, {}).items():
+                        seen += 1
+                        item = (-haversine_m(lat, lon, plat, plon), rowid, row)
+                        if len(best) < k:
+                            heapq.heappush(best, item)
+                        elif item > best[0]:
+                            heapq.heapreplace(best, item)
+                r += 1
+                if seen >= total or (len(best) == k and self._ring_bound(lat, lon, r) >= -best[0][0]):
+                    break
+            return [(-d, row) for d, _, row in sorted(best, reverse=True)]
+
+
+_index = SpatialIndex()
+subscribe(_index.apply)
+
+
+def spatial_index(snap: Optional[ReportSnapshot] = None) -> SpatialIndex:
+    """The grid for the current reports, rebuilt only if write deltas were missed."""
+    if snap is None:
+        snap = snapshot()
+    with _index._lock:
+        if _index._stale or _index.version < snap.version:
+            _index.rebuild(snap)
+    return _index
@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import argparse
+from contextlib import contextmanager
+import os
+import pathlib
+import sqlite3
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .storage import DB_FILE, HEADERS, _read_rows, _to_cached
+
+
+_COLUMNS = ", ".join(f'"{name}"' for name in HEADERS)
+_PLACEHOLDERS = ", ".join("?" for _ in HEADERS)
+_FIRST_ROW = "(SELECT min(rowid) FROM reports WHERE BoreholeID = ?)"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    rowid INTEGER PRIMARY KEY,
+    %s
+);
+CREATE INDEX IF NOT EXISTS reports_borehole ON reports (BoreholeID);
+CREATE INDEX IF NOT EXISTS reports_start ON reports (StartDate);
+CREATE INDEX IF NOT EXISTS reports_project ON reports (ProjectName);
+CREATE INDEX IF NOT EXISTS reports_contractor ON reports (Contractor);
+CREATE TABLE IF NOT EXISTS users (
+    email_key TEXT PRIMARY KEY,
+    email TEXT NOT NULL,
+    password TEXT NOT NULL,
+    role TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('holds_users', 0);
+""" % ",\n    ".join(f"\"{name}\" TEXT NOT NULL DEFAULT ''" for name in HEADERS)
+
+
+class SqliteBackend:
+    """Reports, and optionally users, in one SQLite database in WAL mode.
+
+    The signature is (database inode, ``PRAGMA data_version``). data_version moves
+    whenever another connection, in this process or any other, commits; our own
+    writes are published by the storage module directly, so they need not move it.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: pathlib.Path = DB_FILE):
+        self.path = pathlib.Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit mode; writes open their own BEGIN IMMEDIATE transactions.
+        self._conn = sqlite3.connect(str(self.path), isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=FULL")
+            self._conn.execute("PRAGMA busy_timeout=5000")
+            self._conn.executescript(SCHEMA)
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(reports)")][1:]
+        if columns != list(HEADERS):
+            raise RuntimeError(f"{self.path} reports table does not match the soil boring schema.")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _meta(self, key: str) -> int:
+        return self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0]
+
+    def _signature(self) -> Tuple[Optional[int], int]:
+        try:
+            inode: Optional[int] = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            inode = None
+        return inode, self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    # Reports: the storage backend interface.
+
+    def signature(self) -> Tuple[Optional[int], int]:
+        with self._lock:
+            return self._signature()
+
+    def read(self) -> Tuple[Tuple[Dict[str, Any], ...], Tuple[Optional[int], int]]:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                signature = self._signature()
+                cursor = self._conn.execute(f"SELECT {_COLUMNS} FROM reports ORDER BY rowid")
+                rows = tuple(dict(zip(HEADERS, values)) for values in cursor)
+            finally:
+                self._conn.execute("COMMIT")
+            return rows, signature
+
+    def write(self, writes: Sequence[Tuple[Any, ...]]) -> None:
+        """Apply a group of storage writes in one transaction (one WAL sync)."""
+        with self._transaction() as conn:
+            for kind, *args in writes:
+                if kind == "append":
+                    values = [tuple(_to_cached(row)[name] for name in HEADERS) for row in args[0]]
+                    conn.executemany(f"INSERT INTO reports ({_COLUMNS}) VALUES ({_PLACEHOLDERS})", values)
+                elif kind == "update":
+                    borehole_id, fields = args
+                    names = [name for name in HEADERS if name in fields]
+                    if names:
+                        assignments = ", ".join(f'"{name}" = ?' for name in names)
+                        conn.execute(
+                            f"UPDATE reports SET {assignments} WHERE rowid = {_FIRST_ROW}",
+                            [fields[name] for name in names] + [borehole_id],
+                        )
+                elif kind == "delete":
+                    conn.execute(f"DELETE FROM reports WHERE rowid = {_FIRST_ROW}", (args[0],))
+
+    def after_write(self) -> None:
+        pass
+
+    def replace_reports(self, rows: Sequence[Dict[str, Any]]) -> None:
+        values = [tuple(_to_cached(row)[name] for name in HEADERS) for row in rows]
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM reports")
+            conn.executemany(f"INSERT INTO reports ({_COLUMNS}) VALUES ({_PLACEHOLDERS})", values)
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM reports").fetchone()[0]
+
+    # Users, once moved in from users.json.
+
+    def users_signature(self) -> Optional[Tuple[Optional[int], int]]:
+        """None until users have been moved into the database."""
+        with self._lock:
+            if not self._meta("holds_users"):
+                return None
+            return self._signature()
+
+    def read_users(self) -> List[Dict[str, str]]:
+        with self._lock:
+            cursor = self._conn.execute("SELECT email, password, role FROM users ORDER BY email_key")
+            return [{"email": email, "password": password, "role": role} for email, password, role in cursor]
+
+    def write_users(self, users: Sequence[Dict[str, str]]) -> None:
+        """Replace the user table and make the database the user store."""
+        values = [(u["email"].lower(), u["email"], u["password"], u.get("role", "admin")) for u in users]
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM users")
+            conn.executemany("INSERT INTO users (email_key, email, password, role) VALUES (?, ?, ?, ?)", values)
+            conn.execute("UPDATE meta SET value = 1 WHERE key = 'holds_users'")
+
+
+def migrate(path: pathlib.Path = DB_FILE, *, users: bool = False, replace: bool = False) -> Dict[str, int]:
+    """Copy reports.csv (with its journal applied), and optionally users.json, into ``path``."""
+    from .auth import _read_users_file
+
+    db = SqliteBackend(path)
+    try:
+        rows, _ = _read_rows()
+        existing = db.count()
+        if existing and not replace:
+            raise SystemExit(f"{path} already holds {existing} reports; pass --replace to overwrite them.")
+        db.replace_reports(rows)
+        moved = {"reports": len(rows)}
+        if users:
+            entries = list(_read_users_file().values())
+            db.write_users(entries)
+            moved["users"] = len(entries)
+        return moved
+    finally:
+        db.close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Import reports.csv (and users.json) into the SQLite store.")
+    parser.add_argument("--db", type=pathlib.Path, default=DB_FILE, help="database file (REPORTS_DB)")
+    parser.add_argument("--users", action="store_true", help="also move users.json into the database")
+    parser.add_argument("--replace", action="store_true", help="overwrite reports already in the database")
+    args = parser.parse_args(argv)
+    moved = migrate(args.db, users=args.users, replace=args.replace)
+    print(", ".join(f"{count} {name}" for name, count in moved.items()), f"imported into {args.db}")
+    print("Set STORAGE_BACKEND=sqlite to serve from it.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,41 @@
+import bisect
+from concurrent.futures import Future
+from contextlib import contextmanager
 import csv
+import io
+import json
+import logging
 import os
 import pathlib
-from typing import Any, Dict, List, Sequence
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: writes are only serialized within one process
+    fcntl = None
 
 
 DATA_PATH = pathlib.Path(os.environ.get("DATA_DIR", "data"))
 DATA_PATH.mkdir(parents=True, exist_ok=True)
 
 FILE = DATA_PATH / "reports.csv"
+JOURNAL = DATA_PATH / "reports.journal"
+JOURNAL_MAX_BYTES = int(os.environ.get("REPORTS_JOURNAL_MAX_BYTES", str(1024 * 1024)))
+JOURNAL_MAX_ENTRIES = int(os.environ.get("REPORTS_JOURNAL_MAX_ENTRIES", "500"))
+BACKEND = os.environ.get("STORAGE_BACKEND", "csv").strip().lower()  # csv | sqlite
+DB_FILE = pathlib.Path(os.environ.get("REPORTS_DB", str(DATA_PATH / "reports.db")))
+# Binary copy of reports.csv mapped at startup instead of re-parsing it; empty turns it off.
+_SNAPSHOT = os.environ.get("REPORTS_SNAPSHOT", str(DATA_PATH / "reports.snap"))
+SNAPSHOT_FILE = pathlib.Path(_SNAPSHOT) if _SNAPSHOT else None
+LOCK_FILE = DATA_PATH / "reports.lock"
+# Writes arriving this soon after the first queued one share its commit (and fsync).
+COMMIT_WINDOW = float(os.environ.get("REPORTS_COMMIT_WINDOW_MS", "2")) / 1000
+COMMIT_MAX_WRITES = 1000
+
+logger = logging.getLogger(__name__)
 
 HEADERS: Sequence[str] = (
     "BoreholeID",
@@ -35,6 +63,266 @@ HEADERS: Sequence[str] = (
 )
 
 
+class DuplicateReportError(ValueError):
+    """Raised when a write would create a second report with the same BoreholeID."""
+
+
+class ReportSnapshot:
+    """Immutable, versioned view of the report rows.
+
+    Rows are shared between readers; treat them as read-only. ``rowids`` gives each
+    row a stable id that survives edits and deletes of other rows, so derived state
+    can follow a row across versions; ids restart from 0 whenever rows are reloaded.
+    """
+
+    __slots__ = ("version", "rows", "signature", "rowids", "next_rowid", "_index")
+
+    def __init__(
+        self,
+        version: int,
+        rows: Tuple[Dict[str, Any], ...],
+        signature: Optional[Any],
+        rowids: Optional[Tuple[int, ...]] = None,
+        next_rowid: Optional[int] = None,
+    ):
+        self.version = version
+        self.rows = rows
+        self.signature = signature
+        self.rowids = tuple(range(len(rows))) if rowids is None else rowids
+        self.next_rowid = len(rows) if next_rowid is None else next_rowid
+        self._index: Optional[Dict[str, int]] = None
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @property
+    def index(self) -> Dict[str, int]:
+        """BoreholeID -> position of its first row, built once per snapshot."""
+        if self._index is None:
+            index: Dict[str, int] = {}
+            for pos, row in enumerate(self.rows):
+                index.setdefault(str(row.get("BoreholeID")), pos)
+            self._index = index
+        return self._index
+
+    def position(self, borehole_id: str) -> Optional[int]:
+        return self.index.get(str(borehole_id))
+
+    def get(self, borehole_id: str) -> Optional[Dict[str, Any]]:
+        pos = self.position(borehole_id)
+        return None if pos is None else self.rows[pos]
+
+
+_STORE_LOCK = threading.RLock()
+_snapshot = ReportSnapshot(0, (), None)
+_loaded = False
+_journal_entries = 0
+_compactor: Optional[threading.Thread] = None
+
+# (rowid, old row, new row) for one written row; old is None for inserts, new is None for deletes.
+Change = Tuple[int, Optional[Dict[str, Any]], Optional[Dict[str, Any]]]
+Listener = Callable[[ReportSnapshot, Optional[Sequence[Change]]], None]
+_listeners: List[Listener] = []
+
+Signature = Tuple[Optional[Tuple[int, int, int]], Optional[Tuple[int, int, int]]]
+
+
+def _stat_signature(path: pathlib.Path, st: Optional[os.stat_result] = None) -> Optional[Tuple[int, int, int]]:
+    if st is None:
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _file_signature() -> Signature:
+    return (_stat_signature(FILE), _stat_signature(JOURNAL))
+
+
+def subscribe(listener: Listener) -> None:
+    """Call ``listener(snapshot, changes)`` after every new snapshot is published.
+
+    ``changes`` lists the row writes that produced the snapshot (one for single-row
+    writes, many for a bulk import), or is None when the rows were (re)loaded from
+    disk and derived state must be rebuilt.
+    Listeners run under the store lock, so they see versions strictly in order.
+    """
+    _listeners.append(listener)
+
+
+def _publish(
+    rows: Tuple[Dict[str, Any], ...],
+    signature: Optional[Signature],
+    changes: Optional[Sequence[Change]] = None,
+    rowids: Optional[Tuple[int, ...]] = None,
+) -> ReportSnapshot:
+    """Publish a new version. Without ``rowids`` the rows are treated as freshly loaded."""
+    global _snapshot, _loaded
+    previous = _snapshot
+    if rowids is None:
+        _snapshot = ReportSnapshot(previous.version + 1, rows, signature)
+    else:
+        next_rowid = max(previous.next_rowid, rowids[-1] + 1 if rowids else 0)
+        _snapshot = ReportSnapshot(previous.version + 1, rows, signature, rowids, next_rowid)
+    _loaded = True
+    for listener in _listeners:
+        try:
+            listener(_snapshot, changes)
+        except Exception:  # pragma: no cover
+            logger.exception("Report listener failed")
+    return _snapshot
+
+
+def _read_journal(csv_inode: Optional[int]) -> Tuple[List[Dict[str, Any]], Optional[Tuple[int, int, int]]]:
+    """Journal entries for the reports.csv with ``csv_inode``.
+
+    A new journal starts with a {"base": inode} line naming the CSV it applies to.
+    Compaction replaces the CSV (a new inode) before removing the journal, so a journal
+    left behind by a crash in between names the old file and is ignored.
+    """
+    try:
+        f = JOURNAL.open("r", encoding="utf-8")
+    except FileNotFoundError:
+        return [], None
+    entries: List[Dict[str, Any]] = []
+    base: Optional[int] = None
+    with f:
+        signature = _stat_signature(JOURNAL, os.fstat(f.fileno()))
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A torn final line from a crash mid-append; everything before it is intact.
+                logger.warning("Skipping unreadable journal entry in %s", JOURNAL)
+                continue
+            if isinstance(entry, dict) and entry.get("id") is not None:
+                entries.append(entry)
+            elif isinstance(entry, dict) and "base" in entry and not entries:
+                base = entry["base"]
+    if base is not None and base != csv_inode:
+        logger.info("Ignoring %s: it was already folded into %s", JOURNAL, FILE)
+        return [], signature
+    return entries, signature
+
+
+def _replay(rows: List[Optional[Dict[str, Any]]], entries: List[Dict[str, Any]]) -> Tuple[Dict[str, Any], ...]:
+    """Apply journal entries to base rows in order, matching the first row per BoreholeID.
+
+    Appended rows are already in the base rows, after every row that existed when
+    they were written. Renames move a row to its new BoreholeID, so later entries
+    find it under the name they were journaled with.
+    """
+    wanted = {str(e["id"]) for e in entries}
+    positions: Dict[str, List[int]] = {}
+    for idx, row in enumerate(rows):
+        key = str(row.get("BoreholeID"))
+        if key in wanted:
+            positions.setdefault(key, []).append(idx)
+    for entry in entries:
+        key = str(entry["id"])
+        matches = positions.get(key)
+        if not matches:
+            continue
+        if entry.get("op") == "delete":
+            rows[matches.pop(0)] = None
+        elif entry.get("op") == "upsert":
+            idx = matches[0]
+            merged = dict(rows[idx])
+            merged.update(entry.get("fields") or {})
+            rows[idx] = merged
+            renamed = str(merged.get("BoreholeID"))
+            if renamed != key:
+                matches.pop(0)
+                bisect.insort(positions.setdefault(renamed, []), idx)
+    return tuple(row for row in rows if row is not None)
+
+
+def _read_csv() -> Tuple[List[Dict[str, Any]], Optional[Tuple[int, int, int]]]:
+    try:
+        f = FILE.open("r", encoding="utf-8")
+    except FileNotFoundError:
+        return [], None
+    with f:
+        signature = _stat_signature(FILE, os.fstat(f.fileno()))
+        return [dict(row) for row in csv.DictReader(f)], signature
+
+
+def _read_rows() -> Tuple[Tuple[Dict[str, Any], ...], Signature]:
+    global _journal_entries
+    typed = None
+    if SNAPSHOT_FILE is not None:
+        from .snapshot_file import read_base
+
+        base, base_signature, typed = read_base()
+    else:
+        base, base_signature = _read_csv()
+    entries, journal_signature = _read_journal(base_signature[2] if base_signature else None)
+    _journal_entries = len(entries)
+    rows = _replay(list(base), entries) if entries else tuple(base)
+    if typed is not None:
+        from .columns import RowColumns, prime
+
+        # Rows the journal left untouched keep their mapped columns.
+        prime(rows, RowColumns.parse(rows, reuse=(base, typed)) if entries else typed)
+    return rows, (base_signature, journal_signature)
+
+
+class _FileLock:
+    """Advisory lock on a lock file (reports.lock, samples.lock), shared by every process
+    using the same DATA_DIR.
+
+    Re-entrant within a process. Callers hold their store's thread lock (_STORE_LOCK
+    for reports), so the depth counter needs no lock of its own. The descriptor is reopened after a fork, because flock locks
+    belong to the open file and a forked worker would otherwise share its parent's.
+    """
+
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self._fd: Optional[int] = None
+        self._pid = 0
+        self._depth = 0
+
+    @contextmanager
+    def hold(self, exclusive: bool = True) -> Iterator[None]:
+        if self._depth == 0 and fcntl is not None:
+            if self._fd is None or self._pid != os.getpid():
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                self._pid = os.getpid()
+            fcntl.flock(self._fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            if self._depth == 0 and fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+_FILE_LOCK = _FileLock(LOCK_FILE)
+
+
+def _refresh_locked() -> ReportSnapshot:
+    """Reload if the stored reports changed behind our back. Caller holds _STORE_LOCK."""
+    if _loaded and _snapshot.signature == _backend.signature():
+        return _snapshot
+    with _FILE_LOCK.hold(exclusive=False):
+        rows, signature = _backend.read()
+    return _publish(rows, signature)
+
+
+def snapshot() -> ReportSnapshot:
+    """Return the current report snapshot, re-reading storage only when it changed."""
+    current = _snapshot
+    if _loaded and current.signature == _backend.signature():
+        return current
+    with _STORE_LOCK:
+        return _refresh_locked()
+
+
 def _to_row(report: Dict[str, Any]) -> Dict[str, Any]:
     row = {key: "" for key in HEADERS}
     for key in HEADERS:
@@ -43,6 +331,11 @@ def _to_row(report: Dict[str, Any]) -> Dict[str, Any]:
     return row
 
 
+def _to_cached(report: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape a row the way csv.DictReader would return it after a round trip."""
+    return {key: "" if value is None else str(value) for key, value in _to_row(report).items()}
+
+
 def _detect_existing_headers() -> Sequence[str] | None:
     if not FILE.exists():
         return None
@@ -55,73 +348,403 @@ def _detect_existing_headers() -> Sequence[str] | None:
         return header
 
 
-def save_report(report: Dict[str, Any], submitted_by: str | None = None) -> None:
+def _check_schema() -> Sequence[str] | None:
     headers = _detect_existing_headers()
     if headers and list(headers) != list(HEADERS):
         raise RuntimeError(
             "Existing reports.csv schema does not match soil boring schema. "
             "Please migrate or remove the file before continuing."
         )
-    payload = dict(report)
-    if submitted_by:
-        payload["SubmittedBy"] = submitted_by
-    row = _to_row(payload)
-    new_file = not FILE.exists() or (headers is None)
-    with FILE.open("a", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=HEADERS)
-        if new_file:
-            writer.writeheader()
-        writer.writerow(row)
+    return headers
+
+
+def _append_durably(path: pathlib.Path, data: bytes) -> int:
+    """Append ``data`` with one write and fsync; returns the previous size for rollback.
+
+    A failed write truncates the file back, so a commit never leaves half its rows.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("ab", buffering=0) as f:
+        start = f.seek(0, os.SEEK_END)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[f.write(view):]
+            os.fsync(f.fileno())
+        except BaseException:
+            f.truncate(start)
+            raise
+    return start
+
+
+def _truncate(path: pathlib.Path, size: int) -> None:
+    with path.open("r+b") as f:
+        f.truncate(size)
+        os.fsync(f.fileno())
+
+
+# A storage mutation: ("append", rows), ("update", borehole_id, fields) or ("delete", borehole_id).
+Write = Tuple[Any, ...]
+
+
+class CsvBackend:
+    """reports.csv plus the edit journal (the default backend).
+
+    A backend persists rows and reports a signature that changes whenever the stored
+    rows may have changed, including writes by other processes. Rows come back as
+    string-valued dicts in insertion order. ``write`` makes a group of mutations
+    durable together; updates and deletes address the first row with the BoreholeID.
+    """
+
+    name = "csv"
+
+    def signature(self) -> Signature:
+        return _file_signature()
+
+    def read(self) -> Tuple[Tuple[Dict[str, Any], ...], Signature]:
+        return _read_rows()
+
+    def write(self, writes: Sequence[Write]) -> None:
+        # Appends go to the CSV and edits to the journal. Replay applies the journal
+        # to the first matching row in file order, which gives the same rows as
+        # applying the writes one by one.
+        rows = [row for w in writes if w[0] == "append" for row in w[1]]
+        entries = [
+            {"op": "upsert", "id": w[1], "fields": w[2]} if w[0] == "update" else {"op": "delete", "id": w[1]}
+            for w in writes
+            if w[0] != "append"
+        ]
+        csv_start = None
+        if rows:
+            headers = _check_schema()
+            buf = io.StringIO()
+            writer = csv.DictWriter(buf, fieldnames=HEADERS)
+            if headers is None:
+                writer.writeheader()
+            writer.writerows(rows)
+            csv_start = _append_durably(FILE, buf.getvalue().encode("utf-8"))
+        if entries:
+            try:
+                _append_journal(entries)
+            except BaseException:
+                if csv_start is not None:
+                    _truncate(FILE, csv_start)
+                raise
+
+    def after_write(self) -> None:
+        _maybe_compact()
+
+
+class _Batch:
+    """Working copy of the rows while one group of writes is applied in order.
+
+    Each write validates before it changes anything, so a rejected write leaves the
+    batch as it was. The BoreholeID index is shared with the snapshot until an
+    insert extends it, and rebuilt on demand after deletes and renames.
+    """
+
+    def __init__(self, snap: ReportSnapshot):
+        self.rows: List[Dict[str, Any]] = list(snap.rows)
+        self.rowids: List[int] = list(snap.rowids)
+        self.next_rowid = snap.next_rowid
+        self._index: Optional[Dict[str, int]] = snap.index
+        self._shared = True
+        self.changes: List[Change] = []
+        self.writes: List[Write] = []
+
+    def position(self, borehole_id: str) -> Optional[int]:
+        if self._index is None:
+            self._index = {}
+            for pos, row in enumerate(self.rows):
+                self._index.setdefault(str(row.get("BoreholeID")), pos)
+            self._shared = False
+        return self._index.get(str(borehole_id))
+
+    def insert(self, reports: Sequence[Dict[str, Any]], submitted_by: Optional[str]) -> int:
+        seen: set = set()
+        for report in reports:
+            _ensure_unique(self, report.get("BoreholeID"))
+            key = str(report.get("BoreholeID") or "")
+            if key and key in seen:
+                raise DuplicateReportError(f"BoreholeID {key} appears more than once")
+            seen.add(key)
+        rows: List[Dict[str, Any]] = []
+        for report in reports:
+            payload = dict(report)
+            if submitted_by:
+                payload["SubmittedBy"] = submitted_by
+            rows.append(_to_row(payload))
+        self.position("")  # make sure the index exists before extending it
+        if self._shared:
+            self._index = dict(self._index)
+            self._shared = False
+        for row in rows:
+            cached = _to_cached(row)
+            rowid = self.next_rowid
+            self.next_rowid += 1
+            self._index.setdefault(cached["BoreholeID"], len(self.rows))
+            self.rows.append(cached)
+            self.rowids.append(rowid)
+            self.changes.append((rowid, None, cached))
+        if self.writes and self.writes[-1][0] == "append":
+            self.writes[-1][1].extend(rows)
+        else:
+            self.writes.append(("append", rows))
+        return len(rows)
+
+    def update(self, borehole_id: str, updates: Dict[str, Any]) -> bool:
+        idx = self.position(borehole_id)
+        if idx is None:
+            return False
+        fields = {
+            key: "" if value is None else str(value)
+            for key, value in (updates or {}).items()
+            if key in HEADERS
+        }
+        if "BoreholeID" in fields:
+            _ensure_unique(self, fields["BoreholeID"], allow=idx)
+        old = self.rows[idx]
+        merged = dict(old)
+        merged.update(fields)
+        self.rows[idx] = merged
+        if merged.get("BoreholeID") != old.get("BoreholeID"):
+            self._index = None
+        self.changes.append((self.rowids[idx], old, merged))
+        self.writes.append(("update", str(borehole_id), fields))
+        return True
+
+    def delete(self, borehole_id: str) -> bool:
+        idx = self.position(borehole_id)
+        if idx is None:
+            return False
+        old = self.rows.pop(idx)
+        rowid = self.rowids.pop(idx)
+        self._index = None
+        self.changes.append((rowid, old, None))
+        self.writes.append(("delete", str(borehole_id)))
+        return True
+
+
+class _Pending:
+    __slots__ = ("kind", "args", "future")
+
+    def __init__(self, kind: str, args: Tuple[Any, ...]):
+        self.kind = kind
+        self.args = args
+        self.future: Future = Future()
+
+
+_writes: "queue.Queue[_Pending]" = queue.Queue()
+_writer: Optional[threading.Thread] = None
+_writer_lock = threading.Lock()
+
+
+def _commit(batch: Sequence[_Pending]) -> None:
+    """Apply a group of writes and make them durable with one backend write.
+
+    Holds the cross-process lock throughout, so the rows checked for duplicates are
+    the rows written to. Writes that fail validation fail alone; a storage error
+    fails the whole group and publishes nothing.
+    """
+    results: Dict[int, Any] = {}
+    with _STORE_LOCK, _FILE_LOCK.hold():
+        work = _Batch(_refresh_locked())
+        for i, pending in enumerate(batch):
+            try:
+                results[i] = getattr(work, pending.kind)(*pending.args)
+            except Exception as exc:
+                pending.future.set_exception(exc)
+        if work.writes:
+            _backend.write(work.writes)
+            _publish(tuple(work.rows), _backend.signature(), work.changes, tuple(work.rowids))
+    for i, result in results.items():
+        batch[i].future.set_result(result)
+
+
+def _write_loop() -> None:
+    while True:
+        batch = [_writes.get()]
+        deadline = time.monotonic() + COMMIT_WINDOW
+        while len(batch) < COMMIT_MAX_WRITES:
+            try:
+                batch.append(_writes.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        try:
+            _commit(batch)
+        except BaseException as exc:
+            logger.exception("Report commit failed")
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(exc)
+            continue
+        try:
+            _backend.after_write()
+        except Exception:  # pragma: no cover
+            logger.exception("Post-commit maintenance failed")
+
+
+def _submit(kind: str, *args: Any) -> Any:
+    """Queue a write for the single writer thread and wait until it is durable."""
+    global _writer
+    pending = _Pending(kind, args)
+    if threading.current_thread() is _writer:
+        # A listener writing from inside a commit; waiting on the queue would deadlock.
+        _commit([pending])
+        return pending.future.result()
+    _writes.put(pending)
+    if _writer is None or not _writer.is_alive():
+        with _writer_lock:
+            if _writer is None or not _writer.is_alive():
+                _writer = threading.Thread(target=_write_loop, name="reports-writer", daemon=True)
+                _writer.start()
+    return pending.future.result()
+
+
+def save_report(report: Dict[str, Any], submitted_by: str | None = None) -> None:
+    _submit("insert", [report], submitted_by)
+
+
+def save_reports(reports: Sequence[Dict[str, Any]], submitted_by: str | None = None) -> int:
+    """Append many reports in one commit, publishing a single new version.
+
+    Either every report is stored or none is: a BoreholeID that already exists (or
+    repeats within ``reports``) raises DuplicateReportError before anything is written,
+    and a failed write leaves storage as it was.
+    """
+    if not reports:
+        return 0
+    return _submit("insert", list(reports), submitted_by)
 
 
 def load_reports() -> List[Dict[str, Any]]:
-    if not FILE.exists():
-        return []
-    with FILE.open("r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        items: List[Dict[str, Any]] = []
-        for row in reader:
-            items.append(dict(row))
-        return items
+    return [dict(row) for row in snapshot().rows]
 
 
-def _write_reports(items: List[Dict[str, Any]]) -> None:
+def _write_reports(items: Sequence[Dict[str, Any]]) -> None:
+    """Replace reports.csv atomically: write a temp file, fsync, rename, fsync the directory."""
     FILE.parent.mkdir(parents=True, exist_ok=True)
-    with FILE.open("w", newline="", encoding="utf-8") as f:
+    tmp = FILE.with_name(FILE.name + ".tmp")
+    with tmp.open("w", newline="", encoding="utf-8") as f:
         writer = csv.DictWriter(f, fieldnames=HEADERS)
         writer.writeheader()
         for row in items:
             writer.writerow(_to_row(row))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, FILE)
+    _fsync_dir(FILE.parent)
+
+
+def _fsync_dir(path: pathlib.Path) -> None:
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:  # pragma: no cover - directories cannot be opened on Windows
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _append_journal(entries: Sequence[Dict[str, Any]]) -> None:
+    global _journal_entries
+    data = "".join(json.dumps(entry, separators=(",", ":")) + "\n" for entry in entries)
+    if not _journal_entries:
+        # No live entries: the journal is missing, empty or already folded into the CSV.
+        # Start a fresh one tagged with the CSV it applies to.
+        signature = _stat_signature(FILE)
+        JOURNAL.unlink(missing_ok=True)
+        data = json.dumps({"base": signature[2] if signature else None}) + "\n" + data
+    _append_durably(JOURNAL, data.encode("utf-8"))
+    _journal_entries += len(entries)
+
+
+def _ensure_unique(current: Any, borehole_id: Any, *, allow: Optional[int] = None) -> None:
+    """Reject a BoreholeID already present in ``current`` (a snapshot or batch) at another position."""
+    key = "" if borehole_id is None else str(borehole_id)
+    if not key:
+        return
+    pos = current.position(key)
+    if pos is not None and pos != allow:
+        raise DuplicateReportError(f"BoreholeID {key} already exists")
+
+
+def get_report(borehole_id: str) -> Optional[Dict[str, Any]]:
+    row = snapshot().get(borehole_id)
+    return None if row is None else dict(row)
 
 
 def delete_report(borehole_id: str) -> bool:
     """Remove the first report matching the BoreholeID. Returns True if deleted."""
-    reports = load_reports()
-    remaining: List[Dict[str, Any]] = []
-    deleted = False
-    for row in reports:
-        if not deleted and str(row.get("BoreholeID")) == str(borehole_id):
-            deleted = True
-            continue
-        remaining.append(row)
-    if deleted:
-        _write_reports(remaining)
-    return deleted
+    return _submit("delete", borehole_id)
 
 
 def update_report(borehole_id: str, updates: Dict[str, Any]) -> bool:
     """Update a report matching BoreholeID. Returns True if updated."""
-    reports = load_reports()
-    updated = False
-    new_reports: List[Dict[str, Any]] = []
-    for row in reports:
-        if not updated and str(row.get("BoreholeID")) == str(borehole_id):
-            merged = dict(row)
-            merged.update(updates or {})
-            new_reports.append(merged)
-            updated = True
-        else:
-            new_reports.append(row)
-    if updated:
-        _write_reports(new_reports)
-    return updated
+    return _submit("update", borehole_id, updates)
+
+
+def compact_journal() -> bool:
+    """Fold reports.journal into reports.csv. Returns True if there was anything to fold.
+
+    Replacing the CSV gives it a new inode, so if we crash before removing the journal,
+    the next load sees that the journal names the old file and ignores it. Other
+    backends have no journal and always return False.
+    """
+    global _snapshot, _journal_entries
+    if not isinstance(_backend, CsvBackend):
+        return False
+    with _STORE_LOCK, _FILE_LOCK.hold():
+        current = _refresh_locked()
+        if not JOURNAL.exists():
+            return False
+        folded = _journal_entries > 0
+        if folded:
+            _write_reports(current.rows)
+        # Without live entries the journal is empty or stale, and only needs removing.
+        JOURNAL.unlink()
+        _journal_entries = 0
+        # Same rows, new on-disk layout: keep the version so derived caches stay valid.
+        _snapshot = ReportSnapshot(
+            current.version, current.rows, _file_signature(), current.rowids, current.next_rowid
+        )
+        if folded and SNAPSHOT_FILE is not None:
+            from .snapshot_file import save_in_background
+
+            save_in_background(current.rows, _snapshot.signature[0])
+        return folded
+
+
+def _compact_in_background() -> None:
+    try:
+        compact_journal()
+    except Exception:  # pragma: no cover
+        logger.exception("Journal compaction failed")
+
+
+def _maybe_compact() -> None:
+    global _compactor
+    signature = _stat_signature(JOURNAL)
+    size = signature[1] if signature else 0
+    if _journal_entries < JOURNAL_MAX_ENTRIES and size < JOURNAL_MAX_BYTES:
+        return
+    with _STORE_LOCK:
+        if _compactor is not None and _compactor.is_alive():
+            return
+        _compactor = threading.Thread(target=_compact_in_background, name="reports-compactor", daemon=True)
+        _compactor.start()
+
+
+def _make_backend() -> Any:
+    if BACKEND == "csv":
+        return CsvBackend()
+    if BACKEND == "sqlite":
+        # Imported here: sqlite_store builds on the definitions above.
+        from .sqlite_store import SqliteBackend
+
+        return SqliteBackend(DB_FILE)
+    raise RuntimeError(f"STORAGE_BACKEND must be csv or sqlite, not {BACKEND!r}")
+
+
+_backend = _make_backend()
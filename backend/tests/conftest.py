@@ -0,0 +1,44 @@
+import csv
+import os
+import tempfile
+
+import pytest
+
+# The app reads its configuration at import time, so point it at a scratch data
+# directory before any test imports backend.app.
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="soil-reports-test-")
+
+
+@pytest.fixture
+def report_row():
+    """Builds a full CSV row; StartDate and ProjectName default to a dated Jetty report."""
+    from backend.app.storage import HEADERS
+
+    def build(borehole_id, **fields):
+        row = {name: "" for name in HEADERS}
+        row.update(BoreholeID=borehole_id, ProjectName="Jetty", StartDate="2024-03-01")
+        row.update(fields)
+        return row
+
+    return build
+
+
+@pytest.fixture
+def store_rows(report_row):
+    return [report_row("A"), report_row("C")]
+
+
+@pytest.fixture
+def store(store_rows):
+    """The storage module over a fresh reports.csv holding ``store_rows``."""
+    from backend.app import storage
+
+    for path in (storage.FILE, storage.JOURNAL, storage.SNAPSHOT_FILE):
+        if path is not None:
+            path.unlink(missing_ok=True)
+    with storage.FILE.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=storage.HEADERS)
+        writer.writeheader()
+        writer.writerows(store_rows)
+    storage.snapshot()
+    return storage
@@ -0,0 +1,34 @@
+import threading
+
+from fastapi import HTTPException
+import pytest
+
+from backend.app import auth
+
+
+def test_unknown_email_still_pays_for_a_password_check(monkeypatch):
+    checked = []
+    monkeypatch.setattr(auth, "verify_password", lambda password, stored: checked.append(stored) or False)
+    with pytest.raises(HTTPException) as exc:
+        auth.authenticate_user("nobody@example.com", "guess")
+    assert exc.value.status_code == 401
+    assert checked == [auth._DUMMY_HASH]
+
+
+def test_create_user_hashes_on_the_pool_without_the_directory_lock(monkeypatch):
+    seen = []
+
+    def hash_password(password):
+        # Another thread must be able to take the directory lock while we hash.
+        acquired = auth._users_lock.acquire(blocking=False)
+        if acquired:
+            auth._users_lock.release()
+        seen.append((threading.current_thread().name, acquired))
+        return "pbkdf2_sha256$1$c2FsdA==$ZGlnZXN0"
+
+    monkeypatch.setattr(auth, "hash_password", hash_password)
+    created = auth.create_user("new@example.com", "secret", "general")
+    assert created == {"email": "new@example.com", "role": "general"}
+    [(thread, acquired)] = seen
+    assert thread.startswith("password-hash") and acquired
+    assert auth._user_directory()["new@example.com"]["password"] == "pbkdf2_sha256$1$c2FsdA==$ZGlnZXN0"
@@ -0,0 +1,128 @@
+import asyncio
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+
+import pytest
+
+from backend.app import ollama_client
+
+
+class StubOllama(ThreadingHTTPServer):
+    """Answers /api/chat like Ollama, after ``delay`` seconds, or with HTTP 500 while ``failing``."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.calls = 0
+        self.delay = 0.0
+        self.failing = False
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/api/chat"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.server._lock:
+            self.server.calls += 1
+        time.sleep(self.server.delay)
+        if self.server.failing:
+            self.send_response(500)
+            self.end_headers()
+            return
+        body = json.dumps({"message": {"content": "re: " + payload["messages"][-1]["content"]}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def ollama(monkeypatch):
+    server = StubOllama()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(ollama_client, "OLLAMA_URL", server.url)
+    monkeypatch.setattr(ollama_client._pool, "breaker", ollama_client.CircuitBreaker(2, 0.3))
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_identical_concurrent_prompts_share_one_call(ollama):
+    ollama.delay = 0.3
+    with ThreadPoolExecutor(5) as pool:
+        answers = list(pool.map(lambda _: ollama_client.ask("depth?"), range(5)))
+    assert answers == ["re: depth?"] * 5
+    assert ollama.calls == 1
+    assert ollama_client.ask("depth?") == "re: depth?"
+    assert ollama.calls == 2
+
+
+def test_cancelling_the_first_caller_leaves_the_others_their_answer(ollama):
+    ollama.delay = 0.3
+
+    async def scenario():
+        first = asyncio.ensure_future(ollama_client.ask_async("casing?"))
+        await asyncio.sleep(0.05)
+        second = asyncio.ensure_future(ollama_client.ask_async("casing?"))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario()) == "re: casing?"
+    assert ollama.calls == 1
+
+
+def test_breaker_opens_probes_and_closes(ollama):
+    ollama.failing = True
+    assert ollama_client.ask("a") == ollama_client.UNAVAILABLE_MSG
+    assert ollama_client.ask("b") == ollama_client.UNAVAILABLE_MSG
+    assert ollama_client._pool.breaker.state == "open"
+    assert "not responding" in ollama_client.ask("c")
+    assert ollama.calls == 2
+
+    time.sleep(0.35)  # half-open: one probe, which fails and reopens the breaker
+    assert ollama_client.ask("d") == ollama_client.UNAVAILABLE_MSG
+    assert ollama.calls == 3
+    assert "not responding" in ollama_client.ask("e")
+
+    ollama.failing = False
+    time.sleep(0.35)
+    assert ollama_client.ask("f") == "re: f"
+    assert ollama_client._pool.breaker.state == "closed"
+    assert ollama_client.ask("g") == "re: g"
+
+
+def test_close_and_reopen(ollama):
+    assert ollama_client.ask("before") == "re: before"
+    ollama_client.close()
+    assert ollama_client.ask("after") == "re: after"
+    assert ollama.calls == 2
+
+
+def test_close_cancels_running_and_queued_calls(ollama):
+    ollama.delay = 0.5
+    prompts = [f"q{i}" for i in range(ollama_client.MAX_CONCURRENCY + 2)]  # two of them queue
+    with ThreadPoolExecutor(len(prompts)) as pool:
+        pending = [pool.submit(ollama_client.ask, prompt) for prompt in prompts]
+        time.sleep(0.2)
+        ollama_client.close()
+        for future in pending:
+            with pytest.raises(CancelledError):
+                future.result(timeout=2)
+    assert ollama_client._pool._inflight == {}
+    assert ollama_client._pool.scheduler.running == 0
+    ollama.delay = 0.0
+    assert ollama_client.ask("q0") == "re: q0"  # was in flight on the stopped loop
+    assert ollama_client.ask(prompts[-1]) == "re: " + prompts[-1]  # was queued there
@@ -0,0 +1,29 @@
+import hashlib
+
+import pytest
+
+from backend.app import passwords
+
+
+def test_hasher_interfaces_are_abstract():
+    with pytest.raises(TypeError):
+        passwords.Hasher()
+    with pytest.raises(TypeError):
+        passwords.Verifier()
+
+
+def test_legacy_sha256_is_verify_only():
+    legacy = passwords.VERIFIERS["sha256"]
+    assert "sha256" not in passwords.HASHERS
+    assert not hasattr(legacy, "hash")
+    stored = "sha256$salt$" + hashlib.sha256(b"saltsecret").hexdigest()
+    assert passwords.verify_password("secret", stored)
+    assert not passwords.verify_password("wrong", stored)
+    assert passwords.needs_rehash(stored)
+
+
+def test_current_scheme_round_trips():
+    stored = passwords.hash_password("secret")
+    assert passwords.verify_password("secret", stored)
+    assert not passwords.verify_password("wrong", stored)
+    assert not passwords.needs_rehash(stored)
@@ -0,0 +1,89 @@
+from itertools import islice
+
+import pytest
+
+from backend.app import report_index
+
+
+@pytest.fixture
+def store_rows(report_row):
+    return [
+        report_row("BH-3", StartDate="2024-03-10", SiteName="North"),
+        report_row("BH-1", StartDate="2024-01-10", SiteName="South"),
+        report_row("", StartDate="2024-02-10", SiteName="North"),
+        report_row("BH-2", StartDate="2024-02-10", ProjectName="Quay"),
+        report_row("", StartDate="2024-02-10", SiteName="North"),
+        report_row("", StartDate="2024-02-10"),
+    ]
+
+
+def _state(index):
+    return index.keys, index.by_field
+
+
+def _pages(index, size, **criteria):
+    """Every row reached by following cursors, ``size`` rows per page."""
+    seen, after = [], None
+    while True:
+        keys, _ = index.match(after=after, **criteria)
+        page = list(islice(keys, size))
+        seen.extend(index.row(key) for key in page)
+        if len(page) < size:
+            return seen
+        after = report_index.decode_cursor(report_index.encode_cursor(page[-1]))
+
+
+def test_writes_update_the_index_without_a_rebuild(store, report_row, monkeypatch):
+    report_index.get_index()
+
+    def no_rebuild(snap):
+        raise AssertionError("write deltas should keep the index current")
+
+    monkeypatch.setattr(report_index, "ReportIndex", no_rebuild)
+    assert store.update_report("BH-2", {"StartDate": "2024-04-01", "ProjectName": "Jetty"})
+    assert store.update_report("BH-1", {"BoreholeID": "BH-9", "SiteName": "North"})
+    assert store.delete_report("BH-3")
+    store.save_reports([report_row("BH-5", SiteName="South"), report_row("BH-4", StartDate="")])
+    index = report_index.get_index()
+    monkeypatch.undo()
+    assert _state(index) == _state(report_index.ReportIndex(store.snapshot()))
+    assert "quay" not in index.by_field["project"]
+
+
+def test_older_versions_are_left_intact(store):
+    before = report_index.get_index()
+    keys = list(before.keys)
+    assert store.delete_report("BH-1")
+    assert before.keys == keys
+    assert len(report_index.get_index()) == len(keys) - 1
+
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_pages_do_not_skip_rows_sharing_a_date_and_a_blank_id(store, descending):
+    index = report_index.get_index()
+    rows = store.snapshot().rows
+    for size in (1, 2, 3):
+        assert sorted(map(id, _pages(index, size, descending=descending))) == sorted(map(id, rows))
+        north = _pages(index, size, filters={"site": "north"}, descending=descending)
+        assert len(north) == 3
+
+
+def test_date_window_includes_both_ends(store):
+    keys, estimate = report_index.get_index().match(date_from="2024-02-10", date_to="2024-03-10")
+    assert [key[:2] for key in keys] == [("2024-02-10", "")] * 3 + [("2024-02-10", "BH-2"), ("2024-03-10", "BH-3")]
+    assert estimate == 5
+
+
+def test_file_order_keeps_the_csv_order(store):
+    rows = store.snapshot().rows
+    index = report_index.get_index()
+    listed, _ = index.query(file_order=True)
+    assert list(listed) == list(rows)
+    north, _ = index.query({"site": "North"}, file_order=True)
+    assert [id(row) for row in north] == [id(rows[0]), id(rows[2]), id(rows[4])]
+
+
+def test_old_two_part_cursors_are_rejected():
+    legacy = report_index.encode_cursor(("2024-02-10", "BH-2"))
+    with pytest.raises(report_index.InvalidCursor):
+        report_index.decode_cursor(legacy)
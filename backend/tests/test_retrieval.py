@@ -0,0 +1,46 @@
+import pytest
+
+from backend.app import retrieval
+
+
+@pytest.fixture
+def store_rows(report_row):
+    return [
+        report_row("BH-1", SoilDescription="soft grey clay", StartDate="2024-01-10"),
+        report_row("BH-2", SoilDescription="dense sand", StartDate="2024-02-10"),
+        report_row("BH-3", SoilDescription="stiff clay", Remarks="casing lost", StartDate="2024-03-10"),
+        report_row("BH-4", SoilDescription="gravel", StartDate=""),
+    ]
+
+
+def _ids(rows, positions):
+    return [rows[pos]["BoreholeID"] for pos in positions]
+
+
+def _fresh(rows, question, limit):
+    """What a full rebuild over ``rows`` ranks first."""
+    index = retrieval.Retriever()
+    index.load(range(len(rows)), rows)
+    return [rows[pos]["BoreholeID"] for pos in index.search(question, limit)]
+
+
+def test_writes_update_the_index_without_a_rebuild(store, report_row, monkeypatch):
+    rows = store.snapshot().rows
+    assert _ids(rows, retrieval.search(rows, "clay", 2)) == ["BH-3", "BH-1"]
+
+    def no_rebuild(snap):
+        raise AssertionError("write deltas should keep the index current")
+
+    monkeypatch.setattr(retrieval._index, "rebuild", no_rebuild)
+    assert store.update_report("BH-2", {"SoilDescription": "sandy clay", "StartDate": "2024-04-01"})
+    assert store.delete_report("BH-3")
+    store.save_reports([report_row("BH-5", SoilDescription="clay with casing"), report_row("BH-6", Remarks="clay")])
+    rows = store.snapshot().rows
+    for question in ("clay", "casing", "sand gravel", "BH-5"):
+        assert _ids(rows, retrieval.search(rows, question, 10)) == _fresh(rows, question, 10)
+    assert "BH-3" not in _ids(rows, retrieval.search(rows, "stiff casing", 10))
+
+
+def test_undated_rows_are_not_indexed(store):
+    rows = store.snapshot().rows
+    assert "BH-4" not in _ids(rows, retrieval.search(rows, "gravel", 10))
@@ -0,0 +1,73 @@
+import multiprocessing
+
+import pytest
+
+from backend.app import samples as store
+
+
+def _sample(borehole_id, top, bottom, **fields):
+    return {"BoreholeID": borehole_id, "DepthFrom_m": top, "DepthTo_m": bottom, "SampleType": "SPT", **fields}
+
+
+@pytest.fixture(autouse=True)
+def empty():
+    store.FILE.unlink(missing_ok=True)
+    store.samples()
+
+
+def _ids(table, positions):
+    return sorted(table.row(i)["BoreholeID"] for i in positions)
+
+
+def test_blank_depths_do_not_hide_overlapping_samples():
+    store.save_samples([_sample("BH-1", 0, 10), _sample("BH-2", 9.5, 10), _sample("BH-3", "", "")])
+    table = store.samples()
+    assert table.max_length == 10
+    assert _ids(table, table.query(depth_from=5, depth_to=6)) == ["BH-1"]
+    assert _ids(table, table.query()) == ["BH-1", "BH-2", "BH-3"]
+
+
+def _append_and_check(worker):
+    """Append from one process; whenever our table claims to be current, it must hold every row."""
+    stale = 0
+    for i in range(25):
+        store.save_samples([_sample(f"W{worker}-{i}", 0, 1), _sample(f"W{worker}-{i}", 1, 2)])
+        with store._LOCK, store._FILE_LOCK.hold(exclusive=False):
+            table = store._table
+            if table.signature == store._stat_signature(store.FILE) and len(table) != len(store._read_table(0)):
+                stale += 1
+    return stale
+
+
+def test_concurrent_appends_from_several_processes():
+    with multiprocessing.get_context("fork").Pool(4) as pool:
+        stale = pool.map(_append_and_check, range(4))
+    assert stale == [0, 0, 0, 0]
+    table = store.samples()
+    assert len(table) == 200
+    assert len(table.boreholes) == 100
+
+
+def _rows(table):
+    return [table.row(i) for i in range(len(table))]
+
+
+def test_appends_merge_into_the_table_a_reload_would_build():
+    store.save_samples([_sample("BH-2", 1, 2), _sample("BH-4", 0, 1, Soil_USCS="CL"), _sample("BH-2", "", "")])
+    store.save_samples([_sample("BH-3", 2, 3, SampleType="UD"), _sample("BH-1", 0, 4), _sample("BH-2", 1, 1.5)])
+    store.save_samples([_sample("BH-2", 0.5, 1, Soil_USCS="SM", Remarks="wet"), _sample("BH-5", 3, 9)])
+    table, reloaded = store._table, store._read_table(0)
+    assert table.signature == store._stat_signature(store.FILE)
+    assert table.boreholes == reloaded.boreholes
+    assert _rows(table) == _rows(reloaded)
+    assert table.bounds.tolist() == reloaded.bounds.tolist()
+    assert table.max_length == reloaded.max_length == 6
+    assert table.depth_sorted.tolist()[:-1] == reloaded.depth_sorted.tolist()[:-1]
+    top = table.floats["DepthFrom_m"]
+    assert top[table.by_depth].tolist()[:-1] == table.depth_sorted.tolist()[:-1]
+    assert sorted(table.by_depth.tolist()) == list(range(len(table)))
+    for window in [(0.5, 1.2), (2, 2.5), (None, 1), (3, None)]:
+        assert table.query(depth_from=window[0], depth_to=window[1]).tolist() == (
+            reloaded.query(depth_from=window[0], depth_to=window[1]).tolist()
+        )
+    assert table.query(equals={"Soil_USCS": "sm"}).tolist() == reloaded.query(equals={"Soil_USCS": "sm"}).tolist()
@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+
+import pytest
+
+from backend.app.spatial import SpatialIndex, haversine_m
+
+
+def _index(points, cell_deg=30.0):
+    rows = [{"BoreholeID": f"P{i}", "Latitude": str(lat), "Longitude": str(lon)} for i, (lat, lon) in enumerate(points)]
+    index = SpatialIndex(cell_deg)
+    index.rebuild(SimpleNamespace(version=0, rowids=list(range(len(rows))), rows=rows))
+    return index
+
+
+def _grid():
+    """One point in every 30 degree cell, so queries walk cells instead of all points."""
+    return [(lat, lon) for lat in range(-75, 90, 30) for lon in range(-165, 180, 30)]
+
+
+def _ids(rows):
+    return [row["BoreholeID"] for row in rows]
+
+
+def test_full_longitude_band_returns_each_report_once():
+    index = _index(_grid())
+    found = _ids(index.bbox(10, -180, 20, 180))
+    assert len(found) == len(set(found)) == 12
+
+
+def test_antimeridian_box_returns_each_report_once():
+    index = _index(_grid() + [(15, 179), (15, -179)])
+    assert sorted(_ids(index.bbox(10, 170, 20, -170))) == ["P72", "P73"]
+    # Wraps almost all the way round, so the first and last columns share a cell.
+    found = _ids(index.bbox(10, 10, 20, 5))
+    assert len(found) == len(set(found)) == 14
+
+
+def test_polar_radius_returns_each_report_once():
+    index = _index(_grid() + [(88, -179)])
+    found = [row["BoreholeID"] for _, row in index.radius(85, 0, 1_200_000)]
+    assert len(found) == len(set(found))
+    assert "P72" in found
+
+
+def test_nearest_returns_each_report_once_when_rings_wrap_the_globe():
+    points = _grid()
+    index = _index(points)
+    for k in (60, 72):
+        found = index.nearest(15, 15, k)
+        ids = [row["BoreholeID"] for _, row in found]
+        assert len(ids) == len(set(ids)) == k
+        expected = sorted(haversine_m(15, 15, lat, lon) for lat, lon in points)[:k]
+        assert [d for d, _ in found] == pytest.approx(expected)
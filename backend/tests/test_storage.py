@@ -0,0 +1,69 @@
+from backend.app import storage
+
+
+def _row(borehole_id, **fields):
+    row = {name: "" for name in storage.HEADERS}
+    row.update(BoreholeID=borehole_id, ProjectName="Jetty", StartDate="2024-03-01", **fields)
+    return row
+
+
+def _restarted(store):
+    """The rows a freshly started process would load from disk."""
+    rows, _ = store._read_rows()
+    return {row["BoreholeID"]: dict(row) for row in rows}
+
+
+def test_edit_after_rename_survives_reload(store):
+    assert store.update_report("A", {"BoreholeID": "B"})
+    assert store.update_report("B", {"Remarks": "redrilled"})
+    reloaded = _restarted(store)
+    assert sorted(reloaded) == ["B", "C"]
+    assert reloaded["B"]["Remarks"] == "redrilled"
+    assert reloaded == {row["BoreholeID"]: dict(row) for row in store.snapshot().rows}
+
+
+def test_delete_after_rename_survives_reload(store):
+    assert store.update_report("A", {"BoreholeID": "B"})
+    assert store.delete_report("B")
+    assert sorted(_restarted(store)) == ["C"]
+
+
+def test_reused_id_after_rename_targets_the_new_row(store):
+    assert store.update_report("A", {"BoreholeID": "B"})
+    store.save_report(_row("A", Remarks="new"))
+    assert store.update_report("A", {"Remarks": "edited"})
+    assert store.update_report("B", {"Remarks": "renamed"})
+    reloaded = _restarted(store)
+    assert reloaded["A"]["Remarks"] == "edited"
+    assert reloaded["B"]["Remarks"] == "renamed"
+    assert reloaded == {row["BoreholeID"]: dict(row) for row in store.snapshot().rows}
+
+
+def _crash_after_fold(store):
+    """Compact as compact_journal does, but stop before the journal is removed."""
+    with store._STORE_LOCK, store._FILE_LOCK.hold():
+        store._write_reports(store._refresh_locked().rows)
+    assert store.JOURNAL.exists()
+
+
+def test_journal_left_by_crashed_compaction_is_not_replayed(store):
+    assert store.update_report("A", {"BoreholeID": "B"})
+    assert store.update_report("C", {"BoreholeID": "A"})
+    assert store.delete_report("B")
+    store.save_report(_row("B", Remarks="new"))
+    expected = {row["BoreholeID"]: dict(row) for row in store.snapshot().rows}
+    _crash_after_fold(store)
+    assert _restarted(store) == expected
+
+
+def test_writes_after_crashed_compaction_start_a_fresh_journal(store):
+    assert store.update_report("A", {"BoreholeID": "B"})
+    _crash_after_fold(store)
+    store._publish(*store._read_rows())  # a restarted process
+    assert store.update_report("C", {"Remarks": "checked"})
+    reloaded = _restarted(store)
+    assert sorted(reloaded) == ["B", "C"]
+    assert reloaded["C"]["Remarks"] == "checked"
+    assert store.compact_journal()
+    assert not store.JOURNAL.exists()
+    assert _restarted(store) == reloaded
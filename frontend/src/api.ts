@@ -21,6 +21,12 @@ export type SummaryStats = {
   period_label?: string | null
 }
 
+export type NarrativeJob = {
+  id: string
+  status: "pending" | "running" | "done" | "failed"
+  text?: string | null
+}
+
 export type SummaryPeriodRange = { from?: string | null; to?: string | null }
 
 export type SummaryResponse = {
@@ -29,6 +35,7 @@ export type SummaryResponse = {
   stats?: SummaryStats
   highlights?: string[]
   narrative?: string | null
+  narrative_job?: NarrativeJob | null
   period_range?: SummaryPeriodRange
   period_label?: string | null
 }
@@ -55,6 +62,7 @@ export type DashboardResponse = {
   top_contractor?: string | null
   recent_reports?: DashboardRecent[]
   narrative?: string | null
+  narrative_job?: NarrativeJob | null
   period_range?: SummaryPeriodRange
   period_label?: string | null
 }
@@ -115,6 +123,13 @@ export async function listReports() {
   return parseJson<any[]>(r, "Failed to list reports");
 }
 
+export async function getReport(boreholeId: string) {
+  const r = await fetch(`${BASE}/api/reports/${encodeURIComponent(boreholeId)}`, {
+    headers: buildHeaders(),
+  });
+  return parseJson<any>(r, "Failed to load report");
+}
+
 export async function updateReport(boreholeId: string, data: any) {
   const r = await fetch(`${BASE}/api/reports/${encodeURIComponent(boreholeId)}`, {
     method: "PUT",
@@ -141,6 +156,66 @@ export async function askAI(question: string, context?: string, history?: Array<
   return parseJson<any>(r, "AI error");
 }
 
+// Streams /api/ai/analyze as server-sent events: onContext fires once with the
+// retrieved evidence, onQueued while waiting behind other AI work, onToken for every chunk. Abort the signal to stop generation.
+export async function askAIStream(
+  question: string,
+  handlers: {
+    onContext?: (context: string) => void
+    onQueued?: (queue: { position?: number; eta_s?: number; state: string }) => void
+    onToken: (text: string) => void
+  },
+  context?: string,
+  history?: Array<{ role: string; content: string }>,
+  signal?: AbortSignal,
+  sessionId?: string,
+) {
+  const r = await fetch(`${BASE}/api/ai/analyze?stream=true`, {
+    method: "POST",
+    headers: buildHeaders({ "Content-Type": "application/json", Accept: "text/event-stream" }),
+    body: JSON.stringify(sessionId ? { question, context, session_id: sessionId } : { question, context, history }),
+    signal,
+  });
+  if (!r.ok || !r.body) {
+    await parseJson<any>(r, "AI error");
+    throw new Error("AI error: empty stream");
+  }
+  const reader = r.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let end: number;
+    while ((end = buffer.indexOf("\n\n")) >= 0) {
+      const block = buffer.slice(0, end);
+      buffer = buffer.slice(end + 2);
+      const event = /^event: (.*)$/m.exec(block)?.[1];
+      const data = JSON.parse(/^data: (.*)$/m.exec(block)?.[1] || "{}");
+      if (event === "context") handlers.onContext?.(data.context);
+      else if (event === "queued") handlers.onQueued?.(data);
+      else if (event === "token") handlers.onToken(data.text);
+    }
+  }
+}
+
+// Server-side chat: follow-ups sent with session_id reuse the stored history.
+export async function createChatSession() {
+  const r = await fetch(`${BASE}/api/ai/sessions`, {
+    method: "POST",
+    headers: buildHeaders(),
+  });
+  return parseJson<{ session_id: string }>(r, "Failed to start chat");
+}
+
+export async function deleteChatSession(sessionId: string) {
+  await fetch(`${BASE}/api/ai/sessions/${encodeURIComponent(sessionId)}`, {
+    method: "DELETE",
+    headers: buildHeaders(),
+  });
+}
+
 export async function getSummary(period: "weekly" | "monthly", filters?: Record<string, string | number>) {
   const params = new URLSearchParams({ period })
   if (filters) {
@@ -159,6 +234,20 @@ export async function getDashboard() {
   return parseJson<DashboardResponse>(r, "Failed to get dashboard");
 }
 
+export async function getNarrative(jobId: string) {
+  const r = await fetch(`${BASE}/api/narratives/${encodeURIComponent(jobId)}`);
+  return parseJson<NarrativeJob>(r, "Failed to get narrative");
+}
+
+// Poll a background narrative job until it finishes; resolves with the final job state.
+export async function waitForNarrative(jobId: string, intervalMs = 2000) {
+  for (;;) {
+    const job = await getNarrative(jobId);
+    if (job.status === "done" || job.status === "failed") return job;
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+  }
+}
+
 export async function listUsers() {
   const r = await fetch(`${BASE}/api/users`, {
     headers: buildHeaders(),
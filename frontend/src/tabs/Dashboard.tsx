@@ -1,7 +1,7 @@
 import { useEffect, useMemo, useState } from 'react'
 import { marked } from 'marked'
 import DOMPurify from 'dompurify'
-import { DashboardResponse, getDashboard } from '../api'
+import { DashboardResponse, getDashboard, waitForNarrative } from '../api'
 
 export default function Dashboard() {
   const [data, setData] = useState<DashboardResponse | null>(null)
@@ -13,6 +13,18 @@ export default function Dashboard() {
         const payload = await getDashboard()
         setData(payload)
         setStatus('')
+        const job = payload.narrative_job
+        if (job && (job.status === 'pending' || job.status === 'running')) {
+          waitForNarrative(job.id)
+            .then((finished) =>
+              setData((prev) =>
+                prev?.narrative_job?.id === finished.id
+                  ? { ...prev, narrative: finished.text ?? null, narrative_job: finished }
+                  : prev,
+              ),
+            )
+            .catch(() => undefined)
+        }
       } catch (err: any) {
         setStatus(`Error: ${err.message}`)
       }
@@ -52,7 +64,10 @@ export default function Dashboard() {
               <div className="markdown" dangerouslySetInnerHTML={{ __html: narrativeHtml }} />
             ) : (
               <p style={{ color: 'var(--muted)', whiteSpace: 'pre-wrap' }}>
-                {data.narrative || 'Narrative unavailable. Try reloading once the AI service is online.'}
+                {data.narrative ||
+                  (data.narrative_job && ['pending', 'running'].includes(data.narrative_job.status)
+                    ? 'Generating narrative...'
+                    : 'Narrative unavailable. Try reloading once the AI service is online.')}
               </p>
             )}
           </div>
@@ -1,5 +1,5 @@
-import { useEffect, useMemo, useState } from 'react'
-import { askAI } from '../api'
+import { useEffect, useMemo, useRef, useState } from 'react'
+import { askAIStream, createChatSession, deleteChatSession } from '../api'
 import { marked } from 'marked'
 import DOMPurify from 'dompurify'
 
@@ -12,24 +12,64 @@ export default function QA() {
     try { return JSON.parse(raw) } catch { return [] }
   })
   const [status, setStatus] = useState('')
+  const [pending, setPending] = useState<{ q: string, a: string, evidence?: string } | null>(null)
+  const abortRef = useRef<AbortController | null>(null)
+  const sessionRef = useRef<string | null>(localStorage.getItem('qa_session'))
+
+  useEffect(() => () => abortRef.current?.abort(), [])
+
+  // The backend keeps the conversation; a new session is started if the old one expired.
+  const ensureSession = async (fresh = false) => {
+    if (!sessionRef.current || fresh) {
+      const created = await createChatSession()
+      sessionRef.current = created.session_id
+      localStorage.setItem('qa_session', created.session_id)
+    }
+    return sessionRef.current
+  }
 
   const onAsk = async () => {
-    if (!question.trim()) return
+    if (!question.trim() || pending) return
     setStatus('Thinking...')
+    const controller = new AbortController()
+    abortRef.current = controller
+    let answer = ''
+    let evidence: string | undefined
+    setPending({ q: question, a: '' })
     try {
-      // Build chat history for backend: alternating user/assistant turns
-      const turns: Array<{role: string, content: string}> = []
-      history.forEach(h => {
-        turns.push({ role: 'user', content: h.q })
-        if (h.a) turns.push({ role: 'assistant', content: h.a })
-      })
-      const res = await askAI(question, context || undefined, turns)
-      const next = [...history, { q: question, a: res.answer, evidence: res.context, ts: Date.now() }]
+      const send = (sessionId: string) => askAIStream(
+        question,
+        {
+          onContext: (ctx) => { evidence = ctx },
+          onQueued: (queue) => {
+            setStatus(queue.state === 'queued' ? `Queued (#${queue.position}, ~${Math.ceil(queue.eta_s ?? 0)}s)...` : 'Thinking...')
+          },
+          onToken: (text) => {
+            answer += text
+            setStatus('')
+            setPending({ q: question, a: answer, evidence })
+          },
+        },
+        context || undefined,
+        undefined,
+        controller.signal,
+        sessionId,
+      )
+      try {
+        await send(await ensureSession())
+      } catch (err: any) {
+        if (err.status !== 404) throw err
+        await send(await ensureSession(true))
+      }
+      const next = [...history, { q: question, a: answer, evidence, ts: Date.now() }]
       setHistory(next)
       localStorage.setItem('qa_history', JSON.stringify(next))
       setStatus('')
     } catch (err: any) {
-      setStatus(`Error: ${err.message}`)
+      setStatus(err.name === 'AbortError' ? 'Stopped' : `Error: ${err.message}`)
+    } finally {
+      abortRef.current = null
+      setPending(null)
     }
   }
 
@@ -116,11 +156,15 @@ export default function QA() {
         </div>
       </div>
       <div className="actions" style={{ marginTop: '.75rem', gap: '.5rem', display: 'flex', alignItems: 'center' }}>
-        <button onClick={onAsk}>Ask</button>
+        <button onClick={onAsk} disabled={!!pending}>Ask</button>
+        {pending && <button onClick={() => abortRef.current?.abort()}>Stop</button>}
         <button
           onClick={() => {
             setHistory([])
             localStorage.removeItem('qa_history')
+            if (sessionRef.current) deleteChatSession(sessionRef.current).catch(() => undefined)
+            sessionRef.current = null
+            localStorage.removeItem('qa_session')
             setStatus('Cleared')
           }}
           disabled={history.length === 0}
@@ -129,6 +173,12 @@ export default function QA() {
         </button>
         <span>{status}</span>
       </div>
+      {pending && (
+        <div className="card" style={{ marginTop: '1rem' }}>
+          <div style={{ color: 'var(--muted)', fontSize: '.9rem' }}>Q{history.length + 1}: {pending.q}</div>
+          <RenderedAnswer answer={pending.a} />
+        </div>
+      )}
       {history.length > 0 && (
         <div style={{ marginTop: '1rem' }}>
           {[...history].reverse().map((h, idx) => {
@@ -1,5 +1,5 @@
 import { useMemo, useState } from 'react'
-import { getSummary, SummaryResponse } from '../api'
+import { getSummary, SummaryResponse, waitForNarrative } from '../api'
 import { marked } from 'marked'
 import DOMPurify from 'dompurify'
 
@@ -35,6 +35,18 @@ export default function Summary() {
       const payload = await getSummary(period, filters)
       setData(payload)
       setStatus('')
+      const job = payload.narrative_job
+      if (job && (job.status === 'pending' || job.status === 'running')) {
+        waitForNarrative(job.id)
+          .then((finished) =>
+            setData((prev) =>
+              prev?.narrative_job?.id === finished.id
+                ? { ...prev, narrative: finished.text ?? null, narrative_job: finished }
+                : prev,
+            ),
+          )
+          .catch(() => undefined)
+      }
     } catch (err: any) {
       setStatus(`Error: ${err.message}`)
     }
@@ -130,7 +142,10 @@ export default function Summary() {
               <div className="markdown" dangerouslySetInnerHTML={{ __html: narrativeHtml }} />
             ) : (
               <p style={{ whiteSpace: 'pre-wrap', color: 'var(--muted)' }}>
-                {data.narrative || 'Narrative unavailable. Run the summary again once the AI service is reachable.'}
+                {data.narrative ||
+                  (data.narrative_job && ['pending', 'running'].includes(data.narrative_job.status)
+                    ? 'Generating narrative...'
+                    : 'Narrative unavailable. Run the summary again once the AI service is reachable.')}
               </p>
             )}
           </div>